@@ -0,0 +1,171 @@
+"""Динамика продаж: выручка, количество и число продаж по дням, неделям
+или месяцам за период, при необходимости - с разбивкой по товарам или
+покупателям.
+
+Ряд строится одним сгруппированным запросом. Без разбивки и с разбивкой
+по товарам он читает суточные итоги (O(дней x товаров) вместо O(продаж)),
+по покупателям - таблицу продаж вместе с архивом (archive.py):
+покупателя в суточных итогах нет.
+С разбивкой отдельными рядами идут top самых доходных записей периода,
+остальные собираются в общий ряд "Остальные" в том же запросе.
+"""
+from datetime import date, datetime, timedelta
+from sqlalchemy import and_, func, select
+from database import db, Product, Customer, DailySalesRollup
+from archive import sales_source
+
+GRANULARITIES = ('day', 'week', 'month')
+
+# Разбивка -> модель, по записям которой строятся ряды
+SPLITS = {'product': Product, 'customer': Customer}
+
+OTHERS = 'Остальные'
+
+
+def bucket_start(day, granularity):
+    """Начало интервала (дня, недели с понедельника, месяца), в который попадает day"""
+    if granularity == 'week':
+        return day - timedelta(days=day.weekday())
+    if granularity == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def next_bucket(day, granularity):
+    """Начало следующего интервала"""
+    if granularity == 'week':
+        return day + timedelta(days=7)
+    if granularity == 'month':
+        return (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return day + timedelta(days=1)
+
+
+def bucket_starts(start_date, end_date, granularity):
+    """Начала всех интервалов, пересекающихся с периодом [start_date; end_date)"""
+    buckets = []
+    day = bucket_start(start_date.date(), granularity)
+    while day < end_date.date():
+        buckets.append(day)
+        day = next_bucket(day, granularity)
+    return buckets
+
+
+def bucket_expr(column, granularity):
+    """SQL-выражение "начало интервала" для столбца даты/времени"""
+    if db.session.get_bind().dialect.name == 'sqlite':
+        if granularity == 'week':
+            # Понедельник в пределах [день - 6; день]
+            return func.date(column, '-6 days', 'weekday 1')
+        if granularity == 'month':
+            return func.strftime('%Y-%m-01', column)
+        return func.date(column)
+    return db.cast(func.date_trunc(granularity, column), db.Date)
+
+
+def bucket_key(value):
+    """Начало интервала из строки результата (SQLite отдает строку, PostgreSQL - дату)"""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(value[:10])
+
+
+def series_source(start_date, end_date, granularity, split):
+    """Источник ряда: (столбец группировки по дням, id разбивки, агрегаты
+    выручки, количества и числа продаж, условие периода)"""
+    if split != 'customer':
+        # Суточные итоги группируются по самой дате: строки идут в порядке
+        # первичного ключа (date, product_id), функция на строку не вычисляется
+        return (DailySalesRollup.date, DailySalesRollup.product_id,
+                func.sum(DailySalesRollup.revenue), func.sum(DailySalesRollup.quantity),
+                func.sum(DailySalesRollup.sales_count),
+                and_(DailySalesRollup.date >= start_date.date(), DailySalesRollup.date < end_date.date()))
+    Sale = sales_source(start_date, end_date)
+    return (bucket_expr(Sale.sale_date, granularity), Sale.customer_id,
+            func.sum(Sale.total_price), func.sum(Sale.quantity), func.count(Sale.id),
+            and_(Sale.sale_date >= start_date, Sale.sale_date < end_date))
+
+
+def sales_series(start_date, end_date, granularity='month', split=None, top=10):
+    """Ряды за период [start_date; end_date) (границы - полночь).
+
+    Возвращает компактный словарь массивов одинаковой длины:
+    buckets - начала интервалов, totals - итоги по всем продажам,
+    series (только с разбивкой) - ряды по записям с наибольшей выручкой
+    и ряд "Остальные" (id = None), если в периоде есть прочие записи.
+    """
+    if granularity not in GRANULARITIES:
+        raise ValueError(f'Неизвестный интервал: {granularity}')
+    if split is not None and split not in SPLITS:
+        raise ValueError(f'Неизвестная разбивка: {split}')
+
+    day, key, revenue, units, count, period = series_source(start_date, end_date, granularity, split)
+    columns = [day.label('day'), revenue.label('revenue'), units.label('units'), count.label('sales')]
+    group_by = [day]
+    daily = select().select_from(key.class_)
+    if split:
+        leaders = select(key.label('id')).where(period).group_by(key).order_by(
+            revenue.desc(), key).limit(top).cte('leaders')
+        # Записи вне top не находят пары и сворачиваются в группу с id = NULL
+        daily = daily.outerjoin(leaders, leaders.c.id == key)
+        columns.append(leaders.c.id.label('key'))
+        group_by.append(leaders.c.id)
+    # Сначала итоги по дням (или интервалам), затем - по интервалам:
+    # внешний запрос обрабатывает уже сгруппированные строки
+    daily = daily.add_columns(*columns).where(period).group_by(*group_by).subquery()
+
+    bucket = bucket_expr(daily.c.day, granularity)
+    columns = [bucket, func.sum(daily.c.revenue), func.sum(daily.c.units), func.sum(daily.c.sales)]
+    group_by = [bucket]
+    statement = select().select_from(daily)
+    if split:
+        model = SPLITS[split]
+        columns += [daily.c.key, model.name]
+        group_by += [daily.c.key, model.name]
+        statement = statement.outerjoin(model, model.id == daily.c.key)
+    rows = db.session.execute(statement.add_columns(*columns).group_by(*group_by)).all()
+
+    buckets = bucket_starts(start_date, end_date, granularity)
+    index = {day: position for position, day in enumerate(buckets)}
+    totals = empty_series(len(buckets))
+    series = {}
+    for row in rows:
+        position = index[bucket_key(row[0])]
+        add_point(totals, position, row[1:4])
+        if split:
+            entry = series.get(row[4])
+            if entry is None:
+                entry = series[row[4]] = dict(id=row[4], name=row[5] or OTHERS, **empty_series(len(buckets)))
+            add_point(entry, position, row[1:4])
+
+    result = {
+        'granularity': granularity,
+        'buckets': [day.isoformat() for day in buckets],
+        'totals': rounded(totals),
+    }
+    if split:
+        # По убыванию выручки, "Остальные" - последним рядом
+        ordered = sorted(series.values(), key=lambda entry: (entry['id'] is None, -sum(entry['revenue'])))
+        result['split'] = split
+        result['series'] = [rounded(entry) for entry in ordered]
+    return result
+
+
+def empty_series(length):
+    """Нулевые массивы выручки, количества и числа продаж"""
+    return {'revenue': [0.0] * length, 'units': [0] * length, 'sales': [0] * length}
+
+
+def add_point(entry, position, values):
+    """Прибавление сумм одной строки результата к точке ряда"""
+    revenue, units, sales = values
+    entry['revenue'][position] += revenue or 0
+    entry['units'][position] += units or 0
+    entry['sales'][position] += sales or 0
+
+
+def rounded(entry):
+    """Выручка с точностью до копеек (компактнее в JSON)"""
+    entry['revenue'] = [round(value, 2) for value in entry['revenue']]
+    return entry
@@ -0,0 +1,386 @@
+"""JSON API v1 для кассовых терминалов и интеграций.
+
+Авторизация - заголовок "Authorization: Bearer <токен>", cookie-сессия
+не используется. Права те же, что у пользователя токена: чтение - всем,
+создание и изменение - менеджеру и администратору, удаление -
+администратору.
+
+Списки отдаются страницами с курсором (?limit=&after=), параметр
+?fields=id,name оставляет в ответе только перечисленные поля.
+POST/PATCH на коллекцию принимают объект или {"items": [...]} - пакет
+обрабатывается одной транзакцией. Продажа с несколькими позициями -
+POST /sales с {"customer_id": ..., "lines": [...]}.
+
+Токен выдается командой:  python api.py issue-token <пользователь> <название>
+"""
+import hashlib
+import json
+import math
+import secrets
+from datetime import datetime
+from functools import wraps
+from flask import Blueprint, Response, current_app, g, request
+from sqlalchemy import update
+from database import db, Product, Customer, Sale, User, ApiToken
+from pagination import keyset_paginate
+from counters import get_counters
+from report_cache import get_report_cache
+from sale_queue import place_sale
+import stock
+import archive
+from sales_service import create_order, SaleError, ProductNotFound, InsufficientStock
+
+try:
+    import orjson
+except ImportError:  # без orjson - стандартный json
+    orjson = None
+
+api = Blueprint('api', __name__, url_prefix='/api/v1')
+
+
+def finite_float(value):
+    """float без nan и inf: их принимает float(), но не столбцы БД"""
+    value = float(value)
+    if not math.isfinite(value):
+        raise ValueError(value)
+    return value
+
+
+# Поля ресурсов: имя -> функция приведения типа
+PRODUCT_FIELDS = {'name': str, 'price': finite_float, 'quantity': int}
+CUSTOMER_FIELDS = {'name': str, 'phone': str, 'email': str}
+
+PRODUCT_OUTPUT = ('id', 'name', 'price', 'quantity', 'created_at', 'updated_at')
+CUSTOMER_OUTPUT = ('id', 'name', 'phone', 'email', 'created_at', 'updated_at')
+SALE_OUTPUT = ('id', 'product_id', 'customer_id', 'quantity', 'total_price', 'sale_date')
+
+
+class ApiError(Exception):
+    """Ошибка запроса к API: отдается как {"error": ...} с кодом status"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+def hash_token(token):
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+
+def issue_token(user, name):
+    """Новый токен пользователя; открытое значение возвращается один раз"""
+    token = secrets.token_urlsafe(32)
+    db.session.add(ApiToken(user_id=user.id, name=name, token_hash=hash_token(token)))
+    db.session.commit()
+    return token
+
+
+def _default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f'{type(value).__name__} не сериализуется в JSON')
+
+
+def json_response(data, status=200):
+    """Ответ JSON без шаблонизатора; orjson, если установлен"""
+    if orjson is not None:
+        body = orjson.dumps(data, default=_default)
+    else:
+        body = json.dumps(data, ensure_ascii=False, default=_default, separators=(',', ':'))
+    return Response(body, status=status, mimetype='application/json')
+
+
+@api.errorhandler(ApiError)
+def handle_api_error(error):
+    return json_response({'error': error.message}, error.status)
+
+
+@api.errorhandler(404)
+def handle_not_found(error):
+    return json_response({'error': 'Не найдено'}, 404)
+
+
+@api.before_request
+def authenticate():
+    """Пользователь по токену из заголовка Authorization"""
+    header = request.headers.get('Authorization', '')
+    scheme, _, token = header.partition(' ')
+    if scheme.lower() != 'bearer' or not token:
+        raise ApiError('Требуется токен: Authorization: Bearer <токен>', 401)
+    api_token = ApiToken.query.filter_by(token_hash=hash_token(token.strip())).first()
+    if api_token is None:
+        raise ApiError('Неверный токен', 401)
+    g.api_user = api_token.user
+
+
+def roles_required(*roles):
+    """Доступ только пользователям токена с указанными ролями"""
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if g.api_user.role not in roles:
+                raise ApiError('Недостаточно прав', 403)
+            return f(*args, **kwargs)
+        return decorated_function
+    return decorator
+
+
+def selected_fields(allowed):
+    """Поля ответа из параметра fields (по умолчанию - все)"""
+    fields = request.args.get('fields')
+    if not fields:
+        return allowed
+    selected = tuple(field.strip() for field in fields.split(',') if field.strip())
+    unknown = set(selected) - set(allowed)
+    if unknown:
+        raise ApiError(f'Неизвестные поля: {", ".join(sorted(unknown))}')
+    return selected
+
+
+def serialize(obj, fields):
+    return {field: getattr(obj, field) for field in fields}
+
+
+def get_limit():
+    """Размер страницы из параметра limit с ограничением сверху"""
+    limit = request.args.get('limit', current_app.config['API_PER_PAGE'], type=int)
+    return max(1, min(limit, current_app.config['MAX_PER_PAGE']))
+
+
+def paginated(query, columns, output, descending=False):
+    """Страница коллекции: {"items": [...], "next_cursor": ...}"""
+    fields = selected_fields(output)
+    page = keyset_paginate(query, columns, after=request.args.get('after'),
+                           per_page=get_limit(), descending=descending)
+    return json_response({
+        'items': [serialize(item, fields) for item in page],
+        'next_cursor': page.next_cursor,
+    })
+
+
+def request_items():
+    """Объекты из тела запроса: один объект или {"items": [...]}"""
+    data = request.get_json(silent=True)
+    if isinstance(data, dict) and 'items' in data:
+        data = data['items']
+    items = data if isinstance(data, list) else [data]
+    if not items or not all(isinstance(item, dict) for item in items):
+        raise ApiError('Ожидается объект JSON или {"items": [...]}')
+    if len(items) > current_app.config['API_MAX_BATCH']:
+        raise ApiError(f'Не больше {current_app.config["API_MAX_BATCH"]} объектов за запрос')
+    return items, not isinstance(data, list)
+
+
+def parse_fields(item, fields, required=(), index=None):
+    """Проверка и приведение полей одного объекта"""
+    where = f'items[{index}]: ' if index is not None else ''
+    unknown = set(item) - set(fields) - {'id'}
+    if unknown:
+        raise ApiError(f'{where}неизвестные поля: {", ".join(sorted(unknown))}')
+    values = {}
+    for field, convert in fields.items():
+        if field not in item or item[field] is None:
+            if field in required:
+                raise ApiError(f'{where}не указано поле {field}')
+            continue
+        try:
+            values[field] = convert(item[field])
+        except (TypeError, ValueError):
+            raise ApiError(f'{where}неверное значение поля {field}')
+    return values
+
+
+def create_items(model, fields, required, output, counter):
+    """Пакетное создание записей одной транзакцией"""
+    items, single = request_items()
+    objects = [model(**parse_fields(item, fields, required, None if single else i))
+               for i, item in enumerate(items)]
+    db.session.add_all(objects)
+    # После flush известны id и значения по умолчанию: ответ собирается
+    # без повторного чтения записей после COMMIT
+    db.session.flush()
+    if model is Product:
+        stock.record_movements([{'product_id': obj.id, 'quantity': obj.quantity or 0,
+                                 'kind': stock.RECEIPT, 'note': 'API'} for obj in objects])
+    result = [serialize(obj, output) for obj in objects]
+    db.session.commit()
+    get_counters().add(**{counter: len(objects)})
+    return json_response(result[0] if single else {'items': result}, 201)
+
+
+def update_items(model, fields, output, item_id=None):
+    """Пакетное изменение записей по id одной транзакцией (bulk UPDATE)"""
+    if item_id is None:
+        items, single = request_items()
+    else:
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            raise ApiError('Ожидается объект JSON')
+        items, single = [dict(data, id=item_id)], True
+    rows = []
+    for i, item in enumerate(items):
+        if not isinstance(item.get('id'), int):
+            raise ApiError(f'items[{i}]: не указан id')
+        values = parse_fields(item, fields, index=None if single else i)
+        rows.append(dict(values, id=item['id'], updated_at=datetime.now()))
+
+    ids = [row['id'] for row in rows]
+    found = {pk for (pk,) in db.session.query(model.id).filter(model.id.in_(ids))}
+    missing = [pk for pk in ids if pk not in found]
+    if missing:
+        raise ApiError(f'Не найдены записи: {", ".join(map(str, missing))}', 404)
+    if model is Product:
+        # Остаток меняется корректировкой с записью в журнал движения
+        stock.set_stock({row['id']: row.pop('quantity') for row in rows if 'quantity' in row}, 'API')
+    db.session.execute(update(model), rows)
+    db.session.commit()
+    if model is Product and any('name' in row for row in rows):
+        # Отчеты группируются по названию товара
+        get_report_cache().clear()
+
+    result = [serialize(obj, output) for obj in model.query.filter(model.id.in_(ids))]
+    return json_response(result[0] if single else {'items': result})
+
+
+def delete_item(model, item_id, sales_column, counter):
+    """Удаление записи, если по ней нет продаж (в том числе архивных)"""
+    obj = db.get_or_404(model, item_id)
+    if archive.has_sales(sales_column, item_id):
+        raise ApiError('Нельзя удалить запись, по которой были продажи', 409)
+    db.session.delete(obj)
+    db.session.commit()
+    get_counters().add(**{counter: -1})
+    return Response(status=204)
+
+
+# Товары
+@api.route('/products', methods=['GET'])
+def list_products():
+    return paginated(Product.query, (Product.id,), PRODUCT_OUTPUT)
+
+
+@api.route('/products/<int:item_id>', methods=['GET'])
+def get_product(item_id):
+    return json_response(serialize(db.get_or_404(Product, item_id), selected_fields(PRODUCT_OUTPUT)))
+
+
+@api.route('/products', methods=['POST'])
+@roles_required('admin', 'manager')
+def create_products():
+    return create_items(Product, PRODUCT_FIELDS, ('name', 'price'), PRODUCT_OUTPUT, 'products')
+
+
+@api.route('/products', methods=['PATCH'])
+@api.route('/products/<int:item_id>', methods=['PATCH'])
+@roles_required('admin', 'manager')
+def update_products(item_id=None):
+    return update_items(Product, PRODUCT_FIELDS, PRODUCT_OUTPUT, item_id)
+
+
+@api.route('/products/<int:item_id>', methods=['DELETE'])
+@roles_required('admin')
+def delete_product(item_id):
+    return delete_item(Product, item_id, 'product_id', 'products')
+
+
+# Покупатели
+@api.route('/customers', methods=['GET'])
+def list_customers():
+    return paginated(Customer.query, (Customer.id,), CUSTOMER_OUTPUT)
+
+
+@api.route('/customers/<int:item_id>', methods=['GET'])
+def get_customer(item_id):
+    return json_response(serialize(db.get_or_404(Customer, item_id), selected_fields(CUSTOMER_OUTPUT)))
+
+
+@api.route('/customers', methods=['POST'])
+@roles_required('admin', 'manager')
+def create_customers():
+    return create_items(Customer, CUSTOMER_FIELDS, ('name',), CUSTOMER_OUTPUT, 'customers')
+
+
+@api.route('/customers', methods=['PATCH'])
+@api.route('/customers/<int:item_id>', methods=['PATCH'])
+@roles_required('admin', 'manager')
+def update_customers(item_id=None):
+    return update_items(Customer, CUSTOMER_FIELDS, CUSTOMER_OUTPUT, item_id)
+
+
+@api.route('/customers/<int:item_id>', methods=['DELETE'])
+@roles_required('admin')
+def delete_customer(item_id):
+    return delete_item(Customer, item_id, 'customer_id', 'customers')
+
+
+# Продажи (только чтение и оформление - проведенная продажа не меняется)
+@api.route('/sales', methods=['GET'])
+def list_sales():
+    """Продажи от новых к старым; фильтры product_id, customer_id"""
+    query = Sale.query
+    for field in ('product_id', 'customer_id'):
+        value = request.args.get(field, type=int)
+        if value is not None:
+            query = query.filter(getattr(Sale, field) == value)
+    return paginated(query, (Sale.sale_date, Sale.id), SALE_OUTPUT, descending=True)
+
+
+@api.route('/sales/<int:item_id>', methods=['GET'])
+def get_sale(item_id):
+    return json_response(serialize(db.get_or_404(Sale, item_id), selected_fields(SALE_OUTPUT)))
+
+
+@api.route('/sales', methods=['POST'])
+@roles_required('admin', 'manager')
+def create_sales():
+    """Продажа {"product_id", "customer_id", "quantity"} или заказ
+    {"customer_id", "lines": [{"product_id", "quantity"}, ...]}"""
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        raise ApiError('Ожидается объект JSON')
+    try:
+        customer_id = int(data['customer_id'])
+        if 'lines' in data:
+            lines = [(int(line['product_id']), int(line['quantity'])) for line in data['lines']]
+            if len(lines) > current_app.config['API_MAX_BATCH']:
+                raise ApiError(f'Не больше {current_app.config["API_MAX_BATCH"]} позиций за запрос')
+        else:
+            lines = [(int(data['product_id']), int(data['quantity']))]
+    except (KeyError, TypeError, ValueError):
+        raise ApiError('Нужны customer_id и product_id/quantity или lines')
+    if db.session.get(Customer, customer_id) is None:
+        raise ApiError(f'Покупатель {customer_id} не найден', 404)
+
+    try:
+        if 'lines' in data:
+            count = create_order(customer_id, lines)
+            return json_response({'created': count}, 201)
+        sale = place_sale(customer_id=customer_id, product_id=lines[0][0], quantity=lines[0][1])
+    except ProductNotFound as e:
+        raise ApiError(f'Товар {e.product_id} не найден', 404)
+    except InsufficientStock as e:
+        return json_response({'error': 'Недостаточно товара', 'product_id': e.product_id,
+                              'available': e.available}, 409)
+    except SaleError as e:
+        raise ApiError(str(e), 409)
+    return json_response(serialize(sale, SALE_OUTPUT), 201)
+
+
+if __name__ == '__main__':
+    import argparse
+    from app import create_app
+
+    parser = argparse.ArgumentParser(description='Токены JSON API')
+    commands = parser.add_subparsers(dest='command', required=True)
+    issue = commands.add_parser('issue-token', help='выдать токен пользователю')
+    issue.add_argument('username')
+    issue.add_argument('name', help='назначение токена, например "Касса 1"')
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        user = User.query.filter_by(username=args.username).first()
+        if user is None:
+            parser.error(f'пользователь {args.username} не найден')
+        print(issue_token(user, args.name))
@@ -1,21 +1,29 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, session
-from database import db, Product, Customer, Sale, User
-from datetime import datetime
-from sqlalchemy import func
+from flask import Flask, Blueprint, Response, current_app, jsonify, render_template, request, redirect, url_for, flash, session, stream_with_context
+from database import db, Product, Customer, Sale, User, ReportJob, ArchivedPeriod, configure_sqlite
+from config import Config, engine_options
+from pagination import keyset_paginate
+import export
+import importer
+from migrations import upgrade_schema
+from instrumentation import init_instrumentation, get_metrics
+from counters import init_counters, get_counters
+from report_cache import init_report_cache, get_report_cache
+import report_jobs
+from search import search_products, search_customers
+from listing import list_products, list_customers
+from analytics import sales_series, bucket_starts, GRANULARITIES, SPLITS
+from api import api, json_response
+import forecast
+import stock
+import archive
+from conditional import init_conditional, etag_cached
+from sale_queue import init_sale_queue, place_sale
+from sales_service import create_order, SaleError, ProductNotFound, InsufficientStock
+from datetime import datetime, timedelta
+from sqlalchemy.orm import joinedload
 from functools import wraps
 
-app = Flask(__name__)
-app.config['SECRET_KEY'] = 'your-secret-key-123'
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///trade.db'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-
-db.init_app(app)
-
-# Включаем проверку внешних ключей для SQLite
-@app.before_request
-def before_request():
-    if 'sqlite' in app.config['SQLALCHEMY_DATABASE_URI']:
-        db.session.execute(db.text('PRAGMA foreign_keys=ON'))
+bp = Blueprint('main', __name__)
 
 # Декораторы для проверки ролей
 def login_required(f):
@@ -23,7 +31,7 @@ def login_required(f):
     def decorated_function(*args, **kwargs):
         if 'user_id' not in session:
             flash('Пожалуйста, войдите в систему', 'warning')
-            return redirect(url_for('login'))
+            return redirect(url_for('.login'))
         return f(*args, **kwargs)
     return decorated_function
 
@@ -32,7 +40,7 @@ def admin_required(f):
     def decorated_function(*args, **kwargs):
         if 'user_role' not in session or session['user_role'] != 'admin':
             flash('Доступ запрещен. Требуются права администратора', 'danger')
-            return redirect(url_for('index'))
+            return redirect(url_for('.index'))
         return f(*args, **kwargs)
     return decorated_function
 
@@ -41,12 +49,42 @@ def manager_or_admin_required(f):
     def decorated_function(*args, **kwargs):
         if 'user_role' not in session or session['user_role'] not in ['admin', 'manager']:
             flash('Доступ запрещен. Требуются права менеджера или администратора', 'danger')
-            return redirect(url_for('index'))
+            return redirect(url_for('.index'))
         return f(*args, **kwargs)
     return decorated_function
 
+def get_per_page(default_key):
+    """Размер страницы из параметра per_page с ограничением сверху"""
+    per_page = request.args.get('per_page', current_app.config[default_key], type=int)
+    return max(1, min(per_page, current_app.config['MAX_PER_PAGE']))
+
+def get_search_limit():
+    """Число подсказок из параметра limit с ограничением сверху"""
+    limit = request.args.get('limit', current_app.config['SEARCH_LIMIT'], type=int)
+    return max(1, min(limit, current_app.config['MAX_SEARCH_LIMIT']))
+
+def parse_period(values):
+    """Период отчета из полей start_date/end_date (ГГГГ-ММ-ДД).
+
+    Возвращает полуоткрытый интервал: конечная дата включается целиком.
+    """
+    start_date = datetime.strptime(values['start_date'], '%Y-%m-%d')
+    end_date = datetime.strptime(values['end_date'], '%Y-%m-%d')
+    return start_date, end_date + timedelta(days=1)
+
+def describe_period(report, start_date, end_date):
+    """Подписи периода [start_date; end_date) для шаблона и ссылок выгрузки"""
+    last_day = (end_date - timedelta(days=1)).strftime('%Y-%m-%d')
+    report['start_date'] = start_date.strftime('%d.%m.%Y')
+    report['end_date'] = last_day
+    report['period'] = {
+        'start_date': start_date.strftime('%Y-%m-%d'),
+        'end_date': last_day
+    }
+    return report
+
 # Авторизация
-@app.route('/login', methods=['GET', 'POST'])
+@bp.route('/login', methods=['GET', 'POST'])
 def login():
     if request.method == 'POST':
         username = request.form['username']
@@ -59,50 +97,45 @@ def login():
             session['username'] = user.username
             session['user_role'] = user.role
             flash(f'Добро пожаловать, {user.username}!', 'success')
-            return redirect(url_for('index'))
+            return redirect(url_for('.index'))
         else:
             flash('Неверное имя пользователя или пароль', 'danger')
     
     return render_template('login.html')
 
-@app.route('/logout')
+@bp.route('/logout')
 def logout():
     session.clear()
     flash('Вы вышли из системы', 'info')
-    return redirect(url_for('login'))
+    return redirect(url_for('.login'))
 
 # Главная страница
-@app.route('/')
+@bp.route('/')
 @login_required
 def index():
     """Отображение главной страницы с краткой статистикой"""
-    total_products = Product.query.count()
-    total_customers = Customer.query.count()
-    total_sales = Sale.query.count()
-    
-    # Выручка за сегодня
-    today = datetime.now().date()
-    today_sales = Sale.query.filter(
-        func.date(Sale.sale_date) == today
-    ).all()
-    today_revenue = sum(sale.total_price for sale in today_sales)
+    # Счетчики берутся из кэша, обновляемого при каждой записи
+    counters = get_counters().snapshot()
     
     return render_template('index.html', 
-                         total_products=total_products,
-                         total_customers=total_customers,
-                         total_sales=total_sales,
-                         today_revenue=today_revenue,
+                         total_products=counters['products'],
+                         total_customers=counters['customers'],
+                         total_sales=counters['sales'],
+                         today_revenue=counters['today_revenue'],
                          user_role=session.get('user_role'))
 
 # Управление товарами
-@app.route('/products')
+@bp.route('/products')
 @login_required
+@etag_cached(Product)
 def products():
     """Список товаров"""
-    all_products = Product.query.all()
-    return render_template('products.html', products=all_products, user_role=session.get('user_role'))
+    listing = list_products(request.args, get_per_page('PRODUCTS_PER_PAGE'))
+    return render_template('products.html', products=listing.page, listing=listing,
+                           low_stock=current_app.config['LOW_STOCK_THRESHOLD'],
+                           user_role=session.get('user_role'))
 
-@app.route('/products/add', methods=['POST'])
+@bp.route('/products/add', methods=['POST'])
 @manager_or_admin_required
 def add_product():
     """Добавление товара"""
@@ -112,12 +145,15 @@ def add_product():
     
     product = Product(name=name, price=price, quantity=quantity)
     db.session.add(product)
+    db.session.flush()
+    stock.record_movement(product.id, quantity, stock.RECEIPT, 'Новый товар')
     db.session.commit()
+    get_counters().add(products=1)
     
     flash('Товар успешно добавлен', 'success')
-    return redirect(url_for('products'))
+    return redirect(url_for('.products'))
 
-@app.route('/products/edit/<int:id>', methods=['GET', 'POST'])
+@bp.route('/products/edit/<int:id>', methods=['GET', 'POST'])
 @manager_or_admin_required
 def edit_product(id):
     """Редактирование товара"""
@@ -126,43 +162,63 @@ def edit_product(id):
     if request.method == 'POST':
         product.name = request.form['name']
         product.price = float(request.form['price'])
-        product.quantity = int(request.form['quantity'])
+        # Остаток меняется корректировкой на разницу с журналом движения
+        stock.change_stock({id: int(request.form['quantity']) - product.quantity},
+                           stock.ADJUSTMENT, 'Редактирование товара')
         
         db.session.commit()
+        # Отчеты группируются по названию товара
+        get_report_cache().clear()
         flash('Товар успешно обновлен', 'success')
-        return redirect(url_for('products'))
+        return redirect(url_for('.products'))
     
     return render_template('edit_product.html', product=product, user_role=session.get('user_role'))
 
-@app.route('/products/delete/<int:id>')
+@bp.route('/products/delete/<int:id>')
 @admin_required
 def delete_product(id):
     """Удаление товара"""
     product = db.session.get(Product, id)
     
     # Проверяем, есть ли продажи у этого товара
-    sales_count = Sale.query.filter_by(product_id=id).count()
-    if sales_count > 0:
+    if archive.has_sales('product_id', id):
         flash('Нельзя удалить товар, по которому были продажи', 'danger')
-        return redirect(url_for('products'))
+        return redirect(url_for('.products'))
     
     if product:
         db.session.delete(product)
         db.session.commit()
+        get_counters().add(products=-1)
         flash('Товар удален', 'success')
     else:
         flash('Товар не найден', 'danger')
-    return redirect(url_for('products'))
+    return redirect(url_for('.products'))
+
+@bp.route('/products/search')
+@login_required
+def products_search():
+    """Подсказки для поля выбора товара (JSON); in_stock=1 - только в наличии"""
+    products = search_products(request.args.get('q', ''), get_search_limit(),
+                               in_stock=request.args.get('in_stock') == '1')
+    return jsonify([{
+        'id': product.id,
+        'name': product.name,
+        'price': product.price,
+        'quantity': product.quantity,
+        'label': f'{product.name} - {product.price} ₽ (в наличии: {product.quantity})'
+    } for product in products])
 
 # Управление покупателями
-@app.route('/customers')
+@bp.route('/customers')
 @login_required
+@etag_cached(Customer)
 def customers():
     """Список покупателей"""
-    all_customers = Customer.query.all()
-    return render_template('customers.html', customers=all_customers, user_role=session.get('user_role'))
+    listing = list_customers(request.args, get_per_page('CUSTOMERS_PER_PAGE'))
+    return render_template('customers.html', customers=listing.page, listing=listing,
+                           user_role=session.get('user_role'))
 
-@app.route('/customers/add', methods=['POST'])
+@bp.route('/customers/add', methods=['POST'])
 @manager_or_admin_required
 def add_customer():
     """Добавление покупателя"""
@@ -173,11 +229,12 @@ def add_customer():
     customer = Customer(name=name, phone=phone, email=email)
     db.session.add(customer)
     db.session.commit()
+    get_counters().add(customers=1)
     
     flash('Покупатель успешно добавлен', 'success')
-    return redirect(url_for('customers'))
+    return redirect(url_for('.customers'))
 
-@app.route('/customers/edit/<int:id>', methods=['GET', 'POST'])
+@bp.route('/customers/edit/<int:id>', methods=['GET', 'POST'])
 @manager_or_admin_required
 def edit_customer(id):
     """Редактирование покупателя"""
@@ -190,135 +247,269 @@ def edit_customer(id):
         
         db.session.commit()
         flash('Покупатель успешно обновлен', 'success')
-        return redirect(url_for('customers'))
+        return redirect(url_for('.customers'))
     
     return render_template('edit_customer.html', customer=customer, user_role=session.get('user_role'))
 
-@app.route('/customers/delete/<int:id>')
+@bp.route('/customers/delete/<int:id>')
 @admin_required
 def delete_customer(id):
     """Удаление покупателя"""
     customer = db.session.get(Customer, id)
     
     # Проверяем, есть ли продажи у этого покупателя
-    sales_count = Sale.query.filter_by(customer_id=id).count()
-    if sales_count > 0:
+    if archive.has_sales('customer_id', id):
         flash('Нельзя удалить покупателя, у которого были продажи', 'danger')
-        return redirect(url_for('customers'))
+        return redirect(url_for('.customers'))
     
     if customer:
         db.session.delete(customer)
         db.session.commit()
+        get_counters().add(customers=-1)
         flash('Покупатель удален', 'success')
     else:
         flash('Покупатель не найден', 'danger')
-    return redirect(url_for('customers'))
+    return redirect(url_for('.customers'))
+
+@bp.route('/customers/search')
+@login_required
+def customers_search():
+    """Подсказки для поля выбора покупателя (JSON): поиск по имени, телефону, email"""
+    customers = search_customers(request.args.get('q', ''), get_search_limit())
+    return jsonify([{
+        'id': customer.id,
+        'name': customer.name,
+        'phone': customer.phone,
+        'email': customer.email,
+        'label': f'{customer.name} ({customer.phone})' if customer.phone else customer.name
+    } for customer in customers])
 
 # Продажи
-@app.route('/sales')
+@bp.route('/sales')
 @login_required
+@etag_cached(Sale, Product, Customer, ArchivedPeriod)
 def sales():
     """Список продаж и форма добавления"""
-    all_sales = Sale.query.order_by(Sale.sale_date.desc()).all()
-    products = Product.query.filter(Product.quantity > 0).all()
-    customers = Customer.query.all()
-    return render_template('sales.html', sales=all_sales, products=products, 
-                          customers=customers, user_role=session.get('user_role'))
+    sales_page = keyset_paginate(
+        Sale.query.options(joinedload(Sale.product), joinedload(Sale.customer)),
+        (Sale.sale_date, Sale.id),
+        after=request.args.get('after'),
+        before=request.args.get('before'),
+        per_page=get_per_page('SALES_PER_PAGE'),
+        descending=True
+    )
+    # Товары и покупатели подгружаются в форму через поиск, а не списком
+    return render_template('sales.html', sales=sales_page, user_role=session.get('user_role'))
 
-@app.route('/sales/add', methods=['POST'])
+@bp.route('/sales/add', methods=['POST'])
 @manager_or_admin_required
 def add_sale():
     """Добавление продажи"""
-    product_id = int(request.form['product_id'])
-    customer_id = int(request.form['customer_id'])
-    quantity = int(request.form['quantity'])
-    
-    product = db.session.get(Product, product_id)
-    
-    if not product:
+    # id товара и покупателя подставляет скрипт поиска; без него поля пустые
+    try:
+        product_id = int(request.form['product_id'])
+        customer_id = int(request.form['customer_id'])
+        quantity = int(request.form['quantity'])
+    except (KeyError, ValueError):
+        flash('Выберите товар и покупателя и укажите количество', 'danger')
+        return redirect(url_for('.sales'))
+    
+    try:
+        place_sale(product_id, customer_id, quantity)
+    except ProductNotFound:
         flash('Товар не найден', 'danger')
-        return redirect(url_for('sales'))
-    
-    # Проверка наличия товара
-    if product.quantity < quantity:
-        flash(f'Недостаточно товара! В наличии: {product.quantity}', 'danger')
-        return redirect(url_for('sales'))
-    
-    # Расчет стоимости
-    total_price = product.price * quantity
-    
-    # Уменьшаем количество товара
-    product.quantity -= quantity
-    
-    # Создаем запись о продаже
-    sale = Sale(
-        product_id=product_id,
-        customer_id=customer_id,
-        quantity=quantity,
-        total_price=total_price
-    )
-    
-    db.session.add(sale)
-    db.session.commit()
+        return redirect(url_for('.sales'))
+    except InsufficientStock as e:
+        flash(f'Недостаточно товара! В наличии: {e.available}', 'danger')
+        return redirect(url_for('.sales'))
+    except SaleError as e:
+        flash(str(e), 'danger')
+        return redirect(url_for('.sales'))
     
     flash('Продажа успешно оформлена', 'success')
-    return redirect(url_for('sales'))
+    return redirect(url_for('.sales'))
+
+@bp.route('/sales/cart', methods=['POST'])
+@manager_or_admin_required
+def add_order():
+    """Оформление заказа из нескольких товаров одной транзакцией"""
+    try:
+        customer_id = int(request.form['customer_id'])
+        lines = [
+            (int(product_id), int(quantity))
+            for product_id, quantity in zip(request.form.getlist('product_id'),
+                                            request.form.getlist('quantity'))
+            if product_id and quantity
+        ]
+    except (KeyError, ValueError):
+        flash('Выберите покупателя и товары и укажите количество', 'danger')
+        return redirect(url_for('.sales'))
+    
+    try:
+        count = create_order(customer_id, lines)
+    except ProductNotFound as e:
+        flash(f'Товар {e.product_id} не найден', 'danger')
+        return redirect(url_for('.sales'))
+    except InsufficientStock as e:
+        product = db.session.get(Product, e.product_id)
+        flash(f'Недостаточно товара «{product.name}»! В наличии: {e.available}', 'danger')
+        return redirect(url_for('.sales'))
+    except SaleError as e:
+        flash(str(e), 'danger')
+        return redirect(url_for('.sales'))
+    
+    flash(f'Заказ оформлен: позиций {count}', 'success')
+    return redirect(url_for('.sales'))
 
 # Отчеты
-@app.route('/reports', methods=['GET', 'POST'])
+@bp.route('/reports', methods=['GET', 'POST'])
 @login_required
 def reports():
     """Формирование отчетов за период"""
     report_data = None
     
     if request.method == 'POST':
-        start_date = datetime.strptime(request.form['start_date'], '%Y-%m-%d')
-        end_date = datetime.strptime(request.form['end_date'], '%Y-%m-%d')
-        end_date = end_date.replace(hour=23, minute=59, second=59)
-        
-        # Получаем продажи за период
-        sales_period = Sale.query.filter(
-            Sale.sale_date >= start_date,
-            Sale.sale_date <= end_date
-        ).order_by(Sale.sale_date).all()
+        start_date, end_date = parse_period(request.form)
         
-        # Статистика
-        total_sales = len(sales_period)
-        total_revenue = sum(sale.total_price for sale in sales_period)
+        # Большой период строится в фоне, страница задания опрашивает его состояние
+        if end_date - start_date > timedelta(days=current_app.config['REPORT_ASYNC_DAYS']):
+            job = report_jobs.submit_report(start_date, end_date)
+            return redirect(url_for('.report_job', job_id=job.id))
         
-        # Топ товаров
-        product_stats = {}
-        for sale in sales_period:
-            product_name = sale.product.name
-            if product_name in product_stats:
-                product_stats[product_name]['quantity'] += sale.quantity
-                product_stats[product_name]['revenue'] += sale.total_price
-            else:
-                product_stats[product_name] = {
-                    'quantity': sale.quantity,
-                    'revenue': sale.total_price
-                }
-        
-        report_data = {
-            'start_date': start_date.strftime('%d.%m.%Y'),
-            'end_date': request.form['end_date'],
-            'sales': sales_period,
-            'total_sales': total_sales,
-            'total_revenue': total_revenue,
-            'product_stats': product_stats
-        }
+        # Копия: закешированный отчет общий для всех запросов
+        try:
+            report_data = describe_period(dict(get_report_cache().get_report(
+                start_date, end_date, detail_limit=current_app.config['REPORT_DETAIL_LIMIT'])),
+                start_date, end_date)
+        except archive.ArchiveError as e:
+            flash(str(e), 'danger')
     
     return render_template('reports.html', report=report_data, user_role=session.get('user_role'))
 
+@bp.route('/reports/jobs/<int:job_id>')
+@login_required
+def report_job(job_id):
+    """Отчет, построенный фоновым заданием, или состояние задания"""
+    job = db.get_or_404(ReportJob, job_id)
+    report_data = None
+    if job.status == report_jobs.DONE:
+        report_data = describe_period(report_jobs.load_report(job.result), job.start_date, job.end_date)
+    return render_template('reports.html', report=report_data, job=job, user_role=session.get('user_role'))
+
+@bp.route('/reports/jobs/<int:job_id>/status')
+@login_required
+def report_job_status(job_id):
+    """Состояние фонового задания для опроса со страницы"""
+    job = report_jobs.revive_job(db.get_or_404(ReportJob, job_id))
+    return jsonify(status=job.status, error=job.error)
+
+@bp.route('/reports/analytics')
+@login_required
+def sales_analytics():
+    """Динамика продаж: график строится в браузере по данным sales_analytics_series"""
+    today = datetime.now().date()
+    return render_template('analytics.html', start_date=today.replace(year=today.year - 1, day=1),
+                           end_date=today, user_role=session.get('user_role'))
+
+@bp.route('/reports/analytics/series')
+@login_required
+@etag_cached(Sale, Product, Customer)
+def sales_analytics_series():
+    """Ряды выручки, количества и числа продаж за период (JSON)"""
+    try:
+        start_date, end_date = parse_period(request.args)
+    except (KeyError, ValueError):
+        return json_response({'error': 'Укажите период: start_date и end_date (ГГГГ-ММ-ДД)'}, 400)
+    granularity = request.args.get('granularity', 'month')
+    split = request.args.get('split') or None
+    top = request.args.get('top', current_app.config['ANALYTICS_TOP'], type=int)
+    top = max(1, min(top, current_app.config['MAX_ANALYTICS_TOP']))
+    if granularity not in GRANULARITIES or (split and split not in SPLITS):
+        return json_response({'error': 'Неизвестный интервал или разбивка'}, 400)
+    if end_date <= start_date:
+        return json_response({'error': 'Конечная дата раньше начальной'}, 400)
+    if len(bucket_starts(start_date, end_date, granularity)) > current_app.config['ANALYTICS_MAX_BUCKETS']:
+        return json_response({'error': 'Слишком много точек: выберите интервал крупнее'}, 400)
+    try:
+        return json_response(sales_series(start_date, end_date, granularity, split, top))
+    except archive.ArchiveError as e:
+        return json_response({'error': str(e)}, 400)
+
+@bp.route('/reports/export.<fmt>')
+@login_required
+def export_report(fmt):
+    """Потоковая выгрузка продаж (kind=sales) или статистики по товарам
+    (kind=products) за период в CSV или XLSX"""
+    if fmt not in ('csv', 'xlsx'):
+        return 'Неизвестный формат', 404
+    if fmt == 'xlsx' and export.Workbook is None:
+        flash('Для выгрузки в XLSX установите пакет openpyxl', 'danger')
+        return redirect(url_for('.reports'))
+    
+    try:
+        start_date, end_date = parse_period(request.args)
+    except (KeyError, ValueError):
+        flash('Укажите период выгрузки', 'danger')
+        return redirect(url_for('.reports'))
+    
+    # Строки читаются уже во время отдачи ответа: ошибку архива нужно
+    # обнаружить до начала потока
+    try:
+        archive.check_period(start_date, end_date)
+    except archive.ArchiveError as e:
+        flash(str(e), 'danger')
+        return redirect(url_for('.reports'))
+    
+    kind = request.args.get('kind', 'sales')
+    header, rows = export.export_rows(kind, start_date, end_date)
+    filename = f"{kind}_{request.args['start_date']}_{request.args['end_date']}.{fmt}"
+    if fmt == 'csv':
+        body, mimetype = export.iter_csv(header, rows), 'text/csv; charset=utf-8'
+    else:
+        body = export.iter_xlsx(header, rows)
+        mimetype = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    
+    # stream_with_context держит сессию БД открытой, пока строки отдаются клиенту
+    return Response(stream_with_context(body), mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename={filename}'})
+
+@bp.route('/reorder')
+@login_required
+def reorder():
+    """Товары, которые пора заказать: прогноз расхода по истории продаж"""
+    if forecast.np is None:
+        flash('Для прогноза закупок установите пакет numpy', 'danger')
+        return redirect(url_for('.index'))
+    show_all = request.args.get('all') == '1'
+    result = forecast.get_forecast_cache().get()
+    indexes = result.select(only_reorder=not show_all, limit=current_app.config['REORDER_LIMIT'])
+    return render_template('reorder.html', rows=result.rows(indexes), forecast=result,
+                           show_all=show_all, user_role=session.get('user_role'))
+
+@bp.route('/reorder/data')
+@login_required
+def reorder_data():
+    """Прогноз в JSON: all=1 - все товары, limit - не больше строк"""
+    if forecast.np is None:
+        return json_response({'error': 'Прогноз недоступен: не установлен numpy'}, 503)
+    result = forecast.get_forecast_cache().get()
+    limit = request.args.get('limit', type=int)
+    indexes = result.select(only_reorder=request.args.get('all') != '1', limit=limit)
+    return json_response({
+        'date': result.today.isoformat(),
+        'lead_days': result.lead_days,
+        'items': result.rows(indexes),
+    })
+
 # Управление пользователями (только для админа)
-@app.route('/users')
+@bp.route('/users')
 @admin_required
 def users():
     """Список пользователей"""
     all_users = User.query.all()
     return render_template('users.html', users=all_users, session=session)
 
-@app.route('/users/add', methods=['POST'])
+@bp.route('/users/add', methods=['POST'])
 @admin_required
 def add_user():
     """Добавление пользователя"""
@@ -330,16 +521,16 @@ def add_user():
     existing_user = User.query.filter_by(username=username).first()
     if existing_user:
         flash('Пользователь с таким именем уже существует', 'danger')
-        return redirect(url_for('users'))
+        return redirect(url_for('.users'))
     
     user = User(username=username, password=password, role=role)
     db.session.add(user)
     db.session.commit()
     
     flash('Пользователь успешно добавлен', 'success')
-    return redirect(url_for('users'))
+    return redirect(url_for('.users'))
 
-@app.route('/users/edit/<int:id>', methods=['GET', 'POST'])
+@bp.route('/users/edit/<int:id>', methods=['GET', 'POST'])
 @admin_required
 def edit_user(id):
     """Редактирование пользователя"""
@@ -352,11 +543,11 @@ def edit_user(id):
         
         db.session.commit()
         flash('Пользователь успешно обновлен', 'success')
-        return redirect(url_for('users'))
+        return redirect(url_for('.users'))
     
     return render_template('edit_user.html', user=user)
 
-@app.route('/users/delete/<int:id>')
+@bp.route('/users/delete/<int:id>')
 @admin_required
 def delete_user(id):
     """Удаление пользователя"""
@@ -365,7 +556,7 @@ def delete_user(id):
     # Нельзя удалить самого себя
     if user.id == session.get('user_id'):
         flash('Нельзя удалить свою учетную запись', 'danger')
-        return redirect(url_for('users'))
+        return redirect(url_for('.users'))
     
     if user:
         db.session.delete(user)
@@ -373,14 +564,75 @@ def delete_user(id):
         flash('Пользователь удален', 'success')
     else:
         flash('Пользователь не найден', 'danger')
-    return redirect(url_for('users'))
+    return redirect(url_for('.users'))
+
+# Импорт данных (только для админа)
+@bp.route('/import', methods=['GET', 'POST'])
+@admin_required
+def import_data():
+    """Массовый импорт товаров, покупателей или продаж из CSV"""
+    result = None
+    
+    if request.method == 'POST':
+        kind = request.form['kind']
+        upload = request.files.get('file')
+        if kind not in importer.IMPORTERS or not upload or not upload.filename:
+            flash('Выберите тип данных и файл CSV', 'danger')
+            return redirect(url_for('.import_data'))
+        
+        result = importer.IMPORTERS[kind](importer.open_text(upload.stream))
+        get_counters().invalidate()
+        get_report_cache().clear()
+        if result.error_count:
+            flash(f'Импорт завершен с ошибками: {result.error_count}', 'warning')
+        else:
+            flash(f'Импортировано строк: {result.inserted}', 'success')
+    
+    return render_template('import.html', result=result, user_role=session.get('user_role'))
+
+# Метрики в формате Prometheus (только для админа)
+@bp.route('/metrics')
+@admin_required
+def metrics():
+    """Гистограммы времени обработки и SQL по маршрутам"""
+    return Response(get_metrics().render(), mimetype='text/plain; version=0.0.4')
+
+def create_app(config=None):
+    """Фабрика приложения.
+
+    config - класс или словарь настроек поверх Config (переменные
+    окружения учитываются в Config).
+    """
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    if isinstance(config, dict):
+        app.config.update(config)
+    elif config is not None:
+        app.config.from_object(config)
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config)
+
+    db.init_app(app)
+    # Соединения SQLite настраиваются один раз при открытии, а не на каждый запрос
+    with app.app_context():
+        configure_sqlite(db.engine, app.config['SQLITE_PRAGMAS'])
+    init_instrumentation(app)
+    init_counters(app)
+    init_report_cache(app)
+    report_jobs.init_report_jobs(app)
+    app.register_blueprint(bp)
+    app.register_blueprint(api)
+    init_conditional(app)
+    forecast.init_forecast(app)
+    init_sale_queue(app)
+    return app
 
-# Создание таблиц при запуске
-def create_tables():
+# Создание таблиц и индексов при запуске
+def create_tables(app):
     with app.app_context():
-        db.create_all()
+        upgrade_schema()
         print("Таблицы созданы/проверены")
 
 if __name__ == '__main__':
-    create_tables()
-    app.run(debug=True)
\ No newline at end of file
+    app = create_app()
+    create_tables(app)
+    app.run(debug=True)
@@ -0,0 +1,236 @@
+"""Архив старых продаж в отдельных файлах SQLite.
+
+Закрытые месяцы (старше ARCHIVE_KEEP_MONTHS) переносятся из таблицы
+sales основной БД в файлы по годам (ARCHIVE_DIR/sales_ГГГГ.db), в
+основной БД остаются суточные итоги и сводка archived_periods. Отчеты
+по целым дням читают суточные итоги и архивов не касаются; детализация,
+отчеты за неполные дни и выгрузки берут продажи через sales_source(),
+который подключает (ATTACH) нужные архивы и объединяет их с основной
+таблицей.
+
+Запуск:
+    python archive.py [--keep-months 12] [--vacuum]
+    python archive.py --list
+
+Только для SQLite: в PostgreSQL ту же задачу решает секционирование
+таблицы sales по дате.
+"""
+import os
+from datetime import date, datetime, time, timedelta
+from flask import current_app
+from sqlalchemy import Column, Index, MetaData, Table, and_, exists, func, insert, select, union_all
+from sqlalchemy.orm import aliased
+from database import db, Sale, ArchivedPeriod
+
+# SQLITE_MAX_ATTACHED по умолчанию: больше файлов к соединению не подключить
+MAX_ATTACHED = 10
+
+_archive_tables = {}
+
+
+class ArchiveError(Exception):
+    """Архивирование или чтение архива невозможно"""
+
+
+def archive_dir():
+    """Каталог архивных файлов"""
+    return current_app.config.get('ARCHIVE_DIR') or os.path.join(current_app.instance_path, 'archive')
+
+
+def archive_file(year):
+    return f'sales_{year}.db'
+
+
+def archive_table(year):
+    """Таблица sales в подключенном архиве за год (те же столбцы, без
+    внешних ключей: товары и покупатели - в основной БД)"""
+    if year not in _archive_tables:
+        columns = [Column(column.name, column.type, primary_key=column.primary_key, nullable=column.nullable)
+                   for column in Sale.__table__.c]
+        table = Table('sales', MetaData(), *columns, schema=f'archive_{year}')
+        Index(f'ix_archive_{year}_sales_sale_date', table.c.sale_date)
+        # Проверки "есть ли продажи у товара/покупателя" перед удалением
+        Index(f'ix_archive_{year}_sales_product_id', table.c.product_id)
+        Index(f'ix_archive_{year}_sales_customer_id', table.c.customer_id)
+        _archive_tables[year] = table
+    return _archive_tables[year]
+
+
+def month_start(moment):
+    return date(moment.year, moment.month, 1)
+
+
+def add_months(day, months):
+    """Первое число месяца через months месяцев от месяца day"""
+    index = day.year * 12 + day.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def attach(years):
+    """Подключение архивов за годы years к соединению текущей сессии.
+
+    Подключение сохраняется вместе с соединением пула; лишние архивы
+    отключаются, только если не хватает места до MAX_ATTACHED.
+    """
+    years = set(years)
+    if len(years) > MAX_ATTACHED:
+        raise ArchiveError(f'Период захватывает больше {MAX_ATTACHED} архивных лет')
+    connection = db.session.connection()
+    attached = connection.info.setdefault('sales_archives', set())
+    for year in sorted(attached - years):
+        if len(attached | years) <= MAX_ATTACHED:
+            break
+        connection.exec_driver_sql(f'DETACH DATABASE archive_{year}')
+        attached.discard(year)
+    for year in sorted(years - attached):
+        path = os.path.join(archive_dir(), archive_file(year))
+        connection.exec_driver_sql(f'ATTACH DATABASE ? AS archive_{year}', (path,))
+        attached.add(year)
+    return [archive_table(year) for year in sorted(years)]
+
+
+def archived_years(start_date=None, end_date=None):
+    """Годы архивов с продажами периода [start_date; end_date)"""
+    query = select(ArchivedPeriod.month)
+    if start_date is not None:
+        query = query.where(ArchivedPeriod.month >= month_start(start_date))
+    if end_date is not None:
+        query = query.where(ArchivedPeriod.month <= (end_date - timedelta(microseconds=1)).date())
+    return sorted({month.year for month in db.session.scalars(query)})
+
+
+def check_period(start_date, end_date):
+    """Годы архивов периода; ArchiveError, если их не подключить к
+    одному соединению (больше MAX_ATTACHED)"""
+    years = archived_years(start_date, end_date)
+    if len(years) > MAX_ATTACHED:
+        raise ArchiveError(f'Период захватывает больше {MAX_ATTACHED} архивных лет, выберите период короче')
+    return years
+
+
+def sales_source(start_date, end_date):
+    """Продажи периода [start_date; end_date) для запросов вместо модели Sale.
+
+    Если период не заходит в архив - это сама модель Sale. Иначе -
+    сущность поверх UNION ALL основной таблицы и подключенных архивов;
+    условие периода подставляется в каждую ветку, чтобы каждая читалась
+    по своему индексу даты.
+    """
+    years = check_period(start_date, end_date)
+    if not years:
+        return Sale
+    parts = [
+        select(*table.c).where(table.c.sale_date >= start_date, table.c.sale_date < end_date)
+        for table in [Sale.__table__] + attach(years)
+    ]
+    return aliased(Sale, union_all(*parts).subquery('sales'))
+
+
+def has_sales(column, value):
+    """Есть ли продажи со значением value в столбце column ('product_id',
+    'customer_id') - в основной БД или в любом архиве"""
+    if db.session.query(exists().where(Sale.__table__.c[column] == value)).scalar():
+        return True
+    years = archived_years()
+    for i in range(0, len(years), MAX_ATTACHED):
+        for table in attach(years[i:i + MAX_ATTACHED]):
+            if db.session.query(exists().where(table.c[column] == value)).scalar():
+                return True
+    return False
+
+
+def archive_month(month):
+    """Перенос продаж месяца month в архив года; возвращает число продаж.
+
+    Две транзакции: сначала продажи копируются в архив (INSERT OR IGNORE
+    по id) и фиксируются, затем, если в архиве есть все копируемые
+    продажи, они удаляются из основной БД вместе с обновлением сводки.
+    В режиме WAL SQLite не фиксирует транзакцию по нескольким файлам
+    атомарно, поэтому удаление никогда не фиксируется вместе с копией.
+    Сбой между транзакциями оставляет продажи в обоих местах (отчеты
+    посчитают их дважды) - повторный запуск завершает перенос.
+    """
+    os.makedirs(archive_dir(), exist_ok=True)
+    table, = attach([month.year])
+    connection = db.session.connection()
+    table.create(connection, checkfirst=True)
+    # Индексы, появившиеся позже, создаются и в уже существующих файлах
+    for index in table.indexes:
+        index.create(connection, checkfirst=True)
+
+    sales = Sale.__table__
+    # Самая новая продажа остается в основной БД: SQLite выдает новые id
+    # как MAX(id) + 1, и пустая таблица начала бы их заново
+    newest = db.session.scalar(select(func.max(sales.c.id)))
+    moved = and_(sales.c.sale_date >= datetime.combine(month, time.min),
+                 sales.c.sale_date < datetime.combine(add_months(month, 1), time.min),
+                 sales.c.id != newest)
+    db.session.execute(insert(table).prefix_with('OR IGNORE').from_select(
+        [column.name for column in sales.c], select(*sales.c).where(moved)))
+    db.session.commit()
+
+    # После COMMIT сессия может получить другое соединение пула
+    table, = attach([month.year])
+    copied = sales.c.id.in_(select(table.c.id))
+    count, quantity, revenue, total = db.session.execute(select(
+        func.count().filter(copied),
+        func.coalesce(func.sum(sales.c.quantity).filter(copied), 0),
+        func.coalesce(func.sum(sales.c.total_price).filter(copied), 0),
+        func.count()).where(moved)).one()
+    if count != total:
+        db.session.rollback()
+        raise ArchiveError(f'В архиве {archive_file(month.year)} только {count} из {total} '
+                           f'продаж за {month:%Y-%m}, основная БД не изменена')
+    if not count:
+        db.session.commit()
+        return 0
+
+    period = db.session.get(ArchivedPeriod, month)
+    if period is None:
+        period = ArchivedPeriod(month=month, file=archive_file(month.year))
+        db.session.add(period)
+    # Месяц может дополняться: например, после импорта старых продаж
+    period.sales_count = (period.sales_count or 0) + count
+    period.quantity = (period.quantity or 0) + quantity
+    period.revenue = (period.revenue or 0) + revenue
+    db.session.execute(sales.delete().where(moved, copied))
+    db.session.commit()
+    return count
+
+
+def archive_sales(keep_months, today=None):
+    """Перенос в архив всех месяцев старше keep_months последних.
+
+    Возвращает список (месяц, перенесено продаж).
+    """
+    if db.session.get_bind().dialect.name != 'sqlite':
+        raise ArchiveError('Архив в отдельных файлах поддерживается только для SQLite')
+    boundary = add_months(month_start(today or date.today()), -keep_months)
+    month = func.strftime('%Y-%m-01', Sale.sale_date)
+    months = db.session.scalars(select(month).where(
+        Sale.sale_date < datetime.combine(boundary, time.min)).distinct().order_by(month)).all()
+    return [(value, archive_month(date.fromisoformat(value))) for value in months]
+
+
+if __name__ == '__main__':
+    import argparse
+    from app import create_app
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--keep-months', type=int, help='месяцев в основной БД (по умолчанию ARCHIVE_KEEP_MONTHS)')
+    parser.add_argument('--vacuum', action='store_true', help='сжать основную БД после переноса')
+    parser.add_argument('--list', action='store_true', help='показать архивные месяцы')
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        if args.list:
+            for period in ArchivedPeriod.query.order_by(ArchivedPeriod.month):
+                print(f"{period.month:%Y-%m}\t{period.file}\t{period.sales_count} продаж\t{period.revenue:.2f} ₽")
+        else:
+            keep_months = args.keep_months if args.keep_months is not None else app.config['ARCHIVE_KEEP_MONTHS']
+            for month, count in archive_sales(keep_months):
+                print(f"{month[:7]}: перенесено продаж {count}")
+            if args.vacuum:
+                db.session.connection().exec_driver_sql('VACUUM')
+                print("Основная БД сжата")
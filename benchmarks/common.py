@@ -0,0 +1,16 @@
+"""Общие функции бенчмарков"""
+from app import create_app
+
+
+def make_app(db_path, pragmas=None):
+    """Приложение, подключенное к файлу БД бенчмарка.
+
+    pragmas заменяет SQLITE_PRAGMAS из настроек по умолчанию.
+    """
+    config = {
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{db_path}',
+        'SQLALCHEMY_ENGINE_OPTIONS': {'connect_args': {'timeout': 60}},
+    }
+    if pragmas is not None:
+        config['SQLITE_PRAGMAS'] = pragmas
+    return create_app(config)
@@ -0,0 +1,133 @@
+"""Прогноз закупок по всему каталогу: 50 000 товаров x 3 года истории.
+
+Запуск: python -m benchmarks.forecast --products 50000 --days 1095
+
+Суточные итоги генерируются прямо в daily_sales_rollup (продажи
+для прогноза не нужны) и кэшируются в benchmarks/data. Спрос
+распределен по Ципфу: популярные товары продаются каждый день, хвост
+каталога - изредка. Измеряются чтение истории в матрицу, расчет
+показателей и пиковая память; для сравнения - тот же расчет циклом
+Python по товарам на части каталога.
+"""
+import argparse
+import os
+import sqlite3
+import statistics
+import time
+import tracemalloc
+from datetime import date, timedelta
+import numpy as np
+from database import db
+from benchmarks.common import make_app
+import forecast
+
+CACHE_DIR = os.path.join(os.path.dirname(__file__), 'data')
+
+
+def generate_database(path, products, days, today, random_seed=42):
+    """БД с products товарами и суточными итогами за days дней до today"""
+    app = make_app(path)
+    with app.app_context():
+        db.create_all()
+        db.engine.dispose()
+    rng = np.random.default_rng(random_seed)
+    # Вероятность продажи в день: от 1 у лидеров до ~0.5% в хвосте
+    probability = np.minimum(1.0, 3.0 / np.arange(1, products + 1) ** 0.6)
+    start = today - timedelta(days=days)
+    connection = sqlite3.connect(path)
+    with connection:
+        connection.executemany(
+            'INSERT INTO products (id, name, price, quantity) VALUES (?, ?, ?, ?)',
+            ((i, f'Товар {i}', 100.0, int(quantity)) for i, quantity in
+             enumerate(rng.integers(0, 500, products).tolist(), start=1)))
+        for offset in range(days):
+            sold = np.flatnonzero(rng.random(products) < probability)
+            quantity = rng.poisson(np.maximum(probability[sold] * 20, 1)) + 1
+            day = (start + timedelta(days=offset)).isoformat()
+            connection.executemany(
+                'INSERT INTO daily_sales_rollup (date, product_id, quantity, revenue, sales_count) '
+                'VALUES (?, ?, ?, ?, 1)',
+                ((day, product_id, units, units * 100.0)
+                 for product_id, units in zip((sold + 1).tolist(), quantity.tolist())))
+    connection.close()
+
+
+def seeded_database(products, days, today):
+    path = os.path.join(CACHE_DIR, f'forecast_{products}x{days}_{today.isoformat()}.db')
+    if not os.path.exists(path):
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        partial = path + '.tmp'
+        if os.path.exists(partial):
+            os.remove(partial)
+        generate_database(partial, products, days, today)
+        os.replace(partial, path)
+    return path
+
+
+def loop_forecast(demand, quantities, window, alpha, lead_days, review_days, service_z):
+    """Тот же расчет циклом Python по товарам (для сравнения)"""
+    result = []
+    for row, quantity in zip(demand.tolist(), quantities.tolist()):
+        level = row[0]
+        for value in row[1:]:
+            level = alpha * value + (1 - alpha) * level
+        recent = row[-window:]
+        spread = statistics.pstdev(recent)
+        cover = quantity / level if level > 0 else float('inf')
+        target = level * (lead_days + review_days) + service_z * spread * lead_days ** 0.5
+        result.append((cover, max(0, target - quantity)))
+    return result
+
+
+def run(products, days, iterations, loop_sample):
+    today = date.today()
+    app = make_app(seeded_database(products, days, today))
+    config = app.config
+    with app.app_context():
+        rows = db.session.execute(db.text('SELECT COUNT(*) FROM daily_sales_rollup')).scalar()
+        print(f'Товаров: {products}, дней истории в БД: {days}, строк суточных итогов: {rows}')
+        print(f"Окно прогноза: {config['FORECAST_HISTORY_DAYS']} дней")
+
+        load_times, compute_times = [], []
+        for _ in range(iterations):
+            started = time.perf_counter()
+            loaded = forecast.load_demand(today, config['FORECAST_HISTORY_DAYS'])
+            loaded_at = time.perf_counter()
+            result = forecast.Forecast(today, *loaded,
+                                       window=config['FORECAST_WINDOW_DAYS'],
+                                       alpha=config['FORECAST_ALPHA'],
+                                       lead_days=config['FORECAST_LEAD_DAYS'],
+                                       review_days=config['FORECAST_REVIEW_DAYS'],
+                                       service_z=config['FORECAST_SERVICE_Z'])
+            load_times.append((loaded_at - started) * 1000)
+            compute_times.append((time.perf_counter() - loaded_at) * 1000)
+
+        tracemalloc.start()
+        forecast.build_forecast(today)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        ids, names, quantities, demand = loaded
+        started = time.perf_counter()
+        loop_forecast(demand[:loop_sample], quantities[:loop_sample],
+                      config['FORECAST_WINDOW_DAYS'], config['FORECAST_ALPHA'],
+                      config['FORECAST_LEAD_DAYS'], config['FORECAST_REVIEW_DAYS'],
+                      config['FORECAST_SERVICE_Z'])
+        loop_ms = (time.perf_counter() - started) * 1000 * len(ids) / loop_sample
+        db.engine.dispose()
+
+    print(f'Чтение истории в матрицу: медиана {statistics.median(load_times):8.1f} мс')
+    print(f'Расчет (NumPy):           медиана {statistics.median(compute_times):8.1f} мс')
+    print(f'Расчет циклом Python:     оценка  {loop_ms:8.1f} мс (по {loop_sample} товарам)')
+    print(f'Пиковая память:           {peak / 1024 / 1024:8.1f} МБ')
+    print(f'К заказу: {len(result.select())} товаров')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--products', type=int, default=50000)
+    parser.add_argument('--days', type=int, default=3 * 365)
+    parser.add_argument('--iterations', type=int, default=5)
+    parser.add_argument('--loop-sample', type=int, default=2000)
+    args = parser.parse_args()
+    run(args.products, args.days, args.iterations, args.loop_sample)
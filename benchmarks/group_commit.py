@@ -0,0 +1,107 @@
+"""Поток одиночных продаж: COMMIT на каждую продажу против групповой фиксации.
+
+Запуск: python -m benchmarks.group_commit --threads 16 --sales 200
+
+Потоки-клиенты (как потоки gunicorn --threads) оформляют по одной
+продаже подряд. Путь "по одной" - create_sale в каждом потоке, путь
+"пакетами" - заявки в очередь sale_queue, которую проводит один
+поток-писатель. Измеряются продажи в секунду и задержка каждой
+продажи (p50, p99). Каталог и запасы у путей одинаковые, часть заявок
+отклоняется из-за нехватки остатка.
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import threading
+import time
+from database import db, Product, Customer, Sale
+from sales_service import create_sale, InsufficientStock
+from sale_queue import SaleQueue
+from benchmarks.common import make_app
+
+
+def prepare(app, products_count, stock):
+    with app.app_context():
+        db.create_all()
+        products = [Product(name=f'Товар {i}', price=100 + i, quantity=stock)
+                    for i in range(products_count)]
+        customer = Customer(name='Покупатель')
+        db.session.add_all(products + [customer])
+        db.session.commit()
+        return [product.id for product in products], customer.id
+
+
+def percentile(values, share):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+
+def bench(app, sell, threads_count, sales, product_ids, customer_id):
+    """threads_count потоков по sales продаж; sell(product_id, customer_id)"""
+    latencies, rejected = [], []
+    barrier = threading.Barrier(threads_count + 1)
+
+    def client(seed):
+        rng = random.Random(seed)
+        own = []
+        with app.app_context():
+            barrier.wait()
+            for _ in range(sales):
+                started = time.perf_counter()
+                try:
+                    sell(rng.choice(product_ids), customer_id)
+                except InsufficientStock:
+                    rejected.append(1)
+                own.append((time.perf_counter() - started) * 1000)
+        latencies.extend(own)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(threads_count)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    started = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - started, latencies, len(rejected)
+
+
+def run(threads_count, sales, products_count, stock, batch_size, batch_wait_ms):
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in ('по одной', 'пакетами'):
+            app = make_app(os.path.join(tmp, f'{len(results)}.db'))
+            product_ids, customer_id = prepare(app, products_count, stock)
+            if name == 'по одной':
+                sell = lambda product_id, customer_id: create_sale(product_id, customer_id, 1)
+            else:
+                sale_queue = SaleQueue(app, batch_size, batch_wait_ms / 1000)
+                sell = lambda product_id, customer_id: sale_queue.create_sale(product_id, customer_id, 1)
+            elapsed, latencies, rejected = bench(app, sell, threads_count, sales, product_ids, customer_id)
+            if name == 'пакетами':
+                sale_queue.stop()
+            with app.app_context():
+                sold = Sale.query.count()
+                remaining = db.session.query(db.func.sum(Product.quantity)).scalar()
+                db.engine.dispose()
+            assert sold + remaining == products_count * stock, 'остатки не сходятся с продажами'
+            results[name] = (elapsed, latencies, sold, rejected)
+
+    print(f"Потоков: {threads_count}, продаж на поток: {sales}, товаров: {products_count}, "
+          f"пакет: до {batch_size} продаж / {batch_wait_ms} мс")
+    for name, (elapsed, latencies, sold, rejected) in results.items():
+        print(f"{name:>9}: {len(latencies) / elapsed:6.0f} заявок/с, продано {sold}, отказов {rejected}, "
+              f"задержка p50 {statistics.median(latencies):6.1f} мс, p99 {percentile(latencies, 0.99):6.1f} мс")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--sales', type=int, default=200, help='продаж на поток')
+    parser.add_argument('--products', type=int, default=50)
+    parser.add_argument('--stock', type=int, default=60, help='остаток каждого товара')
+    parser.add_argument('--batch-size', type=int, default=200)
+    parser.add_argument('--batch-wait-ms', type=float, default=5)
+    args = parser.parse_args()
+    run(args.threads, args.sales, args.products, args.stock, args.batch_size, args.batch_wait_ms)
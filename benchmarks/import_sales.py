@@ -0,0 +1,57 @@
+"""Импорт истории продаж из CSV: миллион строк на SQLite.
+
+Запуск: python -m benchmarks.import_sales --rows 1000000
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+from database import db, Product, Customer, Sale
+import importer
+from benchmarks.common import make_app
+
+
+def write_csv(path, rows, products, customers):
+    """CSV продаж со ссылками на товары и покупателей по имени"""
+    rng = random.Random(1)
+    start = datetime(2022, 1, 1)
+    with open(path, 'w', encoding='utf-8', newline='') as file:
+        file.write('product,customer,quantity,sale_date\n')
+        for i in range(rows):
+            sale_date = start + timedelta(seconds=i * 60)
+            file.write(f'Товар {rng.randrange(products)},Покупатель {rng.randrange(customers)},'
+                       f'{rng.randint(1, 5)},{sale_date:%Y-%m-%d %H:%M:%S}\n')
+
+
+def run(rows, products, customers):
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, 'sales.csv')
+        write_csv(csv_path, rows, products, customers)
+        app = make_app(os.path.join(tmp, 'import.db'))
+        with app.app_context():
+            db.create_all()
+            db.session.add_all([Product(name=f'Товар {i}', price=100 + i, quantity=0)
+                                for i in range(products)])
+            db.session.add_all([Customer(name=f'Покупатель {i}') for i in range(customers)])
+            db.session.commit()
+
+            started = time.perf_counter()
+            with open(csv_path, encoding='utf-8', newline='') as file:
+                result = importer.import_sales(file)
+            elapsed = time.perf_counter() - started
+            assert Sale.query.count() == result.inserted
+            db.engine.dispose()
+
+    print(f"Строк: {rows}, импортировано: {result.inserted}, ошибок: {result.error_count}")
+    print(f"Время: {elapsed:.1f} с, {result.inserted / elapsed:.0f} строк/с")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--products', type=int, default=5000)
+    parser.add_argument('--customers', type=int, default=20000)
+    args = parser.parse_args()
+    run(args.rows, args.products, args.customers)
@@ -0,0 +1,70 @@
+"""Заказы из нескольких позиций: построчные продажи против одной транзакции.
+
+Запуск: python -m benchmarks.order_commits --orders 200 --lines 15
+
+Построчный путь - это create_sale на каждую позицию (как 15 отправок
+формы /sales/add, каждая со своим COMMIT). Пакетный путь - create_order
+на весь заказ (один COMMIT).
+"""
+import argparse
+import os
+import tempfile
+import time
+from database import db, Product, Customer
+from sales_service import create_sale, create_order
+from benchmarks.common import make_app
+
+
+def prepare(app, products_count):
+    """Каталог с большим запасом и один покупатель"""
+    with app.app_context():
+        db.create_all()
+        products = [Product(name=f'Товар {i}', price=100 + i, quantity=10 ** 9)
+                    for i in range(products_count)]
+        customer = Customer(name='Покупатель')
+        db.session.add_all(products + [customer])
+        db.session.commit()
+        return [product.id for product in products], customer.id
+
+
+def bench_per_line(orders, product_ids, customer_id):
+    commits = 0
+    started = time.perf_counter()
+    for _ in range(orders):
+        for product_id in product_ids:
+            create_sale(product_id, customer_id, 1)
+            commits += 1
+    return time.perf_counter() - started, commits
+
+
+def bench_batch(orders, product_ids, customer_id):
+    lines = [(product_id, 1) for product_id in product_ids]
+    started = time.perf_counter()
+    for _ in range(orders):
+        create_order(customer_id, lines)
+    return time.perf_counter() - started, orders
+
+
+def run(orders, lines):
+    with tempfile.TemporaryDirectory() as tmp:
+        app = make_app(os.path.join(tmp, 'orders.db'))
+        product_ids, customer_id = prepare(app, lines)
+        with app.app_context():
+            results = {
+                'построчно': bench_per_line(orders, product_ids, customer_id),
+                'одной транзакцией': bench_batch(orders, product_ids, customer_id),
+            }
+            db.engine.dispose()
+
+    print(f"Заказов: {orders}, позиций в заказе: {lines}")
+    for name, (elapsed, commits) in results.items():
+        print(f"{name:>18}: {elapsed:.2f} с, {commits / elapsed:.0f} коммитов/с, "
+              f"{orders * lines / elapsed:.0f} позиций/с, {orders / elapsed:.0f} заказов/с")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--orders', type=int, default=200)
+    parser.add_argument('--lines', type=int, default=15)
+    args = parser.parse_args()
+    run(args.orders, args.lines)
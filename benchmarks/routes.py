@@ -0,0 +1,175 @@
+"""Бенчмарк маршрутов app.py на наполненной БД одного размера.
+
+Запуск: python -m benchmarks.routes --sales 100000 --output result.json
+(обычно вызывается из run_benchmarks.py - по процессу на размер БД).
+
+Для каждого маршрута измеряются перцентили задержки, число SQL-запросов
+на запрос и пиковая память (tracemalloc) при обработке запроса. Отчеты
+измеряются дважды: с кэшем отчетов, сброшенным перед каждым запросом
+(построение отчета), и из кэша (_cached).
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import tempfile
+import time
+import tracemalloc
+from datetime import timedelta
+from urllib.parse import urlencode
+from sqlalchemy import event, func
+from database import db, Product, Customer, Sale
+from benchmarks.common import make_app
+from report_cache import get_report_cache
+import seed
+from migrations import upgrade_schema
+
+CACHE_DIR = os.path.join(os.path.dirname(__file__), 'data')
+
+
+def seeded_database(sales):
+    """Путь к БД с sales продажами; генерируется один раз и кэшируется"""
+    path = os.path.join(CACHE_DIR, f'sales_{sales}.db')
+    if not os.path.exists(path):
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        partial = path + '.tmp'
+        if os.path.exists(partial):
+            os.remove(partial)
+        seed_app = make_app(partial)
+        with seed_app.app_context():
+            seed.seed(products=max(100, sales // 200), customers=max(100, sales // 20),
+                      sales=sales, days=730)
+            db.engine.dispose()
+        os.replace(partial, path)
+    return path
+
+
+def scenarios(app):
+    """Маршруты и данные запросов; даты отчетов - от последней продажи"""
+    with app.app_context():
+        last_sale = db.session.query(func.max(Sale.sale_date)).scalar()
+        product = Product.query.order_by(Product.quantity.desc()).first()
+        product.quantity = 10 ** 9
+        db.session.commit()
+        product_id = product.id
+        customer_id = db.session.query(func.min(Customer.id)).scalar()
+
+    def period(days):
+        return {'start_date': (last_sale - timedelta(days=days)).strftime('%Y-%m-%d'),
+                'end_date': last_sale.strftime('%Y-%m-%d')}
+
+    def clear_report_cache():
+        get_report_cache(app).clear()
+
+    # (имя, метод, адрес, данные, действие перед каждым запросом)
+    return [
+        ('index', 'GET', '/', None, None),
+        ('products', 'GET', '/products', None, None),
+        ('customers', 'GET', '/customers', None, None),
+        ('sales', 'GET', '/sales', None, None),
+        ('reports_month', 'POST', '/reports', period(30), clear_report_cache),
+        ('reports_year', 'POST', '/reports', period(365), clear_report_cache),
+        ('reports_month_cached', 'POST', '/reports', period(30), None),
+        ('reports_year_cached', 'POST', '/reports', period(365), None),
+        ('analytics_monthly', 'GET', '/reports/analytics/series?' +
+         urlencode(dict(period(730), granularity='month')), None, None),
+        ('analytics_by_product', 'GET', '/reports/analytics/series?' +
+         urlencode(dict(period(730), granularity='week', split='product')), None, None),
+        ('sales_add', 'POST', '/sales/add',
+         {'product_id': product_id, 'customer_id': customer_id, 'quantity': 1}, None),
+        ('login', 'POST', '/login', {'username': 'admin', 'password': 'admin123'}, None),
+    ]
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def bench_route(client, method, url, data, iterations, statements, prepare=None):
+    """Задержки, число запросов и пиковая память одного маршрута;
+    prepare выполняется перед каждым запросом вне замера"""
+    def call():
+        if prepare is not None:
+            prepare()
+        return client.open(url, method=method, data=data)
+
+    for _ in range(2):
+        call()
+
+    timings = []
+    query_counts = []
+    for _ in range(iterations):
+        if prepare is not None:
+            prepare()
+        statements.clear()
+        started = time.perf_counter()
+        response = client.open(url, method=method, data=data)
+        timings.append((time.perf_counter() - started) * 1000)
+        query_counts.append(len(statements))
+
+    # Память - отдельным проходом: tracemalloc замедляет выполнение
+    tracemalloc.start()
+    call()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {
+        'status': response.status_code,
+        'mean_ms': round(statistics.mean(timings), 3),
+        'p50_ms': round(percentile(timings, 0.50), 3),
+        'p95_ms': round(percentile(timings, 0.95), 3),
+        'p99_ms': round(percentile(timings, 0.99), 3),
+        'queries': statistics.median(query_counts),
+        'peak_memory_kb': round(peak / 1024, 1),
+    }
+
+
+def run(sales, iterations):
+    source = seeded_database(sales)
+    work_dir = tempfile.mkdtemp()
+    work_db = os.path.join(work_dir, 'bench.db')
+    # Копия: добавление продаж в бенчмарке не портит кэшированную БД
+    shutil.copy(source, work_db)
+    app = make_app(work_db)
+    app.config['TESTING'] = True
+    statements = []
+    with app.app_context():
+        # Кэшированная БД могла быть создана до появления новых таблиц
+        upgrade_schema()
+        event.listen(db.engine, 'before_cursor_execute',
+                     lambda *args: statements.append(args[2]))
+
+    results = {}
+    try:
+        routes = scenarios(app)
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess['user_id'] = 1
+            sess['username'] = 'admin'
+            sess['user_role'] = 'admin'
+        for name, method, url, data, prepare in routes:
+            results[name] = bench_route(client, method, url, data, iterations, statements, prepare)
+    finally:
+        with app.app_context():
+            db.engine.dispose()
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sales', type=int, default=1000)
+    parser.add_argument('--iterations', type=int, default=30)
+    parser.add_argument('--output', help='файл JSON для результатов')
+    args = parser.parse_args()
+
+    results = run(args.sales, args.iterations)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(results, file, ensure_ascii=False, indent=2)
+    for name, result in results.items():
+        print(f"{name:>20}: p50 {result['p50_ms']:8.2f} мс, p95 {result['p95_ms']:8.2f} мс, "
+              f"p99 {result['p99_ms']:8.2f} мс, запросов {result['queries']:4}, "
+              f"память {result['peak_memory_kb']:9.1f} КБ")
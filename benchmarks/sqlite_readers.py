@@ -0,0 +1,118 @@
+"""Читатели отчетов при одновременной записи продаж: журнал DELETE против WAL.
+
+Запуск: python -m benchmarks.sqlite_readers --seconds 5 --readers 4
+
+Писатель непрерывно оформляет заказы (create_order), читатели строят
+отчет за последние 30 дней. Для каждого режима журнала измеряются
+задержки чтения и пропускная способность обеих сторон.
+"""
+import argparse
+import os
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import func
+from database import db, Product, Customer, Sale, DEFAULT_SQLITE_PRAGMAS
+from report_engine import build_report
+from sales_service import create_order
+from benchmarks.common import make_app
+import seed
+
+MODES = {
+    'DELETE': dict(DEFAULT_SQLITE_PRAGMAS, journal_mode='DELETE', synchronous='FULL'),
+    'WAL': dict(DEFAULT_SQLITE_PRAGMAS),
+}
+
+
+def run_mode(db_path, pragmas, seconds, readers_count, order_lines):
+    app = make_app(db_path, pragmas)
+    with app.app_context():
+        product_ids = [product_id for product_id, in db.session.query(Product.id).limit(order_lines)]
+        db.session.query(Product).filter(Product.id.in_(product_ids)).update(
+            {'quantity': 10 ** 9}, synchronize_session=False)
+        db.session.commit()
+        customer_id = db.session.query(func.min(Customer.id)).scalar()
+        last_sale = db.session.query(func.max(Sale.sale_date)).scalar()
+    period = (datetime.combine(last_sale.date() - timedelta(days=29), datetime.min.time()),
+              datetime.combine(last_sale.date() + timedelta(days=1), datetime.min.time()))
+
+    stop = threading.Event()
+    latencies = []
+    orders = []
+    errors = []
+
+    def writer():
+        lines = [(product_id, 1) for product_id in product_ids]
+        with app.app_context():
+            while not stop.is_set():
+                try:
+                    create_order(customer_id, lines)
+                    orders.append(1)
+                except Exception as e:
+                    errors.append(e)
+
+    def reader():
+        with app.app_context():
+            while not stop.is_set():
+                started = time.perf_counter()
+                try:
+                    build_report(*period, detail_limit=0)
+                    latencies.append((time.perf_counter() - started) * 1000)
+                except Exception as e:
+                    errors.append(e)
+                db.session.remove()
+
+    threads = [threading.Thread(target=writer)] + \
+        [threading.Thread(target=reader) for _ in range(readers_count)]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    with app.app_context():
+        db.engine.dispose()
+
+    latencies.sort()
+    return {
+        'reads_per_sec': len(latencies) / seconds,
+        'read_p50_ms': statistics.median(latencies) if latencies else 0,
+        'read_p99_ms': latencies[int(len(latencies) * 0.99)] if latencies else 0,
+        'read_max_ms': latencies[-1] if latencies else 0,
+        'orders_per_sec': len(orders) / seconds,
+        'errors': len(errors),
+    }
+
+
+def run(seconds, readers_count, sales, order_lines):
+    tmp = tempfile.mkdtemp()
+    try:
+        template = os.path.join(tmp, 'template.db')
+        seed_app = make_app(template, {'journal_mode': 'DELETE'})
+        with seed_app.app_context():
+            seed.seed(products=500, customers=1000, sales=sales, days=90)
+            db.engine.dispose()
+
+        for mode, pragmas in MODES.items():
+            db_path = os.path.join(tmp, f'{mode}.db')
+            shutil.copy(template, db_path)
+            result = run_mode(db_path, pragmas, seconds, readers_count, order_lines)
+            print(f"{mode:>6}: чтений {result['reads_per_sec']:6.0f}/с, "
+                  f"p50 {result['read_p50_ms']:6.1f} мс, p99 {result['read_p99_ms']:7.1f} мс, "
+                  f"макс {result['read_max_ms']:7.1f} мс | заказов {result['orders_per_sec']:5.0f}/с | "
+                  f"ошибок {result['errors']}")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--sales', type=int, default=100000)
+    parser.add_argument('--order-lines', type=int, default=20)
+    args = parser.parse_args()
+    run(args.seconds, args.readers, args.sales, args.order_lines)
@@ -0,0 +1,84 @@
+"""Конкурентное списание остатков несколькими процессами.
+
+Запуск: python -m benchmarks.stock_contention --processes 4 --stock 2000
+
+Каждый процесс - отдельное приложение со своим пулом соединений к общей
+файловой SQLite, как воркеры gunicorn. Проверяется, что продано ровно
+столько, сколько было на складе, и измеряется число продаж в секунду.
+"""
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+from database import db, Product, Customer, Sale
+from sales_service import create_sale, InsufficientStock
+from benchmarks.common import make_app
+
+
+def worker(db_path, product_id, customer_id, attempts, start_event, results):
+    """Процесс-продавец: attempts попыток продать по одной единице"""
+    app = make_app(db_path)
+    sold = rejected = 0
+    with app.app_context():
+        start_event.wait()
+        for _ in range(attempts):
+            try:
+                create_sale(product_id, customer_id, 1)
+                sold += 1
+            except InsufficientStock:
+                rejected += 1
+    results.put((sold, rejected))
+
+
+def run(processes, stock, attempts):
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'contention.db')
+        app = make_app(db_path)
+        with app.app_context():
+            db.create_all()
+            product = Product(name='Дефицит', price=100, quantity=stock)
+            customer = Customer(name='Покупатель')
+            db.session.add_all([product, customer])
+            db.session.commit()
+            product_id, customer_id = product.id, customer.id
+            db.engine.dispose()
+
+        start_event = multiprocessing.Event()
+        results = multiprocessing.Queue()
+        workers = [
+            multiprocessing.Process(target=worker, args=(
+                db_path, product_id, customer_id, attempts, start_event, results))
+            for _ in range(processes)
+        ]
+        for process in workers:
+            process.start()
+        started = time.perf_counter()
+        start_event.set()
+        totals = [results.get() for _ in workers]
+        elapsed = time.perf_counter() - started
+        for process in workers:
+            process.join()
+
+        sold = sum(s for s, _ in totals)
+        rejected = sum(r for _, r in totals)
+        with app.app_context():
+            remaining = db.session.get(Product, product_id).quantity
+            sales_rows = Sale.query.count()
+            db.engine.dispose()
+
+    print(f"Процессов: {processes}, попыток: {processes * attempts}, склад: {stock}")
+    print(f"Продано: {sold}, отказов: {rejected}, остаток: {remaining}, строк sales: {sales_rows}")
+    print(f"Время: {elapsed:.2f} с, {sold / elapsed:.0f} продаж/с")
+    oversold = sold > stock or remaining < 0 or sales_rows != sold
+    print("ПЕРЕПРОДАЖА!" if oversold else "Перепродаж нет")
+    return 1 if oversold else 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--processes', type=int, default=4)
+    parser.add_argument('--stock', type=int, default=1000)
+    parser.add_argument('--attempts', type=int, default=400, help='попыток на процесс')
+    args = parser.parse_args()
+    raise SystemExit(run(args.processes, args.stock, args.attempts))
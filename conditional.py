@@ -0,0 +1,105 @@
+"""Условные ответы (ETag / 304) для списков и долгое кэширование статики.
+
+Версия коллекции - MAX(первичного ключа), MAX(updated_at) и число
+записей из кэша счетчиков (для моделей, у которых он есть): оба
+максимума читаются по индексам за O(log n), а удаление меняет число
+записей. Если версия, параметры запроса и пользователь
+совпадают с тем, что браузер уже получил (If-None-Match), страница не
+строится и отдается пустой ответ 304.
+
+Файлы static/ подключаются по адресу с хешем содержимого (?v=...),
+поэтому их можно кэшировать на год: новая версия файла - новый адрес.
+"""
+import hashlib
+import os
+from functools import wraps
+from flask import current_app, request, session
+from sqlalchemy import func, select
+from database import db, Product, Customer, Sale
+from counters import get_counters
+
+STATIC_MAX_AGE = 365 * 24 * 60 * 60
+
+# Модель -> имя счетчика в кэше главной страницы
+COUNTERS = {Product: 'products', Customer: 'customers', Sale: 'sales'}
+
+_static_hashes = {}
+
+
+def collection_version(*models):
+    """Версия коллекций одним запросом из скалярных подзапросов"""
+    columns = []
+    for model in models:
+        key, = model.__table__.primary_key.columns
+        columns.append(select(func.max(key)).scalar_subquery())
+        if hasattr(model, 'updated_at'):
+            columns.append(select(func.max(model.updated_at)).scalar_subquery())
+    row = db.session.execute(select(*columns)).one()
+    counters = get_counters().snapshot()
+    return [str(value) for value in row] + [str(counters[COUNTERS[model]]) for model in models
+                                            if model in COUNTERS]
+
+
+def etag_cached(*models):
+    """Декоратор GET-страницы списка: 304, если коллекции не менялись"""
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            # Страница с уведомлениями (flash) всегда строится заново
+            if request.method != 'GET' or session.get('_flashes'):
+                return f(*args, **kwargs)
+            parts = [request.endpoint, request.full_path, session.get('username'),
+                     session.get('user_role'), static_version()] + collection_version(*models)
+            etag = hashlib.sha1('\0'.join(map(str, parts)).encode('utf-8')).hexdigest()
+            if etag in request.if_none_match:
+                response = current_app.response_class(status=304)
+            else:
+                response = current_app.make_response(f(*args, **kwargs))
+            response.set_etag(etag)
+            # Браузер хранит копию, но сверяется с сервером при каждом заходе
+            response.headers['Cache-Control'] = 'private, no-cache'
+            return response
+        return decorated_function
+    return decorator
+
+
+def static_hash(filename):
+    """Хеш содержимого файла из static/ (пересчитывается при изменении файла)"""
+    path = os.path.join(current_app.static_folder, filename)
+    try:
+        mtime = os.stat(path).st_mtime
+    except OSError:
+        return None
+    cached = _static_hashes.get(path)
+    if cached is None or cached[0] != mtime:
+        with open(path, 'rb') as f:
+            cached = (mtime, hashlib.sha1(f.read()).hexdigest()[:12])
+        _static_hashes[path] = cached
+    return cached[1]
+
+
+def static_version():
+    """Общая версия файлов static/: входит в ETag страниц, которые на них ссылаются"""
+    return ''.join(static_hash(name) or '' for name in sorted(os.listdir(current_app.static_folder)))
+
+
+def _add_static_hash(endpoint, values):
+    if endpoint == 'static' and 'v' not in values:
+        version = static_hash(values.get('filename', ''))
+        if version:
+            values['v'] = version
+
+
+def _static_cache_headers(response):
+    if request.endpoint == 'static' and request.args.get('v') and response.status_code == 200:
+        response.cache_control.public = True
+        response.cache_control.max_age = STATIC_MAX_AGE
+        response.cache_control.immutable = True
+        response.cache_control.no_cache = None
+    return response
+
+
+def init_conditional(app):
+    """Адреса статики с хешем содержимого и заголовки долгого кэширования"""
+    app.url_defaults(_add_static_hash)
+    app.after_request(_static_cache_headers)
@@ -0,0 +1,174 @@
+"""Кэш счетчиков главной страницы.
+
+Число товаров, покупателей, продаж и выручка за сегодня хранятся в
+кэше и обновляются сквозной записью (write-through) после каждого
+успешного COMMIT, поэтому главная страница обходится без запросов к БД.
+Раз в DASHBOARD_CACHE_TTL секунд, а также при смене дня значения
+пересчитываются одним запросом: так исправляются изменения, сделанные
+в обход приложения (init_db.py, seed.py, другие процессы без общего кэша).
+
+По умолчанию кэш живет в памяти процесса. Если задан REDIS_URL и
+установлен пакет redis, счетчики хранятся в Redis и общие для всех
+воркеров.
+"""
+import threading
+import time
+from datetime import date
+from flask import current_app
+from sqlalchemy import func, select
+from database import db, Product, Customer, Sale, DailySalesRollup, ArchivedPeriod
+
+try:
+    import redis
+except ImportError:  # redis нужен только для общего кэша
+    redis = None
+
+DASHBOARD_KEY = 'dashboard'
+COUNT_FIELDS = ('products', 'customers', 'sales')
+
+
+class MemoryBackend:
+    """Хранилище в памяти процесса: ключ -> словарь значений со сроком жизни"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.items = {}
+
+    def get(self, key):
+        with self.lock:
+            item = self.items.get(key)
+            if item is None:
+                return None
+            expires, values = item
+            if expires <= time.monotonic():
+                del self.items[key]
+                return None
+            return dict(values)
+
+    def set(self, key, values, ttl):
+        with self.lock:
+            self.items[key] = (time.monotonic() + ttl, dict(values))
+
+    def incr(self, key, deltas):
+        """Прибавляет deltas к значениям, только если ключ есть в кэше"""
+        with self.lock:
+            item = self.items.get(key)
+            if item is None:
+                return
+            values = item[1]
+            for field, delta in deltas.items():
+                values[field] += delta
+
+    def delete(self, key):
+        with self.lock:
+            self.items.pop(key, None)
+
+
+class RedisBackend:
+    """Общее для всех процессов хранилище в Redis (хеш с TTL)"""
+
+    # Приращение только существующего хеша: иначе после истечения TTL
+    # появился бы неполный хеш без срока жизни
+    INCR_SCRIPT = """
+    if redis.call('exists', KEYS[1]) == 1 then
+        for i = 1, #ARGV, 2 do
+            redis.call('hincrbyfloat', KEYS[1], ARGV[i], ARGV[i + 1])
+        end
+    end
+    """
+
+    def __init__(self, url, prefix='trade:'):
+        if redis is None:
+            raise RuntimeError('Для REDIS_URL установите пакет redis')
+        self.client = redis.Redis.from_url(url, decode_responses=True)
+        self.prefix = prefix
+        self.incr_script = self.client.register_script(self.INCR_SCRIPT)
+
+    def get(self, key):
+        values = self.client.hgetall(self.prefix + key)
+        return values or None
+
+    def set(self, key, values, ttl):
+        pipe = self.client.pipeline()
+        pipe.delete(self.prefix + key)
+        pipe.hset(self.prefix + key, mapping=values)
+        pipe.expire(self.prefix + key, ttl)
+        pipe.execute()
+
+    def incr(self, key, deltas):
+        args = []
+        for field, delta in deltas.items():
+            args.extend([field, delta])
+        self.incr_script(keys=[self.prefix + key], args=args)
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+
+class DashboardCounters:
+    """Счетчики главной страницы поверх хранилища MemoryBackend/RedisBackend"""
+
+    def __init__(self, backend, ttl):
+        self.backend = backend
+        self.ttl = ttl
+
+    def snapshot(self):
+        """Текущие значения: из кэша или, если их нет, одним запросом к БД"""
+        values = self.backend.get(DASHBOARD_KEY)
+        if values is None or values['today'] != date.today().isoformat():
+            return self.reconcile()
+        return self._decode(values)
+
+    def reconcile(self):
+        """Пересчет всех счетчиков одним SELECT и запись в кэш"""
+        today = date.today()
+
+        def count(model):
+            return select(func.count()).select_from(model).scalar_subquery()
+
+        # Продажи, перенесенные в архив (archive.py), тоже учитываются
+        archived = select(func.coalesce(func.sum(ArchivedPeriod.sales_count), 0)).scalar_subquery()
+        revenue = (
+            select(func.coalesce(func.sum(DailySalesRollup.revenue), 0))
+            .where(DailySalesRollup.date == today)
+            .scalar_subquery()
+        )
+        row = db.session.execute(
+            select(count(Product), count(Customer), count(Sale) + archived, revenue)).one()
+        values = dict(zip(COUNT_FIELDS, row[:3]), today_revenue=row[3], today=today.isoformat())
+        self.backend.set(DASHBOARD_KEY, values, self.ttl)
+        return self._decode(values)
+
+    def add(self, **deltas):
+        """Сквозная запись после COMMIT, например add(products=1)"""
+        self.backend.incr(DASHBOARD_KEY, deltas)
+
+    def record_sales(self, count, revenue, day):
+        """Учет проведенных продаж (count штук на сумму revenue за день day)"""
+        deltas = {'sales': count}
+        if day == date.today():
+            deltas['today_revenue'] = revenue
+        self.backend.incr(DASHBOARD_KEY, deltas)
+
+    def invalidate(self):
+        """Сброс кэша после массовых изменений; пересчет при следующем чтении"""
+        self.backend.delete(DASHBOARD_KEY)
+
+    @staticmethod
+    def _decode(values):
+        # Redis возвращает строки, приращения hincrbyfloat - дробные строки
+        result = {field: int(float(values[field])) for field in COUNT_FIELDS}
+        result['today_revenue'] = float(values['today_revenue'])
+        return result
+
+
+def init_counters(app):
+    """Создание кэша счетчиков по настройкам приложения"""
+    url = app.config.get('REDIS_URL')
+    backend = RedisBackend(url) if url else MemoryBackend()
+    app.extensions['counters'] = DashboardCounters(backend, app.config['DASHBOARD_CACHE_TTL'])
+
+
+def get_counters(app=None):
+    """Кэш счетчиков текущего приложения"""
+    return (app or current_app).extensions['counters']
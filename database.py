@@ -1,9 +1,40 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
 from flask_login import UserMixin
+from sqlalchemy import event
 
 db = SQLAlchemy()
 
+# Настройки соединений SQLite по умолчанию
+DEFAULT_SQLITE_PRAGMAS = {
+    'foreign_keys': 'ON',
+    # Читатели не ждут писателя, писатель не ждет читателей
+    'journal_mode': 'WAL',
+    # В режиме WAL fsync только при контрольной точке
+    'synchronous': 'NORMAL',
+    # Ожидание блокировки вместо немедленной ошибки "database is locked", мс
+    'busy_timeout': 5000,
+    # Отрицательное значение - размер кэша страниц в КиБ
+    'cache_size': -64000,
+    'mmap_size': 256 * 1024 * 1024,
+}
+
+
+def configure_sqlite(engine, pragmas):
+    """Выполнение PRAGMA один раз для каждого нового соединения движка.
+
+    Для других СУБД ничего не делает.
+    """
+    if engine.dialect.name != 'sqlite' or not pragmas:
+        return
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+        cursor.close()
+
 class User(UserMixin, db.Model):
     """Модель пользователя"""
     __tablename__ = 'users'
@@ -20,11 +51,17 @@ class User(UserMixin, db.Model):
 class Product(db.Model):
     """Модель товара"""
     __tablename__ = 'products'
+    __table_args__ = (
+        # Сортировки списка товаров с keyset-пагинацией по (столбец, id)
+        db.Index('ix_products_name_id', 'name', 'id'),
+        db.Index('ix_products_price_id', 'price', 'id'),
+        db.Index('ix_products_updated_at_id', 'updated_at', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
     price = db.Column(db.Float, nullable=False)
-    quantity = db.Column(db.Integer, default=0)
+    quantity = db.Column(db.Integer, default=0, index=True)
     created_at = db.Column(db.DateTime, default=datetime.now)
     updated_at = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now)
     
@@ -37,6 +74,11 @@ class Product(db.Model):
 class Customer(db.Model):
     """Модель покупателя"""
     __tablename__ = 'customers'
+    __table_args__ = (
+        # Сортировки списка покупателей с keyset-пагинацией по (столбец, id)
+        db.Index('ix_customers_name_id', 'name', 'id'),
+        db.Index('ix_customers_updated_at_id', 'updated_at', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
@@ -54,13 +96,133 @@ class Customer(db.Model):
 class Sale(db.Model):
     """Модель продажи"""
     __tablename__ = 'sales'
+    __table_args__ = (
+        # Отчеты за период: диапазон по дате с группировкой по товару
+        db.Index('ix_sales_sale_date_product_id', 'sale_date', 'product_id'),
+        # Продажи товара (проверка перед удалением, статистика по товару)
+        db.Index('ix_sales_product_id_sale_date', 'product_id', 'sale_date'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     product_id = db.Column(db.Integer, db.ForeignKey('products.id'), nullable=False)
-    customer_id = db.Column(db.Integer, db.ForeignKey('customers.id'), nullable=False)
+    customer_id = db.Column(db.Integer, db.ForeignKey('customers.id'), nullable=False, index=True)
     quantity = db.Column(db.Integer, nullable=False)
     total_price = db.Column(db.Float, nullable=False)
     sale_date = db.Column(db.DateTime, default=datetime.now)
     
     def __repr__(self):
-        return f'<Sale {self.id}>'
\ No newline at end of file
+        return f'<Sale {self.id}>'
+
+class DailySalesRollup(db.Model):
+    """Суточные итоги продаж по товару (поддерживаются при каждой продаже)"""
+    __tablename__ = 'daily_sales_rollup'
+    
+    date = db.Column(db.Date, primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id'), primary_key=True)
+    quantity = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0)
+    sales_count = db.Column(db.Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<DailySalesRollup {self.date} product={self.product_id}>'
+
+class ArchivedPeriod(db.Model):
+    """Месяц продаж, перенесенный в архивный файл (archive.py).
+
+    Итоги по дням и товарам остаются в daily_sales_rollup, здесь -
+    сводка по месяцу и имя файла, в котором лежат сами продажи.
+    """
+    __tablename__ = 'archived_periods'
+    
+    month = db.Column(db.Date, primary_key=True)
+    file = db.Column(db.String(255), nullable=False)
+    sales_count = db.Column(db.Integer, nullable=False, default=0)
+    quantity = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now)
+    
+    def __repr__(self):
+        return f'<ArchivedPeriod {self.month} {self.file}>'
+
+class StockMovement(db.Model):
+    """Движение товара: продажа, поступление или корректировка остатка.
+
+    Записи только добавляются - в той же транзакции, что и изменение
+    Product.quantity, поэтому сумма движений товара равна его остатку.
+    """
+    __tablename__ = 'stock_movements'
+    __table_args__ = (
+        # Движения товара после снимка: диапазон по id внутри товара
+        db.Index('ix_stock_movements_product_id_id', 'product_id', 'id'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    # Движения удаляются вместе с товаром (удалить можно только товар без продаж)
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id', ondelete='CASCADE'), nullable=False)
+    # sale | receipt | adjustment
+    kind = db.Column(db.String(20), nullable=False)
+    # Изменение остатка: продажа - отрицательное
+    quantity = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+    note = db.Column(db.String(200))
+    
+    def __repr__(self):
+        return f'<StockMovement {self.kind} product={self.product_id} {self.quantity:+d}>'
+
+class StockSnapshot(db.Model):
+    """Остаток товара с учетом всех движений до movement_id включительно.
+
+    Снимки пишутся периодически и только для товаров, которые двигались
+    с прошлого снимка: остаток на дату - последний снимок товара до этой
+    даты плюс движения после него.
+    """
+    __tablename__ = 'stock_snapshots'
+    
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id', ondelete='CASCADE'), primary_key=True)
+    movement_id = db.Column(db.Integer, primary_key=True)
+    taken_at = db.Column(db.DateTime, nullable=False)
+    quantity = db.Column(db.Integer, nullable=False)
+    
+    def __repr__(self):
+        return f'<StockSnapshot product={self.product_id} movement={self.movement_id}>'
+
+class ReportJob(db.Model):
+    """Фоновое построение отчета за большой период"""
+    __tablename__ = 'report_jobs'
+    __table_args__ = (
+        # Не более одного незавершенного задания на период: повторные
+        # запросы присоединяются к уже поставленному
+        db.Index('ux_report_jobs_active_period', 'start_date', 'end_date', unique=True,
+                 sqlite_where=db.text("status IN ('queued', 'running')"),
+                 postgresql_where=db.text("status IN ('queued', 'running')")),
+        db.Index('ix_report_jobs_status_id', 'status', 'id'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    start_date = db.Column(db.DateTime, nullable=False)
+    end_date = db.Column(db.DateTime, nullable=False)
+    # queued -> running -> done | failed
+    status = db.Column(db.String(20), nullable=False, default='queued')
+    result = db.Column(db.Text)
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.now)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    
+    def __repr__(self):
+        return f'<ReportJob {self.id} {self.status}>'
+
+class ApiToken(db.Model):
+    """Токен доступа к JSON API (хранится только хеш)"""
+    __tablename__ = 'api_tokens'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    name = db.Column(db.String(100), nullable=False)
+    token_hash = db.Column(db.String(64), unique=True, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.now)
+    
+    user = db.relationship('User')
+    
+    def __repr__(self):
+        return f'<ApiToken {self.name}>'
@@ -0,0 +1,93 @@
+"""Потоковая выгрузка продаж и отчетов в CSV/XLSX"""
+import csv
+import io
+import tempfile
+from database import db, Product, Customer
+from archive import sales_source
+from report_engine import build_report
+
+try:
+    from openpyxl import Workbook
+except ImportError:  # XLSX-выгрузка необязательна
+    Workbook = None
+
+# Строк, которые СУБД отдает за одно обращение к курсору
+EXPORT_BATCH_SIZE = 1000
+
+SALES_HEADER = ['Дата', 'Товар', 'Покупатель', 'Кол-во', 'Сумма']
+PRODUCTS_HEADER = ['Товар', 'Продано (шт)', 'Выручка']
+
+
+def sales_rows(start_date, end_date):
+    """Продажи за период [start_date; end_date) кортежами, порциями с курсора.
+
+    Объекты ORM не создаются, в памяти одновременно находится не больше
+    EXPORT_BATCH_SIZE строк. Продажи из архива (archive.py) подключаются
+    автоматически.
+    """
+    Sale = sales_source(start_date, end_date)
+    query = db.session.query(
+        Sale.sale_date, Product.name, Customer.name, Sale.quantity, Sale.total_price
+    ).join(Product, Product.id == Sale.product_id).join(
+        Customer, Customer.id == Sale.customer_id
+    ).filter(
+        Sale.sale_date >= start_date,
+        Sale.sale_date < end_date
+    ).order_by(Sale.sale_date, Sale.id).yield_per(EXPORT_BATCH_SIZE)
+
+    for sale_date, product, customer, quantity, total_price in query:
+        yield [sale_date.strftime('%d.%m.%Y %H:%M'), product, customer, quantity, total_price]
+
+
+def product_rows(start_date, end_date):
+    """Статистика по товарам за период (та же, что на странице отчета)"""
+    report = build_report(start_date, end_date, detail_limit=0)
+    for name, stats in report['product_stats'].items():
+        yield [name, stats['quantity'], stats['revenue']]
+
+
+def export_rows(kind, start_date, end_date):
+    """Заголовок и генератор строк для вида выгрузки kind"""
+    if kind == 'products':
+        return PRODUCTS_HEADER, product_rows(start_date, end_date)
+    return SALES_HEADER, sales_rows(start_date, end_date)
+
+
+def iter_csv(header, rows):
+    """CSV частями по EXPORT_BATCH_SIZE строк.
+
+    Разделитель ';' и BOM - чтобы файл сразу открывался в Excel
+    с русской локалью.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, delimiter=';')
+    buffer.write('\ufeff')
+    writer.writerow(header)
+    for i, row in enumerate(rows, 1):
+        writer.writerow(row)
+        if i % EXPORT_BATCH_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def iter_xlsx(header, rows, chunk_size=64 * 1024):
+    """XLSX в режиме write_only (строки сразу уходят во временный файл).
+
+    XLSX - это zip-архив, поэтому отдать первые байты можно только после
+    записи последней строки; память при этом не растет.
+    """
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Продажи')
+    sheet.append(header)
+    for row in rows:
+        sheet.append(row)
+    with tempfile.TemporaryFile() as file:
+        workbook.save(file)
+        file.seek(0)
+        while True:
+            chunk = file.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
@@ -0,0 +1,165 @@
+"""Прогноз расхода товаров и рекомендации по закупке.
+
+Суточные продажи всех товаров за FORECAST_HISTORY_DAYS дней читаются
+из суточных итогов одним запросом в матрицу NumPy (товар x день), и все
+показатели считаются над ней целиком, без циклов по товарам:
+
+- среднее за последние FORECAST_WINDOW_DAYS дней и разброс за то же окно;
+- экспоненциальное сглаживание с коэффициентом FORECAST_ALPHA - одно
+  умножение матрицы на вектор весов;
+- на сколько дней хватит остатка при сглаженном расходе;
+- сколько заказать, чтобы остатка хватило на срок поставки и период до
+  следующей закупки с запасом на разброс спроса.
+
+Прогноз хранится до следующей продажи или изменения товаров: ключ кэша -
+версия коллекций (MAX(id), MAX(updated_at), число записей) и текущая дата.
+"""
+import math
+import threading
+from datetime import date, timedelta
+from itertools import chain
+from flask import current_app
+from sqlalchemy import Integer, func, select
+from database import db, Product, Sale, DailySalesRollup
+from conditional import collection_version
+
+try:
+    import numpy as np
+except ImportError:  # прогноз недоступен, остальное приложение работает
+    np = None
+
+
+def day_offset(column, start):
+    """Номер дня столбца-даты, считая от start (SQL)"""
+    if db.session.get_bind().dialect.name == 'sqlite':
+        return db.cast(func.julianday(column) - func.julianday(start.isoformat()), Integer)
+    return column - start
+
+
+def load_demand(today, history_days):
+    """Товары и матрица продаж за history_days дней до today (не включая).
+
+    Возвращает (ids, names, quantities, demand): demand[i, j] - продано
+    товара ids[i] в день номер j от начала истории.
+    """
+    # Через соединение, а не ORM-сессию: строки не проходят загрузку ORM
+    connection = db.session.connection()
+    products = connection.execute(
+        select(Product.id, Product.name, Product.quantity).order_by(Product.id)).all()
+    ids = np.fromiter((row[0] for row in products), dtype=np.int64, count=len(products))
+    names = [row[1] for row in products]
+    quantities = np.fromiter((row[2] or 0 for row in products), dtype=np.float64, count=len(products))
+
+    start = today - timedelta(days=history_days)
+    rows = connection.execute(
+        select(DailySalesRollup.product_id, day_offset(DailySalesRollup.date, start),
+               DailySalesRollup.quantity)
+        .where(DailySalesRollup.date >= start, DailySalesRollup.date < today)
+    ).all()
+    flat = np.fromiter(chain.from_iterable(rows), dtype=np.int64, count=3 * len(rows)).reshape(-1, 3)
+
+    demand = np.zeros((len(ids), history_days), dtype=np.float32)
+    # (дата, товар) в суточных итогах уникальны - достаточно присваивания
+    demand[np.searchsorted(ids, flat[:, 0]), flat[:, 1]] = flat[:, 2]
+    return ids, names, quantities, demand
+
+
+def smoothing_weights(days, alpha):
+    """Веса экспоненциального сглаживания для дней 0..days-1 (сумма - 1):
+    s_0 = x_0, s_t = alpha * x_t + (1 - alpha) * s_(t-1)"""
+    weights = alpha * (1 - alpha) ** np.arange(days - 1, -1, -1, dtype=np.float64)
+    weights[0] = (1 - alpha) ** (days - 1)
+    return weights.astype(np.float32)
+
+
+class Forecast:
+    """Прогноз по всему каталогу: массивы NumPy по элементу на товар"""
+
+    def __init__(self, today, ids, names, quantities, demand, window, alpha, lead_days, review_days, service_z):
+        self.today = today
+        self.lead_days = lead_days
+        self.ids = ids
+        self.names = names
+        self.quantities = quantities
+        recent = demand[:, -window:]
+        self.average = recent.mean(axis=1, dtype=np.float64)
+        spread = recent.std(axis=1, dtype=np.float64)
+        self.smoothed = (demand @ smoothing_weights(demand.shape[1], alpha)).astype(np.float64)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.days_of_cover = np.where(self.smoothed > 0, quantities / self.smoothed, np.inf)
+        # Запас на срок поставки и до следующей закупки плюс страховой запас
+        target = self.smoothed * (lead_days + review_days) + service_z * spread * math.sqrt(lead_days)
+        self.reorder_quantity = np.ceil(np.maximum(target - quantities, 0)).astype(np.int64)
+        # Заказать нужно за lead_days дней до того, как остаток закончится
+        self.order_in_days = np.maximum(self.days_of_cover - lead_days, 0)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def select(self, only_reorder=True, limit=None):
+        """Номера товаров по возрастанию запаса в днях: все или только те,
+        что пора заказывать"""
+        order = np.argsort(self.days_of_cover, kind='stable')
+        if only_reorder:
+            order = order[self.reorder_quantity[order] > 0]
+        return order[:limit]
+
+    def rows(self, indexes):
+        """Строки для шаблона и JSON по номерам товаров"""
+        rows = []
+        for i in indexes.tolist():
+            cover = self.days_of_cover[i]
+            rows.append({
+                'id': int(self.ids[i]),
+                'name': self.names[i],
+                'quantity': int(self.quantities[i]),
+                'average': round(float(self.average[i]), 2),
+                'smoothed': round(float(self.smoothed[i]), 2),
+                'days_of_cover': round(float(cover), 1) if math.isfinite(cover) else None,
+                'reorder_quantity': int(self.reorder_quantity[i]),
+                'order_by': (self.today + timedelta(days=int(self.order_in_days[i]))).isoformat()
+                if math.isfinite(cover) else None,
+            })
+        return rows
+
+
+def build_forecast(today=None, config=None):
+    """Прогноз по суточным итогам с параметрами из настроек приложения"""
+    config = config or current_app.config
+    today = today or date.today()
+    ids, names, quantities, demand = load_demand(today, config['FORECAST_HISTORY_DAYS'])
+    return Forecast(today, ids, names, quantities, demand,
+                    window=config['FORECAST_WINDOW_DAYS'],
+                    alpha=config['FORECAST_ALPHA'],
+                    lead_days=config['FORECAST_LEAD_DAYS'],
+                    review_days=config['FORECAST_REVIEW_DAYS'],
+                    service_z=config['FORECAST_SERVICE_Z'])
+
+
+class ForecastCache:
+    """Последний построенный прогноз и версия данных, по которой он построен"""
+
+    def __init__(self):
+        self.entry = (None, None)
+        self.lock = threading.Lock()
+
+    def get(self):
+        """Прогноз для текущих данных; пересчитывается после продаж и
+        изменений товаров, одновременно - не более одного пересчета"""
+        key = [date.today().isoformat()] + collection_version(Sale, Product)
+        if self.entry[0] != key:
+            with self.lock:
+                if self.entry[0] != key:
+                    self.entry = (key, build_forecast())
+        return self.entry[1]
+
+
+def init_forecast(app):
+    """Создание кэша прогноза"""
+    app.extensions['forecast'] = ForecastCache()
+
+
+def get_forecast_cache(app=None):
+    """Кэш прогноза текущего приложения"""
+    return (app or current_app).extensions['forecast']
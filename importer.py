@@ -0,0 +1,228 @@
+"""Массовый импорт товаров, покупателей и истории продаж из CSV.
+
+Запуск: python importer.py products|customers|sales файл.csv
+
+Файл читается потоково, строки проверяются и вставляются порциями
+(executemany), каждая порция - одна транзакция. Ошибочные строки
+пропускаются и попадают в отчет, не прерывая импорт.
+"""
+import csv
+import io
+import itertools
+import math
+from datetime import datetime
+from sqlalchemy import insert, select
+from database import db, Product, Customer, Sale
+from rollup import record_sales
+import stock
+
+# Строк в одной порции (одна транзакция)
+IMPORT_CHUNK_SIZE = 20000
+# Сколько сообщений об ошибках хранить в отчете
+MAX_REPORTED_ERRORS = 1000
+
+
+class ImportResult:
+    """Итог импорта: число вставленных строк и ошибки по номерам строк"""
+
+    def __init__(self):
+        self.inserted = 0
+        self.error_count = 0
+        self.errors = []
+
+    def add_error(self, line, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((line, message))
+
+    def __repr__(self):
+        return f'<ImportResult inserted={self.inserted} errors={self.error_count}>'
+
+
+def read_chunks(file, chunk_size):
+    """Потоковое чтение CSV порциями [(номер строки, словарь), ...].
+
+    Разделитель (',' или ';') определяется по заголовку, так что файлы
+    выгрузки из отчетов читаются без правки.
+    """
+    header = file.readline()
+    delimiter = ';' if header.count(';') > header.count(',') else ','
+    fields = [name.strip().lower() for name in next(csv.reader([header], delimiter=delimiter))]
+    reader = csv.DictReader(file, fieldnames=fields, delimiter=delimiter)
+    # Первая строка данных - вторая строка файла
+    numbered = enumerate(reader, 2)
+    while True:
+        chunk = list(itertools.islice(numbered, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _required(row, field):
+    value = (row.get(field) or '').strip()
+    if not value:
+        raise ValueError(f'не заполнено поле {field}')
+    return value
+
+
+def _number(row, field, kind=float, minimum=0):
+    raw = _required(row, field)
+    try:
+        value = kind(raw.replace(',', '.') if kind is float else raw)
+    except ValueError:
+        raise ValueError(f'{field}: "{raw}" не число')
+    # nan и inf float() принимает, а nan еще и проходит сравнение с minimum
+    if not math.isfinite(value):
+        raise ValueError(f'{field}: "{raw}" не число')
+    if value < minimum:
+        raise ValueError(f'{field}: значение меньше {minimum}')
+    return value
+
+
+def _datetime(raw):
+    try:
+        return datetime.fromisoformat(raw)
+    except ValueError:
+        try:
+            return datetime.strptime(raw, '%d.%m.%Y %H:%M')
+        except ValueError:
+            raise ValueError(f'дата "{raw}" не в формате ГГГГ-ММ-ДД ЧЧ:ММ или ДД.ММ.ГГГГ ЧЧ:ММ')
+
+
+def parse_product(row):
+    """name, price, quantity"""
+    return {
+        'name': _required(row, 'name'),
+        'price': _number(row, 'price'),
+        'quantity': _number(row, 'quantity', int) if row.get('quantity') else 0,
+    }
+
+
+def parse_customer(row):
+    """name, phone, email"""
+    return {
+        'name': _required(row, 'name'),
+        'phone': (row.get('phone') or '').strip(),
+        'email': (row.get('email') or '').strip(),
+    }
+
+
+class SaleParser:
+    """Разбор строк продаж: product или product_id, customer или
+    customer_id, quantity, total_price (по умолчанию цена x количество),
+    sale_date.
+
+    Названия товаров и имена покупателей сопоставляются с id по словарям,
+    загруженным один раз перед импортом.
+    """
+
+    def __init__(self):
+        self.prices = {}
+        self.product_ids = {}
+        # При одинаковых названиях берется запись с меньшим id
+        for product_id, name, price in db.session.execute(
+                select(Product.id, Product.name, Product.price).order_by(Product.id.desc())):
+            self.prices[product_id] = price
+            self.product_ids[name] = product_id
+        self.customer_ids = dict(db.session.execute(
+            select(Customer.name, Customer.id).order_by(Customer.id.desc())).all())
+        self.known_customers = set(self.customer_ids.values())
+
+    def _resolve(self, row, field, by_name, known, title):
+        if row.get(field + '_id'):
+            value = _number(row, field + '_id', int, minimum=1)
+            if value not in known:
+                raise ValueError(f'{title} с id {value} не найден')
+            return value
+        name = _required(row, field)
+        if name not in by_name:
+            raise ValueError(f'{title} "{name}" не найден')
+        return by_name[name]
+
+    def __call__(self, row):
+        product_id = self._resolve(row, 'product', self.product_ids, self.prices, 'товар')
+        customer_id = self._resolve(row, 'customer', self.customer_ids,
+                                    self.known_customers, 'покупатель')
+        quantity = _number(row, 'quantity', int, minimum=1)
+        if row.get('total_price'):
+            total_price = _number(row, 'total_price')
+        else:
+            total_price = self.prices[product_id] * quantity
+        return {
+            'product_id': product_id,
+            'customer_id': customer_id,
+            'quantity': quantity,
+            'total_price': total_price,
+            'sale_date': _datetime(_required(row, 'sale_date')),
+        }
+
+
+def import_csv(file, model, parse, chunk_size=IMPORT_CHUNK_SIZE, after_insert=None):
+    """Импорт файла в таблицу модели model; parse превращает строку CSV
+    в словарь значений или выбрасывает ValueError."""
+    result = ImportResult()
+    statement = insert(model.__table__)
+    for chunk in read_chunks(file, chunk_size):
+        rows = []
+        for line, row in chunk:
+            try:
+                rows.append(parse(row))
+            except ValueError as e:
+                result.add_error(line, str(e))
+        if not rows:
+            continue
+        try:
+            db.session.execute(statement, rows)
+            if after_insert:
+                after_insert(rows)
+            db.session.commit()
+            result.inserted += len(rows)
+        except Exception as e:
+            db.session.rollback()
+            result.add_error(chunk[0][0], f'порция до строки {chunk[-1][0]} не записана: {e}')
+    return result
+
+
+def import_products(file, chunk_size=IMPORT_CHUNK_SIZE):
+    """Импорт товаров; начальные остатки попадают в журнал движения
+    поступлениями в той же транзакции"""
+    return import_csv(file, Product, parse_product, chunk_size,
+                      after_insert=lambda rows: stock.record_opening_balances(stock.RECEIPT, 'Импорт'))
+
+
+def import_customers(file, chunk_size=IMPORT_CHUNK_SIZE):
+    return import_csv(file, Customer, parse_customer, chunk_size)
+
+
+def import_sales(file, chunk_size=IMPORT_CHUNK_SIZE):
+    """Импорт истории продаж. Остатки товаров не меняются (продажи уже
+    прошли), суточные итоги пополняются в той же транзакции."""
+    return import_csv(file, Sale, SaleParser(), chunk_size, after_insert=record_sales)
+
+
+IMPORTERS = {
+    'products': import_products,
+    'customers': import_customers,
+    'sales': import_sales,
+}
+
+
+def open_text(binary_file):
+    """Текстовый поток поверх загруженного файла (UTF-8, BOM допускается)"""
+    return io.TextIOWrapper(binary_file, encoding='utf-8-sig', newline='')
+
+
+if __name__ == '__main__':
+    import sys
+    from app import create_app
+
+    app = create_app()
+    if len(sys.argv) != 3 or sys.argv[1] not in IMPORTERS:
+        print("Использование: python importer.py products|customers|sales файл.csv")
+        sys.exit(2)
+
+    with app.app_context(), open(sys.argv[2], encoding='utf-8-sig', newline='') as file:
+        result = IMPORTERS[sys.argv[1]](file)
+    print(f"Импортировано строк: {result.inserted}, ошибок: {result.error_count}")
+    for line, message in result.errors:
+        print(f"  строка {line}: {message}")
@@ -1,5 +1,7 @@
-from app import app, db
-from database import Product, Customer, Sale, User
+from app import create_app
+from database import db, Product, Customer, Sale, User
+from rollup import rebuild_rollup
+import stock
 import os
 
 def init_db():
@@ -11,6 +13,7 @@ def init_db():
         os.remove(db_path)
         print(f"Старый файл {db_path} удален")
     
+    app = create_app()
     with app.app_context():
         # Создаем все таблицы заново
         db.create_all()
@@ -55,6 +58,11 @@ def init_db():
         ]
         db.session.add_all(sales)
         db.session.commit()
+        rebuild_rollup()
+        # Остатки заданы после продаж - в журнал они попадают начальными
+        stock.record_opening_balances(stock.ADJUSTMENT, 'Начальный остаток')
+        db.session.commit()
+        stock.take_snapshot()
         print("Продажи добавлены")
         
         print("=" * 50)
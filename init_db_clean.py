@@ -1,5 +1,7 @@
-from app import app, db
-from database import Product, Customer, Sale, User
+from app import create_app
+from database import db, Product, Customer, Sale, User
+from rollup import rebuild_rollup
+import stock
 import os
 
 def init_db():
@@ -13,6 +15,7 @@ def init_db():
         os.remove(db_path)
         print(f"Старый файл {db_path} удален")
     
+    app = create_app()
     with app.app_context():
         # Создаем все таблицы заново
         db.create_all()
@@ -62,6 +65,11 @@ def init_db():
         ]
         db.session.add_all(sales)
         db.session.commit()
+        rebuild_rollup()
+        # Остатки заданы после продаж - в журнал они попадают начальными
+        stock.record_opening_balances(stock.ADJUSTMENT, 'Начальный остаток')
+        db.session.commit()
+        stock.take_snapshot()
         print("Продажи добавлены")
         
         print("\n" + "="*50)
@@ -74,4 +82,4 @@ def init_db():
         print("="*50)
 
 if __name__ == '__main__':
-    init_db()w
\ No newline at end of file
+    init_db()
\ No newline at end of file
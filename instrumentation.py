@@ -0,0 +1,183 @@
+"""Профилирование запросов: время обработчика, число и время SQL-запросов.
+
+Включается настройкой SQL_PROFILING. Для каждого запроса считается число
+SQL-запросов, суммарное время в БД и самые медленные операторы; итог
+отдается в заголовке Server-Timing, медленные запросы пишутся в лог,
+гистограммы по маршрутам доступны в формате Prometheus (/metrics).
+"""
+import heapq
+import threading
+import time
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from database import db
+
+# Границы корзин гистограмм, секунды
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class RequestProfile:
+    """SQL-статистика одного HTTP-запроса"""
+
+    def __init__(self, keep_slowest):
+        self.started = time.perf_counter()
+        self.query_count = 0
+        self.db_time = 0.0
+        self.keep_slowest = keep_slowest
+        # Куча (длительность, номер, SQL) с самыми медленными операторами
+        self.slowest = []
+
+    def add_statement(self, statement, duration):
+        self.query_count += 1
+        self.db_time += duration
+        item = (duration, self.query_count, statement)
+        if len(self.slowest) < self.keep_slowest:
+            heapq.heappush(self.slowest, item)
+        else:
+            heapq.heappushpop(self.slowest, item)
+
+    def slowest_statements(self):
+        return [(duration, statement) for duration, _, statement in sorted(self.slowest, reverse=True)]
+
+
+class Histogram:
+    """Накопительная гистограмма в духе Prometheus"""
+
+    def __init__(self, buckets=DURATION_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.total += value
+        self.count += 1
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+    def render(self, name, labels):
+        lines = [f'{name}_bucket{{{labels},le="{bound}"}} {count}'
+                 for bound, count in zip(self.buckets, self.counts)]
+        lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {self.count}')
+        lines.append(f'{name}_sum{{{labels}}} {self.total:.6f}')
+        lines.append(f'{name}_count{{{labels}}} {self.count}')
+        return lines
+
+
+class Metrics:
+    """Метрики по маршрутам и подключаемые сборщики других модулей"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.request_duration = {}
+        self.db_duration = {}
+        self.queries = {}
+        self.slow_requests = {}
+        # Функции без аргументов, возвращающие строки в формате Prometheus
+        self.collectors = []
+
+    def observe(self, endpoint, duration, profile, slow):
+        with self.lock:
+            self.request_duration.setdefault(endpoint, Histogram()).observe(duration)
+            self.db_duration.setdefault(endpoint, Histogram()).observe(profile.db_time)
+            self.queries[endpoint] = self.queries.get(endpoint, 0) + profile.query_count
+            if slow:
+                self.slow_requests[endpoint] = self.slow_requests.get(endpoint, 0) + 1
+
+    def render(self):
+        """Текст в формате Prometheus exposition"""
+        lines = []
+        with self.lock:
+            for name, title, histograms in [
+                ('http_request_duration_seconds', 'Время обработки запроса', self.request_duration),
+                ('db_query_duration_seconds', 'Суммарное время SQL за запрос', self.db_duration),
+            ]:
+                lines.append(f'# HELP {name} {title}')
+                lines.append(f'# TYPE {name} histogram')
+                for endpoint, histogram in sorted(histograms.items()):
+                    lines.extend(histogram.render(name, f'endpoint="{endpoint}"'))
+            for name, title, counters in [
+                ('db_queries_total', 'Число SQL-запросов', self.queries),
+                ('http_slow_requests_total', 'Запросы дольше порога SLOW_REQUEST_MS', self.slow_requests),
+            ]:
+                lines.append(f'# HELP {name} {title}')
+                lines.append(f'# TYPE {name} counter')
+                for endpoint, value in sorted(counters.items()):
+                    lines.append(f'{name}{{endpoint="{endpoint}"}} {value}')
+        for collector in self.collectors:
+            lines.extend(collector())
+        return '\n'.join(lines) + '\n'
+
+
+def get_metrics(app=None):
+    """Метрики приложения (создаются при init_instrumentation)"""
+    return (app or current_app).extensions['instrumentation']
+
+
+def _current_profile():
+    """Профиль текущего HTTP-запроса или None (профилирование выключено)"""
+    return g.get('sql_profile') if has_request_context() else None
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # Время начала хранится в контексте выполнения, а не в conn.info:
+    # контекст живет один оператор, и оператор с ошибкой ничего не
+    # оставляет в соединении пула
+    if context is not None and _current_profile() is not None:
+        context.profile_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, 'profile_started', None)
+    profile = _current_profile()
+    if started is not None and profile is not None:
+        profile.add_statement(statement, time.perf_counter() - started)
+
+
+def _start_profile():
+    if current_app.config.get('SQL_PROFILING'):
+        g.sql_profile = RequestProfile(current_app.config.get('SLOWEST_STATEMENTS', 5))
+
+
+def _finish_profile(response):
+    profile = g.pop('sql_profile', None)
+    if profile is None:
+        return response
+
+    duration = time.perf_counter() - profile.started
+    handler_time = duration - profile.db_time
+    endpoint = request.endpoint or 'unknown'
+    slow = duration * 1000 >= current_app.config.get('SLOW_REQUEST_MS', 500)
+
+    response.headers['Server-Timing'] = (
+        f'db;dur={profile.db_time * 1000:.2f};desc="{profile.query_count} queries", '
+        f'app;dur={handler_time * 1000:.2f}, total;dur={duration * 1000:.2f}'
+    )
+    get_metrics().observe(endpoint, duration, profile, slow)
+
+    if slow:
+        details = '\n'.join(f'  {seconds * 1000:.1f} мс: {statement}'
+                            for seconds, statement in profile.slowest_statements())
+        current_app.logger.warning(
+            'Медленный запрос %s %s: %.1f мс, SQL-запросов %d (%.1f мс)\n%s',
+            request.method, request.path, duration * 1000,
+            profile.query_count, profile.db_time * 1000, details)
+    return response
+
+
+def init_instrumentation(app):
+    """Подключение профилирования к приложению и его движку БД.
+
+    Обработчики регистрируются всегда, а работают только при
+    SQL_PROFILING = True, поэтому профилирование можно включать
+    без перезапуска процесса; без него обработчики событий движка
+    ограничиваются проверкой g.sql_profile.
+    """
+    app.extensions['instrumentation'] = Metrics()
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+    app.before_request(_start_profile)
+    app.after_request(_finish_profile)
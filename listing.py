@@ -0,0 +1,110 @@
+"""Списки товаров и покупателей: фильтры, сортировка, постраничный вывод.
+
+Каждая страница - один запрос с keyset-пагинацией по (столбец
+сортировки, id), поэтому время ответа не зависит от размера каталога.
+Общее число записей без фильтров берется из кэша счетчиков, с
+фильтрами - считается не дальше LIST_COUNT_CAP строк.
+"""
+from flask import current_app
+from sqlalchemy import exists
+from database import Product, Customer, Sale
+from pagination import keyset_paginate, capped_count
+from counters import get_counters
+
+PRODUCT_SORTS = {
+    'name': Product.name,
+    'price': Product.price,
+    'quantity': Product.quantity,
+    'updated_at': Product.updated_at,
+}
+
+CUSTOMER_SORTS = {
+    'name': Customer.name,
+    'updated_at': Customer.updated_at,
+}
+
+
+class Listing:
+    """Страница списка вместе с параметрами, по которым она построена"""
+
+    def __init__(self, page, filters, sort, order, total, total_exact):
+        self.page = page
+        self.filters = filters
+        self.sort = sort
+        self.order = order
+        self.total = total
+        self.total_exact = total_exact
+
+    def query_args(self, **overrides):
+        """Параметры ссылки на этот же список (фильтры и сортировка)"""
+        args = dict(self.filters, sort=self.sort, order=self.order)
+        args.update(overrides)
+        return {key: value for key, value in args.items() if value is not None}
+
+
+def flag(value):
+    """Флажок 0/1; другие значения не принимаются"""
+    if value not in ('0', '1'):
+        raise ValueError(value)
+    return value
+
+
+def parse_filters(args, parsers):
+    """Фильтры из параметров запроса: {имя: значение} для заполненных и
+    корректных полей; parsers - имя -> функция разбора значения"""
+    filters = {}
+    for name, parse in parsers.items():
+        value = args.get(name, '').strip()
+        if not value:
+            continue
+        try:
+            filters[name] = parse(value)
+        except ValueError:
+            pass
+    return filters
+
+
+def paginate_listing(query, model, sorts, args, filters, per_page, counter):
+    """Страница query по выбранной сортировке и число записей в списке"""
+    sort = args.get('sort') if args.get('sort') in sorts else 'name'
+    order = 'desc' if args.get('order') == 'desc' else 'asc'
+    page = keyset_paginate(
+        query,
+        (sorts[sort], model.id),
+        after=args.get('after'),
+        before=args.get('before'),
+        per_page=per_page,
+        descending=order == 'desc'
+    )
+    if filters:
+        total, exact = capped_count(query, current_app.config['LIST_COUNT_CAP'])
+    else:
+        total, exact = get_counters().snapshot()[counter], True
+    return Listing(page, filters, sort, order, total, exact)
+
+
+def list_products(args, per_page):
+    """Страница товаров: фильтры min_price, max_price, low_stock, has_sales"""
+    filters = parse_filters(args, {'min_price': float, 'max_price': float,
+                                   'low_stock': flag, 'has_sales': flag})
+    query = Product.query
+    if 'min_price' in filters:
+        query = query.filter(Product.price >= filters['min_price'])
+    if 'max_price' in filters:
+        query = query.filter(Product.price <= filters['max_price'])
+    if filters.get('low_stock') == '1':
+        query = query.filter(Product.quantity <= current_app.config['LOW_STOCK_THRESHOLD'])
+    if 'has_sales' in filters:
+        sold = exists().where(Sale.product_id == Product.id)
+        query = query.filter(sold if filters['has_sales'] == '1' else ~sold)
+    return paginate_listing(query, Product, PRODUCT_SORTS, args, filters, per_page, 'products')
+
+
+def list_customers(args, per_page):
+    """Страница покупателей: фильтр has_sales"""
+    filters = parse_filters(args, {'has_sales': flag})
+    query = Customer.query
+    if 'has_sales' in filters:
+        bought = exists().where(Sale.customer_id == Customer.id)
+        query = query.filter(bought if filters['has_sales'] == '1' else ~bought)
+    return paginate_listing(query, Customer, CUSTOMER_SORTS, args, filters, per_page, 'customers')
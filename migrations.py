@@ -0,0 +1,52 @@
+"""Обновление схемы существующей базы данных без ее пересоздания"""
+from database import db
+from rollup import rebuild_rollup
+from search import create_search_indexes
+import stock
+
+
+def create_missing_indexes():
+    """Создание индексов, объявленных в моделях, но отсутствующих в БД"""
+    inspector = db.inspect(db.engine)
+    created = []
+    for table in db.metadata.sorted_tables:
+        existing = {index['name'] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(bind=db.engine)
+                created.append(index.name)
+    return created
+
+
+def upgrade_schema():
+    """Идемпотентное обновление схемы: недостающие таблицы и индексы.
+
+    В отличие от init_db.py данные не удаляются; повторный запуск
+    ничего не меняет. Вызывается внутри контекста приложения.
+    """
+    existing_tables = set(db.inspect(db.engine).get_table_names())
+    db.create_all()
+    created = create_missing_indexes()
+    # Новая таблица итогов заполняется по уже накопленным продажам
+    if 'daily_sales_rollup' not in existing_tables:
+        rebuild_rollup()
+    # Журнал движения начинается с текущих остатков
+    if 'stock_movements' not in existing_tables:
+        stock.record_opening_balances(stock.ADJUSTMENT, 'Начальный остаток')
+        db.session.commit()
+        stock.take_snapshot()
+    # Полнотекстовый поиск заполняется по уже имеющимся товарам и покупателям
+    created.extend(create_search_indexes())
+    return created
+
+
+if __name__ == '__main__':
+    from app import create_app
+
+    app = create_app()
+    with app.app_context():
+        created = upgrade_schema()
+        if created:
+            print("Созданы индексы: " + ", ".join(created))
+        else:
+            print("Схема базы данных актуальна")
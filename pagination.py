@@ -0,0 +1,127 @@
+"""Курсорная (keyset) пагинация запросов SQLAlchemy"""
+import base64
+import json
+from datetime import datetime
+from sqlalchemy import and_, func, or_, select
+
+
+def encode_cursor(values):
+    """Кодирование значений ключа сортировки в строку курсора"""
+    payload = [{'dt': value.isoformat()} if isinstance(value, datetime) else value
+               for value in values]
+    raw = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def _matches(value, column):
+    """Подходит ли значение из курсора к типу столбца сортировки"""
+    try:
+        expected = column.type.python_type
+    except NotImplementedError:
+        return value is not None
+    if expected is float:
+        expected = (int, float)
+    # bool - подкласс int, но в курсоре его быть не может
+    return isinstance(value, expected) and not isinstance(value, bool)
+
+
+def decode_cursor(cursor, columns=None):
+    """Декодирование курсора; для испорченного курсора или курсора, чьи
+    значения не подходят к столбцам сортировки columns, возвращает None"""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        payload = json.loads(raw.decode('utf-8'))
+        if not isinstance(payload, list):
+            return None
+        values = [datetime.fromisoformat(value['dt']) if isinstance(value, dict) else value
+                  for value in payload]
+    except (ValueError, TypeError, KeyError):
+        return None
+    if columns is not None and (len(values) != len(columns) or
+                                not all(map(_matches, values, columns))):
+        return None
+    return values
+
+
+def _seek_condition(columns, values, descending):
+    """Условие "строго после" ключа values в заданном порядке сортировки.
+
+    Раскрывается в a >= x AND (a > x OR (a = x AND b > y)): отдельная
+    граница по первому столбцу позволяет SQLite искать по индексу,
+    а не сканировать его с начала.
+    """
+    conditions = []
+    for i, column in enumerate(columns):
+        equal = [columns[j] == values[j] for j in range(i)]
+        beyond = column < values[i] if descending else column > values[i]
+        conditions.append(and_(*equal, beyond))
+    bound = columns[0] <= values[0] if descending else columns[0] >= values[0]
+    return and_(bound, or_(*conditions))
+
+
+class KeysetPage:
+    """Страница результатов с курсорами на соседние страницы"""
+
+    def __init__(self, items, next_cursor=None, prev_cursor=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def keyset_paginate(query, columns, after=None, before=None, per_page=50, descending=False):
+    """Одна страница запроса query, упорядоченного по columns.
+
+    columns - столбцы ключа сортировки, последним должен идти уникальный
+    (обычно id). after/before - курсоры из предыдущей страницы.
+    Стоимость страницы не зависит от ее номера: выполняется один запрос
+    с LIMIT per_page + 1 без OFFSET.
+    """
+    def key(item):
+        return encode_cursor([getattr(item, column.key) for column in columns])
+
+    def ordering(desc):
+        return [column.desc() if desc else column.asc() for column in columns]
+
+    before_values = decode_cursor(before, columns)
+    after_values = decode_cursor(after, columns)
+
+    if before_values is not None:
+        # Идем назад: читаем в обратном порядке и разворачиваем результат
+        rows = query.filter(_seek_condition(columns, before_values, not descending)) \
+            .order_by(*ordering(not descending)).limit(per_page + 1).all()
+        has_more = len(rows) > per_page
+        items = list(reversed(rows[:per_page]))
+        return KeysetPage(
+            items,
+            next_cursor=key(items[-1]) if items else None,
+            prev_cursor=key(items[0]) if has_more else None
+        )
+
+    if after_values is not None:
+        query = query.filter(_seek_condition(columns, after_values, descending))
+    rows = query.order_by(*ordering(descending)).limit(per_page + 1).all()
+    has_more = len(rows) > per_page
+    items = rows[:per_page]
+    return KeysetPage(
+        items,
+        next_cursor=key(items[-1]) if has_more else None,
+        prev_cursor=key(items[0]) if items and after_values is not None else None
+    )
+
+
+def capped_count(query, cap):
+    """Число строк запроса, но не больше cap: (число, точное ли оно).
+
+    В отличие от COUNT(*) по всей выборке читается не больше cap + 1 строк.
+    """
+    limited = query.order_by(None).limit(cap + 1).subquery()
+    count = query.session.scalar(select(func.count()).select_from(limited))
+    return min(count, cap), count <= cap
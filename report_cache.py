@@ -0,0 +1,153 @@
+"""Кэш готовых отчетов по периоду.
+
+Ключ - (начало, конец, лимит детализации). Периоды, закончившиеся до
+начала сегодняшнего дня, не меняются при оформлении продаж и хранятся
+долго (REPORT_CACHE_PAST_TTL). Периоды, захватывающие сегодня,
+сбрасываются при каждой продаже, попавшей в период, а в других
+воркерах устаревают не позже чем через REPORT_CACHE_CURRENT_TTL.
+
+Объем кэша ограничен REPORT_CACHE_MAX_BYTES (по приблизительной оценке
+размера), при переполнении вытесняются давно не использованные отчеты.
+"""
+import sys
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from flask import current_app
+from report_engine import build_report
+from instrumentation import get_metrics
+
+
+def estimate_size(value):
+    """Приблизительный размер отчета в байтах (словари, списки, строки, числа)"""
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    elif isinstance(value, (list, tuple)):
+        size += sum(estimate_size(item) for item in value)
+    return size
+
+
+def freeze_sale(sale):
+    """Продажа без привязки к сессии БД: в шаблоне доступны те же поля"""
+    return {
+        'sale_date': sale.sale_date,
+        'product': {'name': sale.product.name},
+        'customer': {'name': sale.customer.name},
+        'quantity': sale.quantity,
+        'total_price': sale.total_price,
+    }
+
+
+class ReportCache:
+    """LRU-кэш отчетов с ограничением по памяти"""
+
+    def __init__(self, max_bytes, past_ttl, current_ttl):
+        self.max_bytes = max_bytes
+        self.past_ttl = past_ttl
+        self.current_ttl = current_ttl
+        self.lock = threading.Lock()
+        # ключ -> (срок годности, размер, отчет); порядок - от старых к свежим
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        # Строящиеся отчеты: ключ -> True, если период изменился во время
+        # построения (такой отчет не кэшируется)
+        self.pending = {}
+
+    def get_report(self, start_date, end_date, detail_limit=None):
+        """Отчет build_report из кэша или построенный заново.
+
+        Возвращается общий для всех запросов словарь - изменять его нельзя.
+        """
+        key = (start_date, end_date, detail_limit)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry[2]
+            self.misses += 1
+            self.pending[key] = False
+
+        report = build_report(start_date, end_date, detail_limit=detail_limit)
+        report['sales'] = [freeze_sale(sale) for sale in report['sales']]
+        self.put(key, report)
+        return report
+
+    def put(self, key, report):
+        today = datetime.combine(datetime.now().date(), datetime.min.time())
+        ttl = self.past_ttl if key[1] <= today else self.current_ttl
+        size = estimate_size(report)
+        with self.lock:
+            self._remove(key)
+            # Пока отчет строился, продажа могла изменить его период
+            if self.pending.pop(key, False) or size > self.max_bytes:
+                return
+            self.entries[key] = (time.monotonic() + ttl, size, report)
+            self.size += size
+            while self.size > self.max_bytes:
+                self._remove(next(iter(self.entries)))
+                self.evictions += 1
+
+    def invalidate(self, moment):
+        """Сброс отчетов, в период которых попадает момент moment (новая продажа)"""
+        with self.lock:
+            for key in self.pending:
+                if key[0] <= moment < key[1]:
+                    self.pending[key] = True
+            for key in [key for key in self.entries if key[0] <= moment < key[1]]:
+                self._remove(key)
+                self.invalidations += 1
+
+    def clear(self):
+        """Сброс всего кэша (импорт продаж задним числом, переименование товара)"""
+        with self.lock:
+            self.pending = dict.fromkeys(self.pending, True)
+            self.invalidations += len(self.entries)
+            self.entries.clear()
+            self.size = 0
+
+    def _remove(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.size -= entry[1]
+
+    def collect(self):
+        """Статистика кэша в формате Prometheus (сборщик для /metrics)"""
+        with self.lock:
+            counters = [
+                ('report_cache_hits_total', 'Отчеты, взятые из кэша', self.hits),
+                ('report_cache_misses_total', 'Отчеты, построенные заново', self.misses),
+                ('report_cache_evictions_total', 'Отчеты, вытесненные по объему', self.evictions),
+                ('report_cache_invalidations_total', 'Отчеты, сброшенные после изменений', self.invalidations),
+            ]
+            gauges = [
+                ('report_cache_entries', 'Отчетов в кэше', len(self.entries)),
+                ('report_cache_bytes', 'Оценка объема кэша', self.size),
+            ]
+        lines = []
+        for kind, metrics in (('counter', counters), ('gauge', gauges)):
+            for name, title, value in metrics:
+                lines.append(f'# HELP {name} {title}')
+                lines.append(f'# TYPE {name} {kind}')
+                lines.append(f'{name} {value}')
+        return lines
+
+
+def init_report_cache(app):
+    """Создание кэша отчетов и подключение его статистики к /metrics"""
+    cache = ReportCache(app.config['REPORT_CACHE_MAX_BYTES'],
+                        app.config['REPORT_CACHE_PAST_TTL'],
+                        app.config['REPORT_CACHE_CURRENT_TTL'])
+    app.extensions['report_cache'] = cache
+    get_metrics(app).collectors.append(cache.collect)
+
+
+def get_report_cache(app=None):
+    """Кэш отчетов текущего приложения"""
+    return (app or current_app).extensions['report_cache']
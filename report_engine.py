@@ -0,0 +1,92 @@
+"""Построение отчетов о продажах средствами SQL"""
+from sqlalchemy import func
+from sqlalchemy.orm import joinedload
+from datetime import time
+from database import db, Product, DailySalesRollup
+from archive import sales_source
+
+
+def is_whole_days(start_date, end_date):
+    """Границы периода приходятся на полночь - можно читать суточные итоги"""
+    return start_date.time() == time.min and end_date.time() == time.min
+
+
+def rollup_stats_query(start_date, end_date):
+    """Количество и выручка по товарам из суточных итогов (O(дней x товаров))"""
+    return db.session.query(
+        Product.name,
+        func.sum(DailySalesRollup.sales_count),
+        func.sum(DailySalesRollup.quantity),
+        func.sum(DailySalesRollup.revenue)
+    ).join(Product, Product.id == DailySalesRollup.product_id).filter(
+        DailySalesRollup.date >= start_date.date(),
+        DailySalesRollup.date < end_date.date()
+    ).group_by(DailySalesRollup.product_id, Product.name).order_by(
+        func.sum(DailySalesRollup.revenue).desc())
+
+
+def product_stats_query(start_date, end_date):
+    """Количество и выручка по товарам из таблицы продаж (один GROUP BY)"""
+    Sale = sales_source(start_date, end_date)
+    return db.session.query(
+        Product.name,
+        func.count(Sale.id),
+        func.sum(Sale.quantity),
+        func.sum(Sale.total_price)
+    ).join(Product, Product.id == Sale.product_id).filter(
+        Sale.sale_date >= start_date,
+        Sale.sale_date < end_date
+    ).group_by(Sale.product_id, Product.name).order_by(func.sum(Sale.total_price).desc())
+
+
+def period_sales_query(start_date, end_date):
+    """Продажи за период вместе с товаром и покупателем (без ленивых загрузок)"""
+    Sale = sales_source(start_date, end_date)
+    return db.session.query(Sale).options(
+        joinedload(Sale.product),
+        joinedload(Sale.customer)
+    ).filter(
+        Sale.sale_date >= start_date,
+        Sale.sale_date < end_date
+    ).order_by(Sale.sale_date)
+
+
+def build_report(start_date, end_date, detail_limit=None):
+    """Сводка продаж за период [start_date; end_date): итоги, статистика
+    по товарам и детализация.
+
+    Итоги считаются из сгруппированных строк, поэтому число запросов
+    не зависит от количества продаж в периоде. Для периода из целых
+    дней строки берутся из суточных итогов, а не из таблицы sales.
+    detail_limit ограничивает детализацию первыми продажами периода
+    (полный список - в выгрузке CSV).
+    """
+    if is_whole_days(start_date, end_date):
+        stats_query = rollup_stats_query(start_date, end_date)
+    else:
+        stats_query = product_stats_query(start_date, end_date)
+
+    total_sales = 0
+    total_revenue = 0
+    product_stats = {}
+    for name, count, quantity, revenue in stats_query:
+        total_sales += count
+        total_revenue += revenue
+        # Разные товары могут называться одинаково - объединяем, как раньше
+        if name in product_stats:
+            product_stats[name]['quantity'] += quantity
+            product_stats[name]['revenue'] += revenue
+        else:
+            product_stats[name] = {'quantity': quantity, 'revenue': revenue}
+
+    sales = []
+    if detail_limit != 0:
+        sales = period_sales_query(start_date, end_date).limit(detail_limit).all()
+
+    return {
+        'sales': sales,
+        'sales_truncated': detail_limit is not None and total_sales > detail_limit,
+        'total_sales': total_sales,
+        'total_revenue': total_revenue,
+        'product_stats': product_stats
+    }
@@ -0,0 +1,218 @@
+"""Фоновое построение отчетов за большие периоды.
+
+Отчет за период длиннее REPORT_ASYNC_DAYS не строится в обработчике
+запроса: в таблицу report_jobs ставится задание, страница опрашивает
+его состояние и показывает результат, когда он готов. Повторный запрос
+того же периода присоединяется к незавершенному заданию (уникальный
+частичный индекс), а готовый результат переиспользуется, пока он
+не устарел.
+
+Задания выполняет пул потоков внутри процесса (REPORT_JOB_WORKERS)
+или отдельный процесс:  python report_jobs.py
+Задания, брошенные перезапуском процесса, снова ставятся в работу при
+следующем запросе того же периода или опросе состояния (revive_job).
+"""
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+from database import db, ReportJob
+from report_engine import build_report
+from report_cache import freeze_sale
+
+QUEUED, RUNNING, DONE, FAILED = 'queued', 'running', 'done', 'failed'
+
+logger = logging.getLogger(__name__)
+
+_dispatch_lock = threading.Lock()
+
+
+def dump_report(report):
+    """Отчет в JSON для хранения в задании"""
+    report = dict(report, sales=[freeze_sale(sale) for sale in report['sales']])
+    for sale in report['sales']:
+        sale['sale_date'] = sale['sale_date'].isoformat()
+    return json.dumps(report, ensure_ascii=False)
+
+
+def load_report(text):
+    """Отчет из JSON задания в том виде, который ожидает шаблон"""
+    report = json.loads(text)
+    for sale in report['sales']:
+        sale['sale_date'] = datetime.fromisoformat(sale['sale_date'])
+    return report
+
+
+def find_reusable_job(start_date, end_date):
+    """Незавершенное задание на период или готовое, которое еще актуально.
+
+    Результат за период, закончившийся до начала сегодняшнего дня, не
+    меняется; за текущий период - живет REPORT_CACHE_CURRENT_TTL секунд.
+    """
+    today = datetime.combine(datetime.now().date(), datetime.min.time())
+    query = select(ReportJob).where(
+        ReportJob.start_date == start_date,
+        ReportJob.end_date == end_date,
+        ReportJob.status != FAILED
+    )
+    if end_date > today:
+        fresh_after = datetime.now() - timedelta(seconds=current_app.config['REPORT_CACHE_CURRENT_TTL'])
+        query = query.where((ReportJob.status != DONE) | (ReportJob.finished_at >= fresh_after))
+    return db.session.scalars(query.order_by(ReportJob.id.desc()).limit(1)).first()
+
+
+def submit_report(start_date, end_date):
+    """Постановка отчета в очередь; возвращает задание (возможно, уже существующее)"""
+    job = find_reusable_job(start_date, end_date)
+    if job is not None:
+        return revive_job(job)
+
+    job = ReportJob(start_date=start_date, end_date=end_date, status=QUEUED)
+    db.session.add(job)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # Параллельный запрос успел поставить задание на этот же период
+        db.session.rollback()
+        return find_reusable_job(start_date, end_date)
+
+    dispatch(job.id)
+    return job
+
+
+def dispatch(job_id):
+    """Передача задания пулу потоков процесса (если он есть); задание,
+    уже переданное пулу этого процесса и еще не выполненное, повторно
+    не передается"""
+    executor = current_app.extensions['report_jobs']
+    if executor is None:
+        return
+    dispatched = current_app.extensions['report_jobs_dispatched']
+    with _dispatch_lock:
+        if job_id in dispatched:
+            return
+        dispatched.add(job_id)
+    executor.submit(run_in_app, current_app._get_current_object(), job_id)
+
+
+def revive_job(job):
+    """Задание, брошенное остановленным процессом, снова ставится в работу.
+
+    Зависшее в running дольше REPORT_JOB_TIMEOUT возвращается в очередь,
+    поставленное в очередь передается пулу, если этот процесс его еще не
+    передавал: после перезапуска его никто не выполнит, а уникальный
+    индекс не дает поставить новое на тот же период. Опросы состояния
+    уже переданного задания пул не нагружают; если то же задание
+    передаст и другой процесс, его захватит только один исполнитель
+    (claim_job).
+    """
+    timeout = current_app.config['REPORT_JOB_TIMEOUT']
+    if job.status == RUNNING and job.started_at < datetime.now() - timedelta(seconds=timeout):
+        requeue_stale(timeout)
+        db.session.refresh(job)
+    if job.status == QUEUED:
+        dispatch(job.id)
+    return job
+
+
+def claim_job(job_id):
+    """Захват задания исполнителем: удается только одному (условный UPDATE)"""
+    result = db.session.execute(
+        update(ReportJob)
+        .where(ReportJob.id == job_id, ReportJob.status == QUEUED)
+        .values(status=RUNNING, started_at=datetime.now())
+    )
+    db.session.commit()
+    return result.rowcount == 1
+
+
+def run_job(job_id):
+    """Построение отчета по заданию; False, если задание уже захвачено другим"""
+    if not claim_job(job_id):
+        return False
+    job = db.session.get(ReportJob, job_id)
+    try:
+        report = build_report(job.start_date, job.end_date,
+                              detail_limit=current_app.config['REPORT_DETAIL_LIMIT'])
+        job.result = dump_report(report)
+        job.status = DONE
+    except Exception as e:
+        db.session.rollback()
+        logger.exception('Ошибка построения отчета по заданию %s', job_id)
+        job = db.session.get(ReportJob, job_id)
+        job.error = str(e)
+        job.status = FAILED
+    job.finished_at = datetime.now()
+    db.session.commit()
+    return True
+
+
+def run_in_app(app, job_id):
+    """Выполнение задания в потоке пула"""
+    with app.app_context():
+        try:
+            run_job(job_id)
+        finally:
+            app.extensions['report_jobs_dispatched'].discard(job_id)
+
+
+def run_pending():
+    """Выполнение всех поставленных заданий по очереди; возвращает их число"""
+    done = 0
+    while True:
+        job_id = db.session.scalar(
+            select(ReportJob.id).where(ReportJob.status == QUEUED).order_by(ReportJob.id).limit(1))
+        if job_id is None:
+            return done
+        if run_job(job_id):
+            done += 1
+
+
+def requeue_stale(timeout):
+    """Возврат в очередь заданий, зависших в running (исполнитель был остановлен)"""
+    result = db.session.execute(
+        update(ReportJob)
+        .where(ReportJob.status == RUNNING,
+               ReportJob.started_at < datetime.now() - timedelta(seconds=timeout))
+        .values(status=QUEUED, started_at=None)
+    )
+    db.session.commit()
+    return result.rowcount
+
+
+def init_report_jobs(app):
+    """Пул потоков для заданий; при REPORT_JOB_WORKERS = 0 задания
+    выполняет отдельный процесс report_jobs.py"""
+    workers = app.config['REPORT_JOB_WORKERS']
+    app.extensions['report_jobs'] = ThreadPoolExecutor(
+        max_workers=workers, thread_name_prefix='report-job') if workers else None
+    # id заданий, переданных пулу и еще не выполненных
+    app.extensions['report_jobs_dispatched'] = set()
+
+
+if __name__ == '__main__':
+    import argparse
+    from app import create_app
+
+    parser = argparse.ArgumentParser(description='Исполнитель фоновых отчетов')
+    parser.add_argument('--poll', type=float, default=1.0, help='пауза между проверками очереди, с')
+    parser.add_argument('--once', action='store_true', help='выполнить очередь и выйти')
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        requeued = requeue_stale(app.config['REPORT_JOB_TIMEOUT'])
+        if requeued:
+            print(f"Возвращено в очередь зависших заданий: {requeued}")
+        while True:
+            count = run_pending()
+            if count:
+                print(f"Выполнено заданий: {count}")
+            if args.once:
+                break
+            time.sleep(args.poll)
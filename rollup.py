@@ -0,0 +1,97 @@
+"""Поддержка таблицы суточных итогов продаж DailySalesRollup"""
+from sqlalchemy import func, insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+from database import db, Sale, DailySalesRollup, ArchivedPeriod
+
+
+def sale_day(column):
+    """Выражение "дата без времени" для столбца DateTime в текущей СУБД"""
+    if db.session.get_bind().dialect.name == 'sqlite':
+        # CAST(... AS DATE) в SQLite превращает строку даты в число
+        return func.date(column)
+    return db.cast(column, db.Date)
+
+
+def _upsert_statement():
+    """INSERT ... ON CONFLICT DO UPDATE, прибавляющий значения к итогам дня"""
+    dialect = db.session.get_bind().dialect.name
+    insert_ = postgresql.insert if dialect == 'postgresql' else sqlite.insert
+    table = DailySalesRollup.__table__
+    statement = insert_(table)
+    return statement.on_conflict_do_update(
+        index_elements=[table.c.date, table.c.product_id],
+        set_={
+            'quantity': table.c.quantity + statement.excluded.quantity,
+            'revenue': table.c.revenue + statement.excluded.revenue,
+            'sales_count': table.c.sales_count + statement.excluded.sales_count,
+        }
+    )
+
+
+def record_sales(rows):
+    """Учет продаж в итогах; rows - словари с sale_date, product_id,
+    quantity и total_price. Выполняется в текущей транзакции сессии,
+    фиксирует ее вызывающий код.
+    """
+    totals = {}
+    for row in rows:
+        key = (row['sale_date'].date(), row['product_id'])
+        day = totals.setdefault(key, {'quantity': 0, 'revenue': 0, 'sales_count': 0})
+        day['quantity'] += row['quantity']
+        day['revenue'] += row['total_price']
+        day['sales_count'] += 1
+    if totals:
+        db.session.execute(_upsert_statement(), [
+            dict(values, date=date, product_id=product_id)
+            for (date, product_id), values in totals.items()
+        ])
+
+
+def record_sale(sale):
+    """Учет одной продажи в итогах дня (в текущей транзакции)"""
+    record_sales([{
+        'sale_date': sale.sale_date,
+        'product_id': sale.product_id,
+        'quantity': sale.quantity,
+        'total_price': sale.total_price,
+    }])
+
+
+def rebuild_rollup():
+    """Полный пересчет итогов из таблицы sales одним INSERT ... SELECT.
+
+    Итоги месяцев, перенесенных в архив (archive.py), сохраняются: их
+    продаж в таблице sales уже нет.
+    """
+    day = sale_day(Sale.sale_date)
+    source = select(
+        day,
+        Sale.product_id,
+        func.sum(Sale.quantity),
+        func.sum(Sale.total_price),
+        func.count(Sale.id)
+    ).group_by(day, Sale.product_id)
+
+    archived = db.session.scalars(select(ArchivedPeriod.month)).all()
+    delete = DailySalesRollup.__table__.delete()
+    if archived:
+        # Архивные месяцы (только SQLite) не пересчитываются целиком,
+        # включая оставшиеся в sales продажи этих месяцев
+        source = source.where(~func.strftime('%Y-%m-01', Sale.sale_date).in_(
+            [month.isoformat() for month in archived]))
+        delete = delete.where(~func.strftime('%Y-%m-01', DailySalesRollup.date).in_(
+            [month.isoformat() for month in archived]))
+    db.session.execute(delete)
+    db.session.execute(insert(DailySalesRollup.__table__).from_select(
+        ['date', 'product_id', 'quantity', 'revenue', 'sales_count'], source))
+    db.session.commit()
+    return DailySalesRollup.query.count()
+
+
+if __name__ == '__main__':
+    from app import create_app
+
+    app = create_app()
+    with app.app_context():
+        rows = rebuild_rollup()
+        print(f"Итоги продаж пересчитаны: {rows} строк (дата x товар)")
@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+"""Скрипт для запуска бенчмарков маршрутов"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+BENCH_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmarks')
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, 'baseline.json')
+DEFAULT_OUTPUT = os.path.join(BENCH_DIR, 'results', 'latest.json')
+
+# Прирост задержки меньше этого порога считается шумом
+NOISE_FLOOR_MS = 2.0
+
+
+def run_size(sales, iterations):
+    """Бенчмарк одного размера БД в отдельном процессе"""
+    with tempfile.NamedTemporaryFile(suffix='.json', delete=False) as file:
+        output = file.name
+    try:
+        subprocess.run([sys.executable, '-m', 'benchmarks.routes', '--sales', str(sales),
+                        '--iterations', str(iterations), '--output', output],
+                       check=True, cwd=os.path.dirname(BENCH_DIR))
+        with open(output, encoding='utf-8') as file:
+            return json.load(file)
+    finally:
+        os.remove(output)
+
+
+def find_regressions(results, baseline, tolerance):
+    """Маршруты, у которых p95 или число запросов выросли относительно базовой линии"""
+    regressions = []
+    for size, routes in baseline.items():
+        for route, expected in routes.items():
+            actual = results.get(size, {}).get(route)
+            if actual is None:
+                continue
+            limit = max(expected['p95_ms'] * tolerance, expected['p95_ms'] + NOISE_FLOOR_MS)
+            if actual['p95_ms'] > limit:
+                regressions.append(f"{size} {route}: p95 {actual['p95_ms']} мс > {limit:.2f} мс")
+            if actual['queries'] > expected['queries']:
+                regressions.append(f"{size} {route}: запросов {actual['queries']} > {expected['queries']}")
+    return regressions
+
+
+def run_benchmarks():
+    """Запуск бенчмарков по всем размерам БД и сравнение с базовой линией"""
+    parser = argparse.ArgumentParser(description='Бенчмарки маршрутов приложения')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 100000, 1000000],
+                        help='число продаж в тестовых БД')
+    parser.add_argument('--iterations', type=int, default=30)
+    parser.add_argument('--output', default=DEFAULT_OUTPUT)
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true',
+                        help='сохранить результаты как новую базовую линию')
+    parser.add_argument('--require-baseline', action='store_true',
+                        help='завершиться с ошибкой, если базовой линии нет (для CI)')
+    parser.add_argument('--tolerance', type=float, default=1.5,
+                        help='допустимый рост p95 относительно базовой линии')
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("БЕНЧМАРКИ МАРШРУТОВ")
+    print("=" * 60)
+
+    results = {}
+    for sales in args.sizes:
+        print(f"\nБД с {sales} продажами:")
+        results[str(sales)] = run_size(sales, args.iterations)
+
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, 'w', encoding='utf-8') as file:
+        json.dump(results, file, ensure_ascii=False, indent=2)
+    print(f"\n📊 Результаты сохранены в {args.output}")
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as file:
+            json.dump(results, file, ensure_ascii=False, indent=2)
+        print(f"Базовая линия сохранена в {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        # Базовая линия зависит от машины и в репозиторий не входит:
+        # ее сохраняют запуском с --save-baseline на той же машине
+        print("\n" + "=" * 60, file=sys.stderr)
+        print(f"⚠️  Базовая линия {args.baseline} не найдена: проверка регрессий НЕ выполнена.\n"
+              f"   Сохраните ее запуском с --save-baseline на этой машине.", file=sys.stderr)
+        print("=" * 60, file=sys.stderr)
+        return 1 if args.require_baseline else 0
+
+    with open(args.baseline, encoding='utf-8') as file:
+        regressions = find_regressions(results, json.load(file), args.tolerance)
+
+    print("\n" + "=" * 60)
+    if regressions:
+        print("❌ ОБНАРУЖЕНЫ РЕГРЕССИИ:")
+        for regression in regressions:
+            print("   " + regression)
+    else:
+        print("✅ РЕГРЕССИЙ НЕТ")
+    print("=" * 60)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(run_benchmarks())
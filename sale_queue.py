@@ -0,0 +1,232 @@
+"""Групповая фиксация продаж (group commit).
+
+В обычном режиме каждая продажа - отдельная транзакция со своим COMMIT
+(и fsync), а параллельные запросы по очереди ждут блокировку записи
+SQLite. При SALE_GROUP_COMMIT продажи из запросов ставятся в очередь
+процесса, и единственный поток-писатель забирает их пакетами: до
+SALE_BATCH_SIZE продаж или SALE_BATCH_WAIT_MS миллисекунд от первой.
+Проверка остатков, списание и вставка всего пакета выполняются в одной
+транзакции, а каждый запрос получает свой результат: продажу или
+InsufficientStock/ProductNotFound/CustomerNotFound - как от
+create_sale.
+
+Если пакет провести не удалось (остатки изменил другой процесс, ошибка
+БД), он откатывается и заявки проводятся по одной через create_sale.
+"""
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import insert, select
+from database import db, Product, Customer, Sale
+from rollup import record_sales
+import stock
+from counters import get_counters
+from report_cache import get_report_cache
+from sales_service import (create_sale, reserve_stock_bulk, SaleError, ProductNotFound,
+                           CustomerNotFound, InsufficientStock)
+
+logger = logging.getLogger(__name__)
+
+# Сколько запрос ждет результата, прежде чем сдаться, с
+RESULT_TIMEOUT = 30
+
+
+class StockChanged(Exception):
+    """Остатки изменились между чтением и списанием (другой процесс)"""
+
+
+class SaleRequest:
+    """Заявка на продажу и ее результат"""
+
+    def __init__(self, product_id, customer_id, quantity):
+        self.product_id = product_id
+        self.customer_id = customer_id
+        self.quantity = quantity
+        self.future = Future()
+
+
+def commit_batch(requests):
+    """Проведение пакета заявок в одной транзакции.
+
+    Заявки рассматриваются в порядке поступления: каждая принимается,
+    если ее товару хватает остатка после предыдущих заявок пакета.
+    Возвращает список результатов по заявкам - Sale (без сессии) или
+    исключение SaleError; при ошибке БД или StockChanged транзакция
+    откатывается и исключение выбрасывается.
+    """
+    try:
+        # FOR UPDATE в PostgreSQL блокирует строки товаров до COMMIT;
+        # в SQLite не нужен: писатель процесса один, а чужие списания
+        # ловит условный UPDATE в reserve_stock_bulk
+        products = {product_id: [quantity or 0, price] for product_id, quantity, price in db.session.execute(
+            select(Product.id, Product.quantity, Product.price)
+            .where(Product.id.in_({request.product_id for request in requests}))
+            .order_by(Product.id).with_for_update())}
+        customers = set(db.session.scalars(
+            select(Customer.id).where(Customer.id.in_({request.customer_id for request in requests}))))
+
+        sale_date = datetime.now()
+        results, rows, reserved = [], [], {}
+        for request in requests:
+            product = products.get(request.product_id)
+            if request.quantity <= 0:
+                results.append(SaleError('Количество должно быть положительным'))
+            elif product is None:
+                results.append(ProductNotFound(request.product_id))
+            elif request.customer_id not in customers:
+                results.append(CustomerNotFound(request.customer_id))
+            elif product[0] < request.quantity:
+                results.append(InsufficientStock(request.product_id, product[0]))
+            else:
+                product[0] -= request.quantity
+                reserved[request.product_id] = reserved.get(request.product_id, 0) + request.quantity
+                results.append(len(rows))
+                rows.append({
+                    'product_id': request.product_id,
+                    'customer_id': request.customer_id,
+                    'quantity': request.quantity,
+                    'total_price': product[1] * request.quantity,
+                    'sale_date': sale_date,
+                })
+
+        if rows:
+            if not reserve_stock_bulk(reserved):
+                raise StockChanged()
+            ids = db.session.scalars(
+                insert(Sale).returning(Sale.id, sort_by_parameter_order=True), rows).all()
+            record_sales(rows)
+            stock.record_movements([{'product_id': row['product_id'], 'quantity': -row['quantity'],
+                                     'kind': stock.SALE, 'created_at': sale_date} for row in rows])
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    if rows:
+        get_counters().record_sales(len(rows), sum(row['total_price'] for row in rows), sale_date.date())
+        get_report_cache().invalidate(sale_date)
+    return [Sale(id=ids[result], **rows[result]) if isinstance(result, int) else result
+            for result in results]
+
+
+def commit_one_by_one(requests):
+    """Проведение заявок по одной (запасной путь для неудавшегося пакета);
+    ошибка одной заявки не мешает остальным"""
+    results = []
+    for request in requests:
+        try:
+            results.append(create_sale(request.product_id, request.customer_id, request.quantity))
+        except Exception as e:
+            results.append(e)
+    return results
+
+
+class SaleQueue:
+    """Очередь заявок и поток-писатель, проводящий их пакетами"""
+
+    def __init__(self, app, batch_size, batch_wait):
+        self.app = app
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.requests = queue.Queue()
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def submit(self, product_id, customer_id, quantity):
+        """Постановка заявки в очередь; возвращает Future с продажей"""
+        self.start()
+        request = SaleRequest(product_id, customer_id, quantity)
+        self.requests.put(request)
+        return request.future
+
+    def create_sale(self, product_id, customer_id, quantity):
+        """То же, что sales_service.create_sale, но через очередь"""
+        future = self.submit(product_id, customer_id, quantity)
+        try:
+            return future.result(RESULT_TIMEOUT)
+        except TimeoutError:
+            # Отмененную заявку писатель пропустит; если он уже взял ее в
+            # работу, отмена не удастся - дождемся результата
+            if future.cancel():
+                raise SaleError('Очередь продаж не отвечает, повторите позже')
+            return future.result()
+
+    def start(self):
+        """Запуск писателя при первой заявке (в каждом процессе после fork)"""
+        if self.thread is None or not self.thread.is_alive():
+            with self.lock:
+                if self.thread is None or not self.thread.is_alive():
+                    self.thread = threading.Thread(target=self.run, name='sale-writer', daemon=True)
+                    self.thread.start()
+
+    def stop(self):
+        """Остановка писателя после обработки уже поставленных заявок"""
+        if self.thread is not None:
+            self.requests.put(None)
+            self.thread.join()
+            self.thread = None
+
+    def next_batch(self):
+        """Заявки следующего пакета (ожидание первой - без ограничения);
+        None в конце списка - сигнал остановки"""
+        batch = [self.requests.get()]
+        deadline = time.monotonic() + self.batch_wait
+        while batch[-1] is not None and len(batch) < self.batch_size:
+            try:
+                batch.append(self.requests.get(timeout=max(0, deadline - time.monotonic())))
+            except queue.Empty:
+                break
+        return batch
+
+    def run(self):
+        with self.app.app_context():
+            while True:
+                batch = self.next_batch()
+                requests = [request for request in batch if request is not None]
+                if requests:
+                    self.process(requests)
+                if batch[-1] is None:
+                    return
+
+    def process(self, requests):
+        """Проведение пакета и передача результатов ожидающим запросам;
+        заявки, отмененные по таймауту, не проводятся"""
+        requests = [request for request in requests if request.future.set_running_or_notify_cancel()]
+        if not requests:
+            return
+        try:
+            results = commit_batch(requests)
+        except Exception:
+            logger.warning('Пакет из %s продаж не проведен, проводим по одной',
+                           len(requests), exc_info=True)
+            results = commit_one_by_one(requests)
+        for request, result in zip(requests, results):
+            if isinstance(result, Exception):
+                request.future.set_exception(result)
+            else:
+                request.future.set_result(result)
+
+
+def init_sale_queue(app):
+    """Очередь продаж при SALE_GROUP_COMMIT, иначе None"""
+    app.extensions['sale_queue'] = SaleQueue(
+        app, app.config['SALE_BATCH_SIZE'], app.config['SALE_BATCH_WAIT_MS'] / 1000
+    ) if app.config['SALE_GROUP_COMMIT'] else None
+
+
+def get_sale_queue(app=None):
+    """Очередь продаж текущего приложения (None - режим без очереди)"""
+    return (app or current_app).extensions['sale_queue']
+
+
+def place_sale(product_id, customer_id, quantity):
+    """Оформление одной продажи: через очередь, если она включена,
+    иначе - своей транзакцией"""
+    sale_queue = get_sale_queue()
+    if sale_queue is None:
+        return create_sale(product_id, customer_id, quantity)
+    return sale_queue.create_sale(product_id, customer_id, quantity)
@@ -0,0 +1,168 @@
+"""Оформление продаж с атомарным списанием остатков"""
+from datetime import datetime
+from sqlalchemy import case, insert, select, update
+from database import db, Product, Customer, Sale
+from rollup import record_sale, record_sales
+import stock
+from counters import get_counters
+from report_cache import get_report_cache
+
+
+class SaleError(Exception):
+    """Продажа не может быть оформлена"""
+
+
+class ProductNotFound(SaleError):
+    """Товар не найден"""
+
+    def __init__(self, product_id):
+        super().__init__(f'Товар {product_id} не найден')
+        self.product_id = product_id
+
+
+class CustomerNotFound(SaleError):
+    """Покупатель не найден"""
+
+    def __init__(self, customer_id):
+        super().__init__(f'Покупатель {customer_id} не найден')
+        self.customer_id = customer_id
+
+
+class InsufficientStock(SaleError):
+    """Недостаточно товара на складе"""
+
+    def __init__(self, product_id, available):
+        super().__init__(f'Недостаточно товара {product_id}, в наличии: {available}')
+        self.product_id = product_id
+        self.available = available
+
+
+def reserve_stock(product_id, quantity):
+    """Списание остатка одним условным UPDATE.
+
+    UPDATE products SET quantity = quantity - :q WHERE id = :id AND quantity >= :q
+    Проверка и уменьшение выполняются в одном операторе, поэтому
+    параллельные продажи не могут увести остаток в минус. Возвращает
+    True, если строка была обновлена.
+    """
+    result = db.session.execute(
+        update(Product)
+        .where(Product.id == product_id, Product.quantity >= quantity)
+        .values(quantity=Product.quantity - quantity)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount == 1
+
+
+def create_sale(product_id, customer_id, quantity):
+    """Оформление продажи в одной транзакции: списание, запись продажи,
+    суточные итоги. При ошибке транзакция откатывается и выбрасывается
+    SaleError.
+    """
+    # Иначе условный UPDATE увеличил бы остаток на отрицательное количество
+    if quantity <= 0:
+        raise SaleError('Количество должно быть положительным')
+    try:
+        # Списание идет первым оператором транзакции: блокировка записи
+        # берется сразу, без перехода от чтения к записи
+        if not reserve_stock(product_id, quantity):
+            product = db.session.get(Product, product_id)
+            if product is None:
+                raise ProductNotFound(product_id)
+            raise InsufficientStock(product_id, product.quantity)
+        # Иначе INSERT упал бы на внешнем ключе с IntegrityError
+        if db.session.get(Customer, customer_id) is None:
+            raise CustomerNotFound(customer_id)
+
+        product = db.session.get(Product, product_id)
+        total_price = product.price * quantity
+        sale_date = datetime.now()
+        sale = Sale(
+            product_id=product_id,
+            customer_id=customer_id,
+            quantity=quantity,
+            total_price=total_price,
+            sale_date=sale_date
+        )
+        db.session.add(sale)
+        # Суточные итоги и журнал движения обновляются в той же транзакции
+        record_sale(sale)
+        stock.record_movement(product_id, -quantity, stock.SALE, created_at=sale_date)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    # Кэши обновляются только после успешного COMMIT
+    get_counters().record_sales(1, total_price, sale_date.date())
+    get_report_cache().invalidate(sale_date)
+    return sale
+
+
+def reserve_stock_bulk(quantities):
+    """Списание остатков нескольких товаров одним оператором.
+
+    quantities - словарь {product_id: количество}. Строка обновляется,
+    только если остатка хватает, поэтому число обновленных строк равно
+    числу товаров лишь тогда, когда хватило всем.
+    """
+    requested = case(quantities, value=Product.id)
+    result = db.session.execute(
+        update(Product)
+        .where(Product.id.in_(quantities), Product.quantity >= requested)
+        .values(quantity=Product.quantity - requested)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount == len(quantities)
+
+
+def create_order(customer_id, lines):
+    """Оформление заказа из нескольких строк (product_id, quantity) в одной
+    транзакции: либо проводятся все строки, либо ни одна.
+
+    Остатки списываются одним UPDATE, продажи вставляются одним
+    executemany, итоги дня обновляются одним upsert - на заказ
+    приходится один COMMIT. Возвращает число оформленных строк.
+    """
+    quantities = {}
+    for product_id, quantity in lines:
+        if quantity <= 0:
+            raise SaleError('Количество должно быть положительным')
+        quantities[product_id] = quantities.get(product_id, 0) + quantity
+    if not quantities:
+        raise SaleError('Заказ пуст')
+
+    try:
+        if not reserve_stock_bulk(quantities):
+            available = dict(db.session.execute(
+                select(Product.id, Product.quantity).where(Product.id.in_(quantities))).all())
+            for product_id, quantity in quantities.items():
+                if product_id not in available:
+                    raise ProductNotFound(product_id)
+                if available[product_id] < quantity:
+                    raise InsufficientStock(product_id, available[product_id])
+            # Остатка хватает, но его успел забрать параллельный заказ
+            raise SaleError('Остатки изменились, повторите заказ')
+        if db.session.get(Customer, customer_id) is None:
+            raise CustomerNotFound(customer_id)
+
+        prices = dict(db.session.execute(
+            select(Product.id, Product.price).where(Product.id.in_(quantities))).all())
+        sale_date = datetime.now()
+        rows = [{
+            'product_id': product_id,
+            'customer_id': customer_id,
+            'quantity': quantity,
+            'total_price': prices[product_id] * quantity,
+            'sale_date': sale_date,
+        } for product_id, quantity in lines]
+        db.session.execute(insert(Sale), rows)
+        record_sales(rows)
+        stock.record_movements([{'product_id': row['product_id'], 'quantity': -row['quantity'],
+                                 'kind': stock.SALE, 'created_at': sale_date} for row in rows])
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    get_counters().record_sales(len(rows), sum(row['total_price'] for row in rows), sale_date.date())
+    get_report_cache().invalidate(sale_date)
+    return len(rows)
@@ -0,0 +1,120 @@
+"""Полнотекстовый поиск товаров и покупателей (SQLite FTS5).
+
+Для каждой таблицы создается внешнее FTS5-содержимое (content=...)
+и триггеры, которые держат индекс в актуальном состоянии. Триггер
+обновления срабатывает только на изменение индексируемых полей,
+поэтому списание остатка при продаже индекс не трогает.
+
+Поиск префиксный: каждое слово запроса ищется как начало слова,
+результаты упорядочены по bm25. На других СУБД используется ILIKE
+без полнотекстового индекса.
+"""
+import re
+from sqlalchemy import DDL, column, event, func, literal_column, or_, select, table, text
+from database import db, Product, Customer
+
+# Таблица -> индексируемые поля и их веса в bm25
+SEARCH_INDEXES = {
+    Product: {'name': 1.0},
+    Customer: {'name': 10.0, 'phone': 1.0, 'email': 1.0},
+}
+
+TOKEN_RE = re.compile(r'\w+')
+
+
+def fts_table(model):
+    return f'{model.__tablename__}_fts'
+
+
+def search_index_ddl(model):
+    """Операторы создания FTS-таблицы и триггеров синхронизации"""
+    table_name, fts = model.__tablename__, fts_table(model)
+    fields = list(SEARCH_INDEXES[model])
+    names = ', '.join(fields)
+    new_values = ', '.join(f'new.{field}' for field in fields)
+    old_values = ', '.join(f'old.{field}' for field in fields)
+    insert_new = f"INSERT INTO {fts}(rowid, {names}) VALUES (new.id, {new_values});"
+    delete_old = f"INSERT INTO {fts}({fts}, rowid, {names}) VALUES ('delete', old.id, {old_values});"
+    return [
+        # prefix='2 3' - отдельные индексы префиксов для подсказок с 2-3 букв
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({names}, content='{table_name}', "
+        f"content_rowid='id', tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table_name} BEGIN {insert_new} END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table_name} BEGIN {delete_old} END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {names} ON {table_name} "
+        f"BEGIN {delete_old} {insert_new} END",
+    ]
+
+
+# Индексы создаются и удаляются вместе с таблицами (create_all/drop_all)
+for _model in SEARCH_INDEXES:
+    for _statement in search_index_ddl(_model):
+        event.listen(_model.__table__, 'after_create', DDL(_statement).execute_if(dialect='sqlite'))
+    event.listen(_model.__table__, 'after_drop',
+                 DDL(f'DROP TABLE IF EXISTS {fts_table(_model)}').execute_if(dialect='sqlite'))
+
+
+def create_search_indexes():
+    """Создание недостающих FTS-индексов в существующей БД с заполнением
+    по текущим данным; возвращает имена созданных таблиц"""
+    if db.engine.dialect.name != 'sqlite':
+        return []
+    existing = set(db.inspect(db.engine).get_table_names())
+    created = []
+    for model in SEARCH_INDEXES:
+        fts = fts_table(model)
+        for statement in search_index_ddl(model):
+            db.session.execute(text(statement))
+        if fts not in existing:
+            db.session.execute(text(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')"))
+            created.append(fts)
+    db.session.commit()
+    return created
+
+
+def fts_query(query):
+    """Запрос пользователя в выражение MATCH: все слова как префиксы"""
+    tokens = TOKEN_RE.findall(query)
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+
+def search(model, query, limit):
+    """До limit записей model, подходящих под запрос query, лучшие первыми.
+
+    Возвращает select(), к которому можно добавить условия.
+    """
+    columns = SEARCH_INDEXES[model]
+    tokens = TOKEN_RE.findall(query)
+    if db.engine.dialect.name != 'sqlite':
+        conditions = [
+            or_(*[getattr(model, field).ilike(f'%{token}%') for field in columns])
+            for token in tokens
+        ]
+        return select(model).where(*conditions).order_by(model.name, model.id).limit(limit)
+
+    fts = table(fts_table(model), column('rowid'))
+    fts_name = literal_column(fts.name)
+    return (
+        select(model)
+        .join(fts, fts.c.rowid == model.id)
+        .where(fts_name.op('MATCH')(fts_query(query)))
+        .order_by(func.bm25(fts_name, *columns.values()), model.id)
+        .limit(limit)
+    )
+
+
+def search_products(query, limit, in_stock=False):
+    """Товары по названию; in_stock - только с ненулевым остатком"""
+    if not TOKEN_RE.search(query):
+        return []
+    statement = search(Product, query, limit)
+    if in_stock:
+        statement = statement.where(Product.quantity > 0)
+    return db.session.scalars(statement).all()
+
+
+def search_customers(query, limit):
+    """Покупатели по имени, телефону или email"""
+    if not TOKEN_RE.search(query):
+        return []
+    return db.session.scalars(search(Customer, query, limit)).all()
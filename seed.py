@@ -0,0 +1,196 @@
+"""Генерация синтетических данных большого объема.
+
+Запуск: python seed.py --products 5000 --customers 100000 --sales 1000000 --days 730
+
+Популярность товаров подчиняется закону Ципфа, продажи распределены по
+дням с недельной и годовой сезонностью. При одинаковом --seed данные
+воспроизводятся полностью. Вставка идет через Core executemany
+порциями; индексы таблицы sales на время загрузки снимаются и строятся
+заново, суточные итоги пересчитываются одним запросом в конце.
+"""
+import argparse
+import itertools
+import math
+import random
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import insert
+from database import db, Product, Customer, Sale, User
+from rollup import rebuild_rollup
+import stock
+
+BATCH_SIZE = 50000
+
+PRODUCT_KINDS = ['Ноутбук', 'Мышь', 'Клавиатура', 'Монитор', 'Наушники', 'Планшет',
+                 'Смартфон', 'Принтер', 'Колонки', 'Роутер', 'Веб-камера', 'Флешка']
+PRODUCT_BRANDS = ['Альфа', 'Вектор', 'Гранит', 'Зенит', 'Комета', 'Орион', 'Протон', 'Спектр']
+FIRST_NAMES = ['Иван', 'Петр', 'Анна', 'Мария', 'Сергей', 'Ольга', 'Алексей', 'Елена',
+               'Дмитрий', 'Наталья', 'Андрей', 'Татьяна']
+LAST_NAMES = ['Иванов', 'Петров', 'Сидоров', 'Смирнов', 'Кузнецов', 'Попов', 'Соколов',
+              'Лебедев', 'Козлов', 'Новиков', 'Морозов', 'Волков']
+
+
+def zipf_cum_weights(n, exponent=1.1):
+    """Накопленные веса распределения Ципфа для n элементов"""
+    return list(itertools.accumulate(1 / (rank ** exponent) for rank in range(1, n + 1)))
+
+
+def day_weight(day):
+    """Относительный объем продаж дня: выходные и декабрь продают больше"""
+    weekly = 1.3 if day.weekday() >= 5 else 1.0
+    yearly = 1 + 0.3 * math.cos(2 * math.pi * (day.timetuple().tm_yday - 350) / 365)
+    return weekly * yearly
+
+
+def sales_per_day(total, start, days):
+    """Распределение total продаж по дням пропорционально day_weight"""
+    weights = [day_weight(start + timedelta(days=i)) for i in range(days)]
+    scale = total / sum(weights)
+    counts = [int(weight * scale) for weight in weights]
+    # Остаток от округления - самым "весомым" дням
+    by_remainder = sorted(range(days), key=lambda i: weights[i] * scale - counts[i], reverse=True)
+    for i in by_remainder[:total - sum(counts)]:
+        counts[i] += 1
+    return counts
+
+
+def insert_batches(table, rows):
+    """Вставка генератора строк порциями по BATCH_SIZE, коммит на порцию"""
+    inserted = 0
+    statement = insert(table)
+    while True:
+        batch = list(itertools.islice(rows, BATCH_SIZE))
+        if not batch:
+            return inserted
+        db.session.execute(statement, batch)
+        db.session.commit()
+        inserted += len(batch)
+
+
+def insert_batches_returning_ids(table, rows):
+    """То же, что insert_batches, но возвращает id вставленных строк в
+    порядке rows (id назначает СУБД: после удалений или в
+    последовательностях PostgreSQL они не обязательно идут подряд)"""
+    ids = []
+    statement = insert(table).returning(table.c.id, sort_by_parameter_order=True)
+    while True:
+        batch = list(itertools.islice(rows, BATCH_SIZE))
+        if not batch:
+            return ids
+        ids.extend(db.session.scalars(statement, batch))
+        db.session.commit()
+
+
+def generate_products(rng, count):
+    for i in range(count):
+        yield {
+            'name': f'{rng.choice(PRODUCT_KINDS)} {rng.choice(PRODUCT_BRANDS)} {i + 1}',
+            'price': round(math.exp(rng.gauss(8, 1.2)), -1) or 10,
+            'quantity': rng.randint(0, 500),
+        }
+
+
+def generate_customers(rng, count):
+    for i in range(count):
+        last = rng.choice(LAST_NAMES)
+        first = rng.choice(FIRST_NAMES)
+        # Фамилия по роду имени
+        if first in ('Анна', 'Мария', 'Ольга', 'Елена', 'Наталья', 'Татьяна'):
+            last += 'а'
+        yield {
+            'name': f'{last} {first}',
+            'phone': f'+7 (9{rng.randint(0, 99):02d}) {rng.randint(0, 999):03d}-'
+                     f'{rng.randint(0, 99):02d}-{rng.randint(0, 99):02d}',
+            'email': f'client{i + 1}@mail.ru',
+        }
+
+
+def generate_sales(rng, count, start, days, product_ids, prices, customer_ids):
+    """Продажи в хронологическом порядке: товар по Ципфу, покупатель -
+    тоже с перекосом (постоянные клиенты), время - в рабочие часы"""
+    product_weights = zipf_cum_weights(len(product_ids))
+    customer_weights = zipf_cum_weights(len(customer_ids), exponent=0.8)
+    for offset, day_count in enumerate(sales_per_day(count, start, days)):
+        if not day_count:
+            continue
+        day = start + timedelta(days=offset)
+        seconds = sorted(rng.randrange(9 * 3600, 21 * 3600) for _ in range(day_count))
+        products = rng.choices(range(len(product_ids)), cum_weights=product_weights, k=day_count)
+        customers = rng.choices(customer_ids, cum_weights=customer_weights, k=day_count)
+        for second, product, customer in zip(seconds, products, customers):
+            quantity = 1 + int(rng.expovariate(1.5))
+            yield {
+                'product_id': product_ids[product],
+                'customer_id': customer,
+                'quantity': quantity,
+                'total_price': prices[product] * quantity,
+                'sale_date': day + timedelta(seconds=second),
+            }
+
+
+def seed(products=1000, customers=10000, sales=100000, days=365, start=None,
+         random_seed=42, reset=False):
+    """Наполнение текущей БД (внутри контекста приложения); возвращает
+    словарь с числом вставленных строк. reset=True удаляет все таблицы
+    перед генерацией, как init_db.py."""
+    rng = random.Random(random_seed)
+    start = start or datetime.combine(datetime.now().date() - timedelta(days=days),
+                                      datetime.min.time())
+    if reset:
+        db.drop_all()
+    db.create_all()
+    if not User.query.first():
+        db.session.add_all([
+            User(username='admin', password='admin123', role='admin'),
+            User(username='manager', password='manager123', role='manager'),
+            User(username='storekeeper', password='store123', role='storekeeper'),
+        ])
+        db.session.commit()
+
+    product_rows = list(generate_products(rng, products))
+    product_ids = insert_batches_returning_ids(Product.__table__, iter(product_rows))
+    prices = [row['price'] for row in product_rows]
+    customer_ids = insert_batches_returning_ids(Customer.__table__, generate_customers(rng, customers))
+    inserted = {'products': len(product_ids), 'customers': len(customer_ids)}
+
+    # Индексы быстрее построить один раз, чем поддерживать при каждой вставке
+    indexes = list(Sale.__table__.indexes)
+    for index in indexes:
+        index.drop(bind=db.engine, checkfirst=True)
+    try:
+        inserted['sales'] = insert_batches(Sale.__table__, generate_sales(
+            rng, sales, start, days, product_ids, prices, customer_ids))
+    finally:
+        for index in indexes:
+            index.create(bind=db.engine, checkfirst=True)
+    rebuild_rollup()
+    # Сгенерированная история не меняет остатки: они - начальные в журнале
+    stock.record_opening_balances(stock.ADJUSTMENT, 'Начальный остаток')
+    db.session.commit()
+    stock.take_snapshot()
+    return inserted
+
+
+if __name__ == '__main__':
+    from app import create_app
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--products', type=int, default=1000)
+    parser.add_argument('--customers', type=int, default=10000)
+    parser.add_argument('--sales', type=int, default=100000)
+    parser.add_argument('--days', type=int, default=365, help='период продаж, дней')
+    parser.add_argument('--start', type=lambda value: datetime.strptime(value, '%Y-%m-%d'),
+                        help='первый день продаж (по умолчанию - days дней назад)')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--reset', action='store_true', help='удалить существующие данные')
+    parser.add_argument('--database', help='адрес БД (по умолчанию DATABASE_URL или trade.db)')
+    args = parser.parse_args()
+
+    app = create_app({'SQLALCHEMY_DATABASE_URI': args.database} if args.database else None)
+
+    started = time.perf_counter()
+    with app.app_context():
+        inserted = seed(args.products, args.customers, args.sales, args.days, args.start,
+                        args.seed, args.reset)
+    print(f"Добавлено: товаров {inserted['products']}, покупателей {inserted['customers']}, "
+          f"продаж {inserted['sales']} за {time.perf_counter() - started:.1f} с")
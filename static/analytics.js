@@ -0,0 +1,105 @@
+// График динамики продаж (SVG без сторонних библиотек).
+// Данные - компактный JSON sales_analytics_series: массив начал интервалов
+// buckets и массивы значений той же длины в totals и series.
+var CHART_COLORS = ['#667eea', '#e5533d', '#2a9d8f', '#f4a261', '#8e44ad',
+                    '#264653', '#e76f51', '#3498db', '#c0392b', '#16a085'];
+var SVG_NS = 'http://www.w3.org/2000/svg';
+
+function svgElement(name, attributes) {
+    var element = document.createElementNS(SVG_NS, name);
+    for (var key in attributes) {
+        element.setAttribute(key, attributes[key]);
+    }
+    return element;
+}
+
+function drawChart(container, legend, data, metric) {
+    var lines = data.series || [{name: 'Все продажи', revenue: data.totals.revenue,
+                                 units: data.totals.units, sales: data.totals.sales}];
+    var width = container.clientWidth || 800, height = 320;
+    var left = 70, right = 10, top = 10, bottom = 30;
+    var count = data.buckets.length;
+    var max = 0;
+    lines.forEach(function (line) {
+        line[metric].forEach(function (value) { max = Math.max(max, value); });
+    });
+    max = max || 1;
+
+    function x(index) {
+        return left + (count > 1 ? index * (width - left - right) / (count - 1) : 0);
+    }
+    function y(value) {
+        return top + (height - top - bottom) * (1 - value / max);
+    }
+
+    var svg = svgElement('svg', {width: width, height: height, viewBox: '0 0 ' + width + ' ' + height});
+    for (var step = 0; step <= 4; step++) {
+        var value = max * step / 4;
+        svg.appendChild(svgElement('line', {x1: left, x2: width - right, y1: y(value), y2: y(value),
+                                            stroke: '#eee'}));
+        var label = svgElement('text', {x: left - 5, y: y(value) + 4, 'text-anchor': 'end', 'font-size': 11});
+        label.textContent = Math.round(value).toLocaleString('ru-RU');
+        svg.appendChild(label);
+    }
+    // Не больше 12 подписей по горизонтали
+    var every = Math.max(1, Math.ceil(count / 12));
+    data.buckets.forEach(function (bucket, index) {
+        if (index % every === 0) {
+            var label = svgElement('text', {x: x(index), y: height - 10, 'text-anchor': 'middle', 'font-size': 11});
+            label.textContent = data.granularity === 'month' ? bucket.slice(0, 7) : bucket;
+            svg.appendChild(label);
+        }
+    });
+
+    legend.innerHTML = '';
+    lines.forEach(function (line, index) {
+        var color = CHART_COLORS[index % CHART_COLORS.length];
+        var points = line[metric].map(function (value, i) { return x(i) + ',' + y(value); });
+        svg.appendChild(svgElement('polyline', {points: points.join(' '), fill: 'none',
+                                                stroke: color, 'stroke-width': 2}));
+        var total = line[metric].reduce(function (sum, value) { return sum + value; }, 0);
+        var item = document.createElement('li');
+        item.style.borderColor = color;
+        item.textContent = line.name + ': ' + Math.round(total).toLocaleString('ru-RU');
+        legend.appendChild(item);
+    });
+
+    container.innerHTML = '';
+    container.appendChild(svg);
+}
+
+function initAnalytics(form) {
+    var container = document.getElementById('analytics-chart');
+    var legend = document.getElementById('analytics-legend');
+    var status = document.getElementById('analytics-status');
+    var data = null;
+
+    function load() {
+        var params = new URLSearchParams(new FormData(form));
+        params.delete('metric');
+        status.textContent = 'Загрузка...';
+        fetch(form.dataset.source + '?' + params.toString())
+            .then(function (response) { return response.json(); })
+            .then(function (result) {
+                if (result.error) {
+                    status.textContent = result.error;
+                    return;
+                }
+                status.textContent = '';
+                data = result;
+                drawChart(container, legend, data, form.elements.metric.value);
+            });
+    }
+
+    form.addEventListener('submit', function (event) {
+        event.preventDefault();
+        load();
+    });
+    // Показатель меняется без нового запроса: все три уже в ответе
+    form.elements.metric.addEventListener('change', function () {
+        if (data) {
+            drawChart(container, legend, data, form.elements.metric.value);
+        }
+    });
+    load();
+}
@@ -0,0 +1,44 @@
+// Поля выбора товара и покупателя с подсказками с сервера.
+// <input class="autocomplete" data-source="URL поиска"> и следом
+// <input type="hidden"> - в скрытое поле попадает id выбранной записи.
+function initAutocomplete(input) {
+    var hidden = input.nextElementSibling;
+    var list = document.createElement('datalist');
+    list.id = 'autocomplete-' + Math.random().toString(36).slice(2);
+    input.setAttribute('list', list.id);
+    input.parentNode.insertBefore(list, hidden.nextSibling);
+    var ids = {};
+    var timer = null;
+
+    function choose() {
+        hidden.value = ids[input.value] || '';
+        input.setCustomValidity(input.value && !hidden.value ? 'Выберите значение из подсказок' : '');
+    }
+
+    input.addEventListener('input', function () {
+        choose();
+        clearTimeout(timer);
+        if (hidden.value || input.value.trim().length < 2) {
+            return;
+        }
+        timer = setTimeout(function () {
+            var source = input.dataset.source;
+            var url = source + (source.indexOf('?') < 0 ? '?' : '&') + 'q=' + encodeURIComponent(input.value);
+            fetch(url)
+                .then(function (response) { return response.json(); })
+                .then(function (items) {
+                    ids = {};
+                    list.innerHTML = '';
+                    items.forEach(function (item) {
+                        var option = document.createElement('option');
+                        option.value = item.label;
+                        ids[item.label] = item.id;
+                        list.appendChild(option);
+                    });
+                    choose();
+                });
+        }, 200);
+    });
+}
+
+document.querySelectorAll('input.autocomplete').forEach(initAutocomplete);
@@ -0,0 +1,203 @@
+"""Журнал движения товаров и остатки на дату.
+
+Каждое изменение Product.quantity сопровождается записью StockMovement
+в той же транзакции. Периодические снимки (StockSnapshot) фиксируют
+остатки товаров, двигавшихся с прошлого снимка, поэтому остаток на
+любой момент - один снимок плюс движения после него, а не вся история.
+
+Запуск:
+    python stock.py snapshot             # снимок остатков (например, ежедневно по cron)
+    python stock.py at 2024-03-01 [id]   # остатки на начало дня
+    python stock.py verify               # сверка журнала с Product.quantity
+    python stock.py rebuild              # корректировки расхождений и пересчет снимков
+"""
+from datetime import datetime
+from sqlalchemy import and_, case, func, insert, literal, select, update
+from database import db, Product, StockMovement, StockSnapshot
+
+SALE = 'sale'
+RECEIPT = 'receipt'
+ADJUSTMENT = 'adjustment'
+
+
+def record_movements(rows):
+    """Запись движений в текущей транзакции; rows - словари с product_id,
+    quantity (со знаком), kind и необязательными created_at, note.
+    Нулевые движения пропускаются. Фиксирует транзакцию вызывающий код."""
+    now = datetime.now()
+    rows = [dict({'created_at': now, 'note': None}, **row) for row in rows if row['quantity']]
+    if rows:
+        db.session.execute(insert(StockMovement), rows)
+
+
+def record_movement(product_id, quantity, kind, note=None, created_at=None):
+    """Запись одного движения в текущей транзакции"""
+    record_movements([{'product_id': product_id, 'quantity': quantity, 'kind': kind,
+                       'note': note, 'created_at': created_at or datetime.now()}])
+
+
+def change_stock(deltas, kind, note=None):
+    """Изменение остатков на величины {product_id: delta} одним UPDATE и
+    запись движений. Изменение прибавляется к текущему остатку, поэтому
+    продажи, прошедшие между чтением и записью, не теряются."""
+    deltas = {product_id: delta for product_id, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    db.session.execute(
+        update(Product)
+        .where(Product.id.in_(deltas))
+        .values(quantity=Product.quantity + case(deltas, value=Product.id))
+        .execution_options(synchronize_session=False)
+    )
+    record_movements([{'product_id': product_id, 'quantity': delta, 'kind': kind, 'note': note}
+                      for product_id, delta in deltas.items()])
+
+
+def set_stock(quantities, note=None):
+    """Установка остатков {product_id: новое значение} корректировкой на
+    разницу с текущим остатком"""
+    current = dict(db.session.execute(
+        select(Product.id, Product.quantity).where(Product.id.in_(quantities))).all())
+    change_stock({product_id: quantity - (current[product_id] or 0)
+                  for product_id, quantity in quantities.items() if product_id in current},
+                 ADJUSTMENT, note)
+
+
+def record_opening_balances(kind=RECEIPT, note=None):
+    """Движение на весь остаток для товаров, у которых еще нет движений
+    (новые товары из массовой вставки, БД до появления журнала).
+    Один INSERT ... SELECT в текущей транзакции; возвращает число строк."""
+    has_movements = select(StockMovement.id).where(StockMovement.product_id == Product.id).exists()
+    source = select(Product.id, literal(kind), Product.quantity, literal(datetime.now()), literal(note)) \
+        .where(Product.quantity != 0, ~has_movements)
+    result = db.session.execute(insert(StockMovement).from_select(
+        ['product_id', 'kind', 'quantity', 'created_at', 'note'], source))
+    return result.rowcount
+
+
+def latest_snapshot(moment=None):
+    """Подзапрос: последний снимок каждого товара (до moment, если задан)"""
+    query = select(StockSnapshot.product_id, func.max(StockSnapshot.movement_id).label('movement_id'))
+    if moment is not None:
+        query = query.where(StockSnapshot.taken_at <= moment)
+    latest = query.group_by(StockSnapshot.product_id).subquery()
+    return select(StockSnapshot).join(latest, and_(
+        StockSnapshot.product_id == latest.c.product_id,
+        StockSnapshot.movement_id == latest.c.movement_id)).subquery()
+
+
+def take_snapshot():
+    """Снимок остатков товаров, двигавшихся с прошлого снимка.
+
+    Стоимость - O(движений с прошлого снимка): новый остаток товара -
+    его последний снимок плюс сумма новых движений. Возвращает число
+    записанных строк.
+    """
+    if db.session.get_bind().dialect.name == 'postgresql':
+        # Дожидаемся транзакций, уже получивших id движений, но не
+        # зафиксированных: иначе их движения не попадут ни в снимок, ни в хвост
+        db.session.execute(db.text('LOCK TABLE stock_movements IN SHARE MODE'))
+    previous = db.session.scalar(select(func.max(StockSnapshot.movement_id))) or 0
+    last = db.session.scalar(select(func.max(StockMovement.id))) or 0
+    if last == previous:
+        db.session.commit()
+        return 0
+
+    delta = select(StockMovement.product_id, func.sum(StockMovement.quantity).label('quantity')) \
+        .where(StockMovement.id > previous, StockMovement.id <= last) \
+        .group_by(StockMovement.product_id).subquery()
+    snapshot = latest_snapshot()
+    source = select(delta.c.product_id, literal(last), literal(datetime.now()),
+                    func.coalesce(snapshot.c.quantity, 0) + delta.c.quantity) \
+        .select_from(delta).outerjoin(snapshot, snapshot.c.product_id == delta.c.product_id)
+    result = db.session.execute(insert(StockSnapshot).from_select(
+        ['product_id', 'movement_id', 'taken_at', 'quantity'], source))
+    db.session.commit()
+    return result.rowcount
+
+
+def stock_at(moment, product_ids=None):
+    """Остатки {product_id: количество} на момент moment.
+
+    Для каждого товара читается последний снимок до moment и движения
+    после него (не дальше moment) - хвост не длиннее промежутка между
+    снимками. Товары без движений до moment не возвращаются.
+    """
+    snapshot = latest_snapshot(moment)
+    tail = select(StockMovement.product_id, func.sum(StockMovement.quantity).label('quantity')) \
+        .select_from(StockMovement) \
+        .outerjoin(snapshot, snapshot.c.product_id == StockMovement.product_id) \
+        .where(StockMovement.id > func.coalesce(snapshot.c.movement_id, 0),
+               StockMovement.created_at <= moment)
+    snapshots = select(snapshot.c.product_id, snapshot.c.quantity)
+    if product_ids is not None:
+        tail = tail.where(StockMovement.product_id.in_(product_ids))
+        snapshots = snapshots.where(snapshot.c.product_id.in_(product_ids))
+
+    stock = dict(db.session.execute(snapshots).all())
+    for product_id, quantity in db.session.execute(tail.group_by(StockMovement.product_id)):
+        stock[product_id] = stock.get(product_id, 0) + quantity
+    return stock
+
+
+def verify():
+    """Сверка: сумма всех движений, остаток по снимкам и Product.quantity.
+
+    Возвращает список расхождений (product_id, остаток в товаре, сумма
+    движений, остаток по снимкам).
+    """
+    ledger = dict(db.session.execute(
+        select(StockMovement.product_id, func.sum(StockMovement.quantity))
+        .group_by(StockMovement.product_id)).all())
+    by_snapshots = stock_at(datetime.max)
+    mismatches = []
+    for product_id, quantity in db.session.execute(select(Product.id, Product.quantity)):
+        quantity = quantity or 0
+        expected = ledger.get(product_id, 0)
+        snapshot = by_snapshots.get(product_id, 0)
+        if quantity != expected or snapshot != expected:
+            mismatches.append((product_id, quantity, expected, snapshot))
+    return mismatches
+
+
+def rebuild():
+    """Приведение журнала в соответствие с Product.quantity: корректировка
+    на разницу для расходящихся товаров и пересчет снимков с начала
+    журнала. Возвращает число скорректированных товаров."""
+    db.session.execute(StockSnapshot.__table__.delete())
+    mismatches = verify()
+    record_movements([{'product_id': product_id, 'quantity': quantity - expected,
+                       'kind': ADJUSTMENT, 'note': 'Сверка журнала'}
+                      for product_id, quantity, expected, snapshot in mismatches])
+    db.session.commit()
+    take_snapshot()
+    return sum(1 for product_id, quantity, expected, snapshot in mismatches if quantity != expected)
+
+
+if __name__ == '__main__':
+    import sys
+    from app import create_app
+
+    commands = ('snapshot', 'at', 'verify', 'rebuild')
+    if len(sys.argv) < 2 or sys.argv[1] not in commands:
+        print(__doc__)
+        sys.exit(2)
+
+    app = create_app()
+    with app.app_context():
+        command = sys.argv[1]
+        if command == 'snapshot':
+            print(f"Снимок остатков: {take_snapshot()} товаров")
+        elif command == 'at':
+            moment = datetime.strptime(sys.argv[2], '%Y-%m-%d')
+            ids = [int(value) for value in sys.argv[3:]] or None
+            for product_id, quantity in sorted(stock_at(moment, ids).items()):
+                print(f"{product_id}\t{quantity}")
+        elif command == 'verify':
+            mismatches = verify()
+            for product_id, quantity, expected, snapshot in mismatches:
+                print(f"Товар {product_id}: остаток {quantity}, по журналу {expected}, по снимкам {snapshot}")
+            print(f"Расхождений: {len(mismatches)}")
+            sys.exit(1 if mismatches else 0)
+        else:
+            print(f"Скорректировано товаров: {rebuild()}")
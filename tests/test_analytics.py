@@ -0,0 +1,107 @@
+import pytest
+from datetime import datetime
+from database import db, Product, Customer, Sale
+from rollup import rebuild_rollup
+from analytics import sales_series, bucket_starts
+
+
+@pytest.fixture
+def history(app):
+    """Продажи трех товаров двум покупателям с января по март 2024 года"""
+    with app.app_context():
+        products = [Product(name=name, price=price, quantity=100)
+                    for name, price in [('Ноутбук', 1000), ('Мышь', 10), ('Коврик', 1)]]
+        customers = [Customer(name='Иванов'), Customer(name='Петров')]
+        db.session.add_all(products + customers)
+        db.session.commit()
+        rows = [
+            # (товар, покупатель, количество, дата)
+            (0, 0, 1, datetime(2024, 1, 7, 23, 59)),   # воскресенье
+            (0, 1, 2, datetime(2024, 1, 8, 10, 0)),    # понедельник
+            (1, 0, 5, datetime(2024, 1, 8, 12, 0)),
+            (2, 1, 3, datetime(2024, 3, 15, 9, 30)),
+            (1, 1, 1, datetime(2024, 3, 31, 18, 0)),
+        ]
+        db.session.add_all([
+            Sale(product_id=products[p].id, customer_id=customers[c].id, quantity=quantity,
+                 total_price=products[p].price * quantity, sale_date=moment)
+            for p, c, quantity, moment in rows
+        ])
+        db.session.commit()
+        rebuild_rollup()
+
+
+class TestAnalytics:
+    """Тестирование рядов динамики продаж"""
+
+    def test_monthly_totals(self, app, history):
+        """Тест: месяц без продаж дает нули, итоги совпадают с продажами"""
+        with app.app_context():
+            data = sales_series(datetime(2024, 1, 1), datetime(2024, 4, 1), 'month')
+        assert data['buckets'] == ['2024-01-01', '2024-02-01', '2024-03-01']
+        assert data['totals'] == {'revenue': [3050.0, 0.0, 13.0], 'units': [8, 0, 4], 'sales': [3, 0, 2]}
+        assert 'series' not in data
+
+    def test_weeks_start_on_monday(self, app, history):
+        """Тест: продажа в воскресенье относится к предыдущей неделе"""
+        with app.app_context():
+            data = sales_series(datetime(2024, 1, 1), datetime(2024, 1, 15), 'week')
+            daily = sales_series(datetime(2024, 1, 7), datetime(2024, 1, 9), 'day')
+        assert data['buckets'] == ['2024-01-01', '2024-01-08']
+        assert data['totals']['sales'] == [1, 2]
+        assert daily['totals']['units'] == [1, 7]
+
+    def test_split_by_product(self, app, history):
+        """Тест разбивки по товарам: top рядов и общий ряд остальных"""
+        with app.app_context():
+            data = sales_series(datetime(2024, 1, 1), datetime(2024, 4, 1), 'month', 'product', top=1)
+        assert [series['name'] for series in data['series']] == ['Ноутбук', 'Остальные']
+        assert data['series'][0]['revenue'] == [3000.0, 0.0, 0.0]
+        assert data['series'][1]['units'] == [5, 0, 4]
+        for metric in ('revenue', 'units', 'sales'):
+            assert [sum(values) for values in zip(*(s[metric] for s in data['series']))] == data['totals'][metric]
+
+    def test_split_by_customer(self, app, history):
+        """Тест разбивки по покупателям (по таблице продаж)"""
+        with app.app_context():
+            data = sales_series(datetime(2024, 1, 1), datetime(2024, 4, 1), 'month', 'customer')
+            totals = sales_series(datetime(2024, 1, 1), datetime(2024, 4, 1), 'month')['totals']
+        assert {series['name']: series['sales'] for series in data['series']} == {
+            'Петров': [1, 0, 2], 'Иванов': [2, 0, 0]}
+        assert data['series'][0]['name'] == 'Петров'
+        assert data['totals'] == totals
+
+    def test_bucket_starts(self):
+        """Тест интервалов, пересекающих период"""
+        assert bucket_starts(datetime(2024, 1, 31), datetime(2024, 3, 2), 'month') == [
+            datetime(2024, 1, 1).date(), datetime(2024, 2, 1).date(), datetime(2024, 3, 1).date()]
+        assert len(bucket_starts(datetime(2021, 1, 1), datetime(2024, 1, 1), 'day')) == 1095
+
+    def test_endpoint(self, admin_client, history, query_counter):
+        """Тест JSON-ответа: ряд строится одним запросом"""
+        query_counter.clear()
+        response = admin_client.get('/reports/analytics/series?start_date=2024-01-01'
+                                    '&end_date=2024-03-31&granularity=month&split=product')
+        assert response.status_code == 200
+        data = response.get_json()
+        assert data['totals']['sales'] == [3, 0, 2]
+        assert len(data['series']) == 3
+        assert len([query for query in query_counter if 'GROUP BY' in query]) == 1
+
+        etag = response.headers['ETag']
+        assert admin_client.get(response.request.full_path, headers={'If-None-Match': etag}).status_code == 304
+
+    def test_endpoint_errors(self, admin_client, history):
+        """Тест: неверные параметры - ошибка 400"""
+        url = '/reports/analytics/series?start_date=2024-01-01&end_date=2024-03-31'
+        assert admin_client.get(url + '&granularity=year').status_code == 400
+        assert admin_client.get(url + '&split=region').status_code == 400
+        assert admin_client.get('/reports/analytics/series').status_code == 400
+        response = admin_client.get('/reports/analytics/series?start_date=1900-01-01'
+                                    '&end_date=2024-03-31&granularity=day')
+        assert 'интервал крупнее' in response.get_json()['error']
+
+    def test_page(self, admin_client):
+        """Тест страницы с графиком"""
+        page = admin_client.get('/reports/analytics').get_data(as_text=True)
+        assert 'analytics.js?v=' in page
@@ -0,0 +1,155 @@
+import pytest
+from database import db, Product, Customer, Sale, User
+from api import issue_token
+from counters import get_counters
+
+
+@pytest.fixture
+def tokens(app):
+    """Токены администратора, менеджера и кладовщика"""
+    with app.app_context():
+        users = {role: User(username=role, password='x', role=role)
+                 for role in ('admin', 'manager', 'storekeeper')}
+        db.session.add_all(users.values())
+        db.session.commit()
+        return {role: issue_token(user, f'Тест {role}') for role, user in users.items()}
+
+
+@pytest.fixture
+def api_client(client, tokens):
+    """Клиент API с токеном менеджера"""
+    def call(method, url, role='manager', **kwargs):
+        headers = {'Authorization': f'Bearer {tokens[role]}'}
+        return client.open(url, method=method, headers=headers, **kwargs)
+    return call
+
+
+class TestApi:
+    """Тестирование JSON API"""
+
+    def test_requires_token(self, client, tokens):
+        """Тест: без токена или с неверным токеном - 401, cookie не выдается"""
+        response = client.get('/api/v1/products')
+        assert response.status_code == 401
+        assert 'error' in response.get_json()
+        response = client.get('/api/v1/products', headers={'Authorization': 'Bearer wrong'})
+        assert response.status_code == 401
+        assert 'Set-Cookie' not in response.headers
+
+    def test_create_single_and_batch(self, app, api_client):
+        """Тест создания одного товара и пакета товаров"""
+        response = api_client('POST', '/api/v1/products', json={'name': 'Ноутбук', 'price': 45000, 'quantity': 5})
+        assert response.status_code == 201
+        assert response.get_json()['name'] == 'Ноутбук'
+
+        response = api_client('POST', '/api/v1/products', json={'items': [
+            {'name': f'Товар {i}', 'price': 100 + i} for i in range(50)
+        ]})
+        assert response.status_code == 201
+        items = response.get_json()['items']
+        assert len(items) == 50
+        assert all(item['id'] for item in items)
+        with app.app_context():
+            assert Product.query.count() == 51
+
+    def test_non_finite_price(self, app, api_client):
+        """Тест: цена nan или inf - ошибка 400, а не 500"""
+        for price in ('nan', 'inf', '-Infinity'):
+            response = api_client('POST', '/api/v1/products', json={'name': 'x', 'price': price})
+            assert response.status_code == 400
+            assert 'price' in response.get_json()['error']
+        with app.app_context():
+            assert Product.query.count() == 0
+
+    def test_batch_is_atomic(self, app, api_client):
+        """Тест: ошибка в одном объекте пакета отменяет весь пакет"""
+        response = api_client('POST', '/api/v1/customers', json={'items': [
+            {'name': 'Иванов'}, {'phone': '123'}
+        ]})
+        assert response.status_code == 400
+        assert 'items[1]' in response.get_json()['error']
+        with app.app_context():
+            assert Customer.query.count() == 0
+
+    def test_batch_update(self, app, api_client, test_data):
+        """Тест пакетного изменения по id"""
+        with app.app_context():
+            ids = [product.id for product in Product.query.order_by(Product.id)]
+        response = api_client('PATCH', '/api/v1/products', json={'items': [
+            {'id': ids[0], 'price': 40000}, {'id': ids[1], 'quantity': 7, 'name': 'Мышь USB'}
+        ]})
+        assert response.status_code == 200
+        with app.app_context():
+            assert db.session.get(Product, ids[0]).price == 40000
+            assert db.session.get(Product, ids[1]).name == 'Мышь USB'
+
+        response = api_client('PATCH', f'/api/v1/products/{ids[0]}', json={'quantity': 3})
+        assert response.get_json()['quantity'] == 3
+        assert api_client('PATCH', '/api/v1/products', json={'items': [{'id': 999, 'price': 1}]}).status_code == 404
+
+    def test_cursor_pagination_and_fields(self, app, api_client):
+        """Тест страниц с курсором и выбора полей"""
+        with app.app_context():
+            db.session.add_all([Customer(name=f'Покупатель {i}') for i in range(25)])
+            db.session.commit()
+        seen = []
+        url = '/api/v1/customers?limit=10&fields=id,name'
+        while url:
+            data = api_client('GET', url).get_json()
+            assert all(set(item) == {'id', 'name'} for item in data['items'])
+            seen.extend(item['id'] for item in data['items'])
+            url = f'/api/v1/customers?limit=10&fields=id,name&after={data["next_cursor"]}' \
+                if data['next_cursor'] else None
+        assert seen == sorted(seen) and len(seen) == 25
+        assert api_client('GET', '/api/v1/customers?fields=password').status_code == 400
+
+    def test_sales(self, app, api_client, test_data):
+        """Тест оформления продажи и заказа через API"""
+        with app.app_context():
+            laptop = Product.query.filter_by(name='Ноутбук').first().id
+            mouse = Product.query.filter_by(name='Мышь').first().id
+            customer = Customer.query.first().id
+
+        response = api_client('POST', '/api/v1/sales', json={'product_id': laptop, 'customer_id': customer, 'quantity': 2})
+        assert response.status_code == 201
+        assert response.get_json()['total_price'] == 90000
+
+        response = api_client('POST', '/api/v1/sales', json={'customer_id': customer, 'lines': [
+            {'product_id': mouse, 'quantity': 3}, {'product_id': laptop, 'quantity': 1}
+        ]})
+        assert response.get_json() == {'created': 2}
+
+        response = api_client('POST', '/api/v1/sales', json={'product_id': laptop, 'customer_id': customer, 'quantity': 100})
+        assert response.status_code == 409
+        assert response.get_json()['available'] == 7
+
+        sales = api_client('GET', f'/api/v1/sales?product_id={laptop}').get_json()['items']
+        assert [sale['quantity'] for sale in sales][:2] == [1, 2]
+        # Курсор [[1], 2] с неверными типами - первая страница, а не 500
+        response = api_client('GET', '/api/v1/sales?after=W1sxXSwyXQ')
+        assert response.status_code == 200
+        with app.app_context():
+            assert Sale.query.count() == 5
+
+    def test_roles(self, app, api_client, test_data):
+        """Тест прав: кладовщик только читает, удаляет только администратор"""
+        assert api_client('GET', '/api/v1/products', role='storekeeper').status_code == 200
+        assert api_client('POST', '/api/v1/products', role='storekeeper',
+                          json={'name': 'X', 'price': 1}).status_code == 403
+
+        product_id = api_client('POST', '/api/v1/products', json={'name': 'X', 'price': 1}).get_json()['id']
+        assert api_client('DELETE', f'/api/v1/products/{product_id}').status_code == 403
+        assert api_client('DELETE', f'/api/v1/products/{product_id}', role='admin').status_code == 204
+        assert api_client('GET', f'/api/v1/products/{product_id}').status_code == 404
+
+        with app.app_context():
+            sold = Sale.query.first().product_id
+        assert api_client('DELETE', f'/api/v1/products/{sold}', role='admin').status_code == 409
+
+    def test_counters_follow_api_writes(self, app, api_client):
+        """Тест: создание через API обновляет счетчики главной страницы"""
+        with app.app_context():
+            get_counters().snapshot()
+        api_client('POST', '/api/v1/products', json={'items': [{'name': 'A', 'price': 1}, {'name': 'B', 'price': 2}]})
+        with app.app_context():
+            assert get_counters().snapshot()['products'] == 2
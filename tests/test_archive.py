@@ -0,0 +1,139 @@
+import os
+import pytest
+from datetime import date, datetime
+from database import db, Product, Customer, Sale, DailySalesRollup, ArchivedPeriod
+from report_engine import build_report
+from rollup import record_sale, rebuild_rollup
+from counters import get_counters
+from export import sales_rows
+import archive
+
+pytestmark = pytest.mark.sqlite_only
+
+
+@pytest.fixture
+def history(app, tmp_path):
+    """Продажи за 2023 и 2024 годы и одна свежая продажа"""
+    app.config['ARCHIVE_DIR'] = str(tmp_path)
+    with app.app_context():
+        product = Product(name='Мышь', price=800, quantity=100)
+        customer = Customer(name='Иванов')
+        db.session.add_all([product, customer])
+        db.session.commit()
+        moments = [datetime(2023, 11, 5, 10), datetime(2023, 12, 20, 15), datetime(2024, 1, 10, 12),
+                   datetime(2024, 1, 31, 23, 30), datetime(2024, 6, 1, 9)]
+        for i, moment in enumerate(moments, 1):
+            sale = Sale(product_id=product.id, customer_id=customer.id, quantity=i,
+                        total_price=800 * i, sale_date=moment)
+            db.session.add(sale)
+            record_sale(sale)
+        db.session.commit()
+        return {'product': product.id, 'customer': customer.id}
+
+
+def report_totals(start, end):
+    report = build_report(start, end)
+    return report['total_sales'], report['total_revenue'], len(report['sales'])
+
+
+class TestArchive:
+    """Тестирование переноса старых продаж в архивные файлы"""
+
+    def test_archive_moves_closed_months(self, app, history, tmp_path):
+        """Тест: месяцы старше границы уходят в файлы по годам"""
+        with app.app_context():
+            moved = archive.archive_sales(keep_months=5, today=date(2024, 7, 15))
+            assert moved == [('2023-11-01', 1), ('2023-12-01', 1), ('2024-01-01', 2)]
+            assert Sale.query.count() == 1
+            assert sorted(os.listdir(tmp_path)) == ['sales_2023.db', 'sales_2024.db']
+            period = db.session.get(ArchivedPeriod, date(2024, 1, 1))
+            assert (period.sales_count, period.quantity, period.revenue) == (2, 7, 5600)
+            # Повторный запуск ничего не переносит
+            assert archive.archive_sales(keep_months=5, today=date(2024, 7, 15)) == []
+
+    def test_newest_sale_stays(self, app, history):
+        """Тест: самая новая продажа не переносится, id не переиспользуются"""
+        with app.app_context():
+            archive.archive_sales(keep_months=0, today=date(2024, 7, 15))
+            newest = Sale.query.one()
+            assert newest.sale_date == datetime(2024, 6, 1, 9)
+            sale = Sale(product_id=history['product'], customer_id=history['customer'],
+                        quantity=1, total_price=800)
+            db.session.add(sale)
+            db.session.commit()
+            assert sale.id == 6
+
+    def test_reports_and_export_read_archive(self, app, history):
+        """Тест: отчеты и выгрузка одинаковы до и после переноса"""
+        with app.app_context():
+            periods = [(datetime(2023, 1, 1), datetime(2025, 1, 1)),
+                       (datetime(2023, 12, 20, 12), datetime(2024, 1, 31, 12)),
+                       (datetime(2024, 1, 1), datetime(2024, 2, 1))]
+            before = [report_totals(*period) for period in periods]
+            rows = list(sales_rows(*periods[0]))
+            archive.archive_sales(keep_months=5, today=date(2024, 7, 15))
+            assert [report_totals(*period) for period in periods] == before
+            assert list(sales_rows(*periods[0])) == rows
+            assert before[1] == (2, 800 * 5, 2)
+
+    def test_counters_and_rollup_keep_archived_sales(self, app, history):
+        """Тест: счетчик продаж и пересчет итогов учитывают архив"""
+        with app.app_context():
+            rollup = sorted((row.date, row.quantity) for row in DailySalesRollup.query)
+            archive.archive_sales(keep_months=5, today=date(2024, 7, 15))
+            assert get_counters().reconcile()['sales'] == 5
+            rebuild_rollup()
+            assert sorted((row.date, row.quantity) for row in DailySalesRollup.query) == rollup
+
+    def test_delete_blocked_by_archived_sales(self, app, admin_client, history):
+        """Тест: нельзя удалить покупателя, если его продажи только в архиве"""
+        with app.app_context():
+            customer = Customer(name='Петров')
+            db.session.add(customer)
+            db.session.commit()
+            sale = Sale(product_id=history['product'], customer_id=customer.id, quantity=1,
+                        total_price=800, sale_date=datetime(2023, 11, 6))
+            # Свежая продажа другого покупателя: самая новая остается в основной БД
+            newest = Sale(product_id=history['product'], customer_id=history['customer'], quantity=1,
+                          total_price=800, sale_date=datetime(2024, 7, 1))
+            db.session.add_all([sale, newest])
+            db.session.commit()
+            archive.archive_sales(keep_months=5, today=date(2024, 7, 15))
+            assert not Sale.query.filter_by(customer_id=customer.id).count()
+            customer_id = customer.id
+
+        admin_client.get(f'/customers/delete/{customer_id}')
+        with app.app_context():
+            assert db.session.get(Customer, customer_id) is not None
+            assert not archive.has_sales('customer_id', 10 ** 6)
+
+    def test_too_many_archives(self, app, history):
+        """Тест: период больше чем на MAX_ATTACHED архивных лет отклоняется"""
+        with app.app_context():
+            db.session.add_all(ArchivedPeriod(month=date(year, 1, 1), file=archive.archive_file(year),
+                                              sales_count=0, quantity=0, revenue=0)
+                               for year in range(2000, 2000 + archive.MAX_ATTACHED + 1))
+            db.session.commit()
+            with pytest.raises(archive.ArchiveError):
+                archive.sales_source(datetime(2000, 1, 1), datetime(2020, 1, 1))
+
+    def test_too_many_archives_in_export(self, app, admin_client, history):
+        """Тест: выгрузка за слишком длинный период - сообщение, а не ошибка 500"""
+        with app.app_context():
+            db.session.add_all(ArchivedPeriod(month=date(year, 1, 1), file=archive.archive_file(year),
+                                              sales_count=0, quantity=0, revenue=0)
+                               for year in range(2000, 2000 + archive.MAX_ATTACHED + 1))
+            db.session.commit()
+        response = admin_client.get('/reports/export.csv?start_date=2000-01-01&end_date=2020-01-01',
+                                    follow_redirects=True)
+        assert response.status_code == 200
+        assert 'архивных лет' in response.get_data(as_text=True)
+
+    def test_archive_indexes(self, app, history):
+        """Тест: в архиве есть индексы для проверок по товару и покупателю"""
+        with app.app_context():
+            archive.archive_sales(keep_months=5, today=date(2024, 7, 15))
+            archive.attach([2024])
+            indexes = {row[0] for row in db.session.execute(db.text(
+                "SELECT name FROM archive_2024.sqlite_master WHERE type = 'index'"))}
+            assert {'ix_archive_2024_sales_product_id', 'ix_archive_2024_sales_customer_id'} <= indexes
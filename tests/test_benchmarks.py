@@ -0,0 +1,30 @@
+import pytest
+from run_benchmarks import find_regressions
+
+
+def route(p95, queries):
+    return {'p95_ms': p95, 'queries': queries}
+
+
+class TestBenchmarkRegressions:
+    """Тестирование сравнения результатов бенчмарков с базовой линией"""
+
+    def test_no_regression_within_tolerance(self):
+        """Тест: рост в пределах допуска и шума не считается регрессией"""
+        baseline = {'1000': {'index': route(10, 5), 'login': route(1, 2)}}
+        results = {'1000': {'index': route(14, 5), 'login': route(2.5, 2)}}
+        assert find_regressions(results, baseline, 1.5) == []
+
+    def test_latency_and_query_regressions(self):
+        """Тест: рост p95 сверх допуска и новые запросы - регрессии"""
+        baseline = {'1000': {'index': route(10, 5), 'sales': route(10, 4)}}
+        results = {'1000': {'index': route(30, 5), 'sales': route(10, 40)}}
+        regressions = find_regressions(results, baseline, 1.5)
+        assert len(regressions) == 2
+        assert regressions[0].startswith('1000 index: p95')
+        assert regressions[1].startswith('1000 sales: запросов 40')
+
+    def test_missing_routes_are_skipped(self):
+        """Тест: маршруты, которых нет в результатах, не сравниваются"""
+        baseline = {'1000000': {'index': route(10, 5)}}
+        assert find_regressions({'1000': {}}, baseline, 1.5) == []
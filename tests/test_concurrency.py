@@ -0,0 +1,67 @@
+import threading
+import pytest
+from app import create_app
+from config import TestConfig
+from database import db, Product, Customer, Sale
+from sales_service import create_sale, InsufficientStock
+
+
+@pytest.fixture
+def file_app(tmp_path):
+    """Приложение с файловой SQLite: конкуренция за запись как в продакшене"""
+    class FileConfig(TestConfig):
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{tmp_path / "stress.db"}'
+
+    file_app = create_app(FileConfig)
+    with file_app.app_context():
+        db.create_all()
+    yield file_app
+    with file_app.app_context():
+        db.engine.dispose()
+
+
+class TestConcurrentSales:
+    """Стресс-тест параллельного оформления продаж"""
+
+    def test_no_oversell_under_contention(self, file_app):
+        """Тест: параллельные продажи последних единиц не уводят остаток в минус"""
+        stock = 50
+        threads_count = 8
+        attempts_per_thread = 20
+
+        with file_app.app_context():
+            product = Product(name='Дефицит', price=100, quantity=stock)
+            customer = Customer(name='Покупатель')
+            db.session.add_all([product, customer])
+            db.session.commit()
+            product_id, customer_id = product.id, customer.id
+
+        sold = []
+        rejected = []
+        errors = []
+        start_barrier = threading.Barrier(threads_count)
+
+        def worker():
+            with file_app.app_context():
+                start_barrier.wait()
+                for _ in range(attempts_per_thread):
+                    try:
+                        create_sale(product_id, customer_id, 1)
+                        sold.append(1)
+                    except InsufficientStock:
+                        rejected.append(1)
+                    except Exception as e:
+                        errors.append(e)
+
+        threads = [threading.Thread(target=worker) for _ in range(threads_count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert errors == []
+        assert len(sold) == stock
+        assert len(rejected) == threads_count * attempts_per_thread - stock
+        with file_app.app_context():
+            assert db.session.get(Product, product_id).quantity == 0
+            assert Sale.query.count() == stock
@@ -0,0 +1,54 @@
+from database import db, Customer
+from sales_service import create_sale
+
+
+class TestConditional:
+    """Тестирование ответов 304 и кэширования статики"""
+
+    def test_not_modified(self, admin_client, test_data):
+        """Тест: повторный заход с тем же ETag - 304 без тела"""
+        response = admin_client.get('/products')
+        etag = response.headers['ETag']
+        assert response.headers['Cache-Control'] == 'private, no-cache'
+        response = admin_client.get('/products', headers={'If-None-Match': etag})
+        assert response.status_code == 304
+        assert response.data == b''
+        assert admin_client.get('/products?sort=price', headers={'If-None-Match': etag}).status_code == 200
+
+    def test_etag_changes_on_writes(self, app, admin_client, test_data):
+        """Тест: добавление, изменение и продажа меняют ETag"""
+        products = admin_client.get('/products').headers['ETag']
+        sales = admin_client.get('/sales').headers['ETag']
+        admin_client.post('/products/add', data={'name': 'Клавиатура', 'price': '1500', 'quantity': '3'})
+        admin_client.get('/products')  # страница с уведомлением о добавлении
+        assert admin_client.get('/products').headers['ETag'] != products
+
+        with app.app_context():
+            customer = Customer.query.first()
+            create_sale(customer.sales[0].product_id, customer.id, 1)
+        assert admin_client.get('/sales', headers={'If-None-Match': sales}).status_code == 200
+
+        customers = admin_client.get('/customers').headers['ETag']
+        with app.app_context():
+            Customer.query.first().name = 'Сидоров'
+            db.session.commit()
+        assert admin_client.get('/customers').headers['ETag'] != customers
+
+    def test_flash_not_cached(self, admin_client, test_data):
+        """Тест: страница с уведомлением строится заново"""
+        etag = admin_client.get('/customers').headers['ETag']
+        admin_client.post('/customers/add', data={'name': 'Новиков'})
+        response = admin_client.get('/customers', headers={'If-None-Match': etag})
+        assert response.status_code == 200
+        assert 'ETag' not in response.headers
+
+    def test_static_versioned(self, admin_client):
+        """Тест: адрес стилей содержит хеш, ответ кэшируется на год"""
+        page = admin_client.get('/').get_data(as_text=True)
+        assert 'style.css?v=' in page
+        start = page.index('/static/style.css?v=')
+        url = page[start:page.index('"', start)]
+        response = admin_client.get(url)
+        assert response.status_code == 200
+        assert 'max-age=31536000' in response.headers['Cache-Control']
+        assert 'immutable' in response.headers['Cache-Control']
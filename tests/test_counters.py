@@ -0,0 +1,95 @@
+import time
+import pytest
+from database import db, Product, Customer
+from counters import get_counters, MemoryBackend, DashboardCounters
+from rollup import rebuild_rollup
+from sales_service import create_sale, create_order, InsufficientStock
+
+
+class TestCounters:
+    """Тестирование кэша счетчиков главной страницы"""
+
+    def test_dashboard_cached(self, app, admin_client, test_data, query_counter):
+        """Тест: первый заход - один запрос, следующие - без запросов"""
+        admin_client.get('/')
+        assert len(query_counter) == 1
+        query_counter.clear()
+        response = admin_client.get('/')
+        assert query_counter == []
+        assert response.status_code == 200
+
+    def test_snapshot_values(self, app, test_data):
+        """Тест значений, посчитанных по БД"""
+        with app.app_context():
+            rebuild_rollup()
+            counters = get_counters().snapshot()
+        assert counters == {'products': 2, 'customers': 2, 'sales': 2, 'today_revenue': 94000}
+
+    def test_write_through_on_sales(self, app, test_data, query_counter):
+        """Тест: продажи и заказы обновляют счетчики без пересчета"""
+        with app.app_context():
+            rebuild_rollup()
+            get_counters().snapshot()
+            laptop = Product.query.filter_by(name='Ноутбук').first()
+            mouse = Product.query.filter_by(name='Мышь').first()
+            customer = Customer.query.first()
+            create_sale(laptop.id, customer.id, 1)
+            create_order(customer.id, [(mouse.id, 2), (mouse.id, 1)])
+            with pytest.raises(InsufficientStock):
+                create_sale(laptop.id, customer.id, 100)
+
+            query_counter.clear()
+            counters = get_counters().snapshot()
+        assert query_counter == []
+        assert counters['sales'] == 5
+        assert counters['today_revenue'] == 94000 + 45000 + 2400
+
+    def test_write_through_on_routes(self, app, admin_client, query_counter):
+        """Тест: добавление и удаление через страницы видно на главной"""
+        admin_client.get('/')
+        admin_client.post('/products/add', data={'name': 'Клавиатура', 'price': '1500', 'quantity': '5'})
+        admin_client.post('/customers/add', data={'name': 'Петров П.П.'})
+        with app.app_context():
+            product_id = Product.query.filter_by(name='Клавиатура').first().id
+        admin_client.get(f'/products/delete/{product_id}')
+
+        query_counter.clear()
+        with app.app_context():
+            counters = get_counters().snapshot()
+        assert query_counter == []
+        assert counters['products'] == 0
+        assert counters['customers'] == 1
+
+    def test_reconcile_after_ttl(self, app, test_data, monkeypatch):
+        """Тест: по истечении TTL изменения в обход приложения подхватываются"""
+        with app.app_context():
+            counters = get_counters()
+            assert counters.snapshot()['products'] == 2
+            db.session.add(Product(name='Монитор', price=12000, quantity=3))
+            db.session.commit()
+            assert counters.snapshot()['products'] == 2
+
+            now = time.monotonic() + counters.ttl + 1
+            monkeypatch.setattr('counters.time.monotonic', lambda: now)
+            assert counters.snapshot()['products'] == 3
+
+    def test_memory_backend(self):
+        """Тест хранилища в памяти: приращение только существующего ключа, TTL"""
+        backend = MemoryBackend()
+        backend.incr('key', {'count': 1})
+        assert backend.get('key') is None
+
+        backend.set('key', {'count': 1}, ttl=60)
+        backend.incr('key', {'count': 2})
+        assert backend.get('key') == {'count': 3}
+
+        backend.set('key', {'count': 1}, ttl=0)
+        assert backend.get('key') is None
+
+    def test_day_change_reconciles(self, app, test_data):
+        """Тест: закешированное значение за прошлый день не используется"""
+        with app.app_context():
+            counters = DashboardCounters(MemoryBackend(), ttl=60)
+            counters.backend.set('dashboard', {'products': 0, 'customers': 0, 'sales': 0,
+                                               'today_revenue': 5, 'today': '2000-01-01'}, ttl=60)
+            assert counters.snapshot()['products'] == 2
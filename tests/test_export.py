@@ -0,0 +1,86 @@
+import csv
+import io
+import pytest
+from database import db, Product, Customer, Sale
+from rollup import rebuild_rollup
+from datetime import datetime, timedelta
+import export
+
+
+@pytest.fixture
+def march_sales(app):
+    """Продажи за 1-3 марта 2024 года"""
+    with app.app_context():
+        product = Product(name='Клавиатура', price=1500, quantity=100)
+        customer = Customer(name='Сидорова Анна')
+        db.session.add_all([product, customer])
+        db.session.commit()
+        db.session.add_all([
+            Sale(product_id=product.id, customer_id=customer.id, quantity=1,
+                 total_price=1500, sale_date=datetime(2024, 3, 1, 9, 0) + timedelta(days=i))
+            for i in range(3)
+        ])
+        db.session.commit()
+        rebuild_rollup()
+
+
+def read_csv(response):
+    return list(csv.reader(io.StringIO(response.get_data(as_text=True).lstrip('\ufeff')),
+                           delimiter=';'))
+
+
+class TestExport:
+    """Тестирование выгрузки отчетов"""
+
+    def test_export_sales_csv(self, admin_client, march_sales):
+        """Тест выгрузки продаж за период в CSV"""
+        response = admin_client.get('/reports/export.csv?start_date=2024-03-01&end_date=2024-03-02')
+        assert response.status_code == 200
+        assert response.is_streamed
+        assert 'attachment' in response.headers['Content-Disposition']
+
+        rows = read_csv(response)
+        assert rows[0] == export.SALES_HEADER
+        assert rows[1:] == [
+            ['01.03.2024 09:00', 'Клавиатура', 'Сидорова Анна', '1', '1500.0'],
+            ['02.03.2024 09:00', 'Клавиатура', 'Сидорова Анна', '1', '1500.0'],
+        ]
+
+    def test_export_product_stats_csv(self, admin_client, march_sales):
+        """Тест выгрузки статистики по товарам"""
+        response = admin_client.get(
+            '/reports/export.csv?kind=products&start_date=2024-03-01&end_date=2024-03-31')
+        assert read_csv(response)[1:] == [['Клавиатура', '3', '4500.0']]
+
+    def test_csv_is_sent_in_chunks(self, app, march_sales, monkeypatch):
+        """Тест: CSV отдается частями, а не одной строкой в конце"""
+        monkeypatch.setattr(export, 'EXPORT_BATCH_SIZE', 1)
+        with app.app_context():
+            header, rows = export.export_rows('sales', datetime(2024, 3, 1), datetime(2024, 4, 1))
+            chunks = list(export.iter_csv(header, rows))
+        assert len(chunks) >= 3
+
+    def test_export_xlsx(self, admin_client, march_sales):
+        """Тест выгрузки в XLSX"""
+        openpyxl = pytest.importorskip('openpyxl')
+        response = admin_client.get('/reports/export.xlsx?start_date=2024-03-01&end_date=2024-03-31')
+        assert response.status_code == 200
+        sheet = openpyxl.load_workbook(io.BytesIO(response.get_data())).active
+        assert sheet.max_row == 4
+
+    def test_export_requires_period(self, admin_client):
+        """Тест выгрузки без периода"""
+        response = admin_client.get('/reports/export.csv')
+        assert response.status_code == 302
+
+    def test_report_detail_is_limited(self, app, admin_client, march_sales):
+        """Тест: детализация на странице отчета ограничена"""
+        app.config['REPORT_DETAIL_LIMIT'] = 2
+        try:
+            response = admin_client.post('/reports', data={
+                'start_date': '2024-03-01', 'end_date': '2024-03-31'})
+        finally:
+            app.config['REPORT_DETAIL_LIMIT'] = 500
+        html = response.get_data(as_text=True)
+        assert 'Показаны первые 2 продаж из 3' in html
+        assert '/reports/export.csv?' in html
@@ -0,0 +1,87 @@
+import pytest
+from datetime import date, timedelta
+from database import db, Product, Customer, DailySalesRollup
+from sales_service import create_sale
+
+np = pytest.importorskip('numpy')
+from forecast import build_forecast, smoothing_weights, get_forecast_cache  # noqa: E402
+
+
+@pytest.fixture
+def demand(app):
+    """Товар с ровным спросом 2 шт./день, товар с растущим спросом и товар без продаж"""
+    with app.app_context():
+        steady = Product(name='Мышь', price=800, quantity=10)
+        growing = Product(name='Кабель', price=300, quantity=1000)
+        idle = Product(name='Ноутбук', price=45000, quantity=5)
+        db.session.add_all([steady, growing, idle, Customer(name='Иванов')])
+        db.session.commit()
+        today = date.today()
+        rows = []
+        for days_ago in range(1, 61):
+            day = today - timedelta(days=days_ago)
+            rows.append(DailySalesRollup(date=day, product_id=steady.id, quantity=2,
+                                         revenue=1600, sales_count=1))
+            rows.append(DailySalesRollup(date=day, product_id=growing.id, quantity=60 - days_ago,
+                                         revenue=300 * (60 - days_ago), sales_count=1))
+        db.session.add_all(rows)
+        db.session.commit()
+        return {'steady': steady.id, 'growing': growing.id, 'idle': idle.id}
+
+
+class TestForecast:
+    """Тестирование прогноза расхода и закупок"""
+
+    def test_smoothing_weights(self):
+        """Тест: веса дают то же, что рекуррентное сглаживание"""
+        series = np.random.default_rng(1).integers(0, 20, 50).astype(np.float32)
+        level = series[0]
+        for value in series[1:]:
+            level = 0.2 * value + 0.8 * level
+        weights = smoothing_weights(50, 0.2)
+        assert weights.sum() == pytest.approx(1)
+        assert series @ weights == pytest.approx(level, rel=1e-5)
+
+    def test_steady_demand(self, app, demand):
+        """Тест: остаток 10 при расходе 2 в день - хватит на 5 дней"""
+        with app.app_context():
+            forecast = build_forecast()
+        row = {row['id']: row for row in forecast.rows(forecast.select(only_reorder=False))}[demand['steady']]
+        assert row['average'] == 2
+        assert row['smoothed'] == pytest.approx(2)
+        assert row['days_of_cover'] == 5
+        # 2 шт. x (7 дней поставки + 14 дней до следующей закупки) - 10 в наличии
+        assert row['reorder_quantity'] == 32
+        assert row['order_by'] == date.today().isoformat()
+
+    def test_selection(self, app, demand):
+        """Тест: товар без продаж не заказывается, порядок - по запасу в днях"""
+        with app.app_context():
+            forecast = build_forecast()
+        ids = [row['id'] for row in forecast.rows(forecast.select())]
+        assert ids == [demand['steady'], demand['growing']]
+        everything = forecast.rows(forecast.select(only_reorder=False))
+        assert everything[-1]['id'] == demand['idle']
+        assert everything[-1]['days_of_cover'] is None
+        assert everything[-1]['reorder_quantity'] == 0
+        # Сглаженный прогноз растущего спроса ближе к последним дням, чем среднее за окно
+        growing = everything[1]
+        assert growing['average'] < growing['smoothed'] < 59
+
+    def test_cached_until_sale(self, app, demand):
+        """Тест: прогноз пересчитывается только после продажи"""
+        with app.app_context():
+            cache = get_forecast_cache()
+            first = cache.get()
+            assert cache.get() is first
+            create_sale(demand['growing'], Customer.query.first().id, 1)
+            assert cache.get() is not first
+
+    def test_page_and_json(self, admin_client, demand):
+        """Тест страницы закупок и JSON"""
+        page = admin_client.get('/reorder').get_data(as_text=True)
+        assert 'Мышь' in page and 'Ноутбук' not in page
+        assert 'Ноутбук' in admin_client.get('/reorder?all=1').get_data(as_text=True)
+        data = admin_client.get('/reorder/data?all=1&limit=1').get_json()
+        assert [item['name'] for item in data['items']] == ['Мышь']
+        assert data['lead_days'] == 7
@@ -0,0 +1,82 @@
+import io
+import pytest
+from database import db, Product, Customer, Sale, DailySalesRollup
+import importer
+
+
+class TestImport:
+    """Тестирование массового импорта из CSV"""
+
+    def test_import_products_in_chunks(self, app):
+        """Тест импорта товаров несколькими порциями"""
+        lines = ['name,price,quantity'] + [f'Товар {i},{100 + i},{i}' for i in range(25)]
+        with app.app_context():
+            result = importer.import_products(io.StringIO('\n'.join(lines)), chunk_size=10)
+            assert result.inserted == 25
+            assert result.error_count == 0
+            assert Product.query.count() == 25
+            assert Product.query.filter_by(name='Товар 7').first().price == 107
+
+    def test_bad_rows_do_not_abort_import(self, app):
+        """Тест: ошибочные строки попадают в отчет, остальные импортируются"""
+        data = 'name;phone;email\nИванов Иван;123;ivan@test.ru\n;456;\nПетров Петр;;\n'
+        with app.app_context():
+            result = importer.import_customers(io.StringIO(data))
+            assert result.inserted == 2
+            assert result.errors == [(3, 'не заполнено поле name')]
+
+    def test_non_finite_numbers_are_row_errors(self, app):
+        """Тест: nan и inf - ошибка строки, а не отказ всей порции"""
+        data = 'name,price,quantity\nМышь,800,5\nКлавиатура,nan,3\nМонитор,inf,1\n'
+        with app.app_context():
+            result = importer.import_products(io.StringIO(data))
+            assert result.inserted == 1
+            assert result.errors == [(3, 'price: "nan" не число'), (4, 'price: "inf" не число')]
+
+    def test_import_sales_resolves_names(self, app, test_data):
+        """Тест импорта продаж с поиском товаров и покупателей по имени"""
+        data = '\n'.join([
+            'product,customer,quantity,total_price,sale_date',
+            'Мышь,Петров Петр,2,,2023-05-01 10:00',
+            'Ноутбук,Иванов Иван,1,44000,01.05.2023 12:30',
+            'Планшет,Иванов Иван,1,,2023-05-01 13:00',
+            'Мышь,Иванов Иван,ноль,,2023-05-01 14:00',
+        ])
+        with app.app_context():
+            sales_before = Sale.query.count()
+            result = importer.import_sales(io.StringIO(data))
+
+            assert result.inserted == 2
+            assert [line for line, _ in result.errors] == [4, 5]
+            assert Sale.query.count() == sales_before + 2
+            mouse = Product.query.filter_by(name='Мышь').first()
+            imported = Sale.query.filter_by(product_id=mouse.id, quantity=2).first()
+            assert imported.total_price == 1600
+            # Остатки не меняются, итоги дня пополняются
+            assert mouse.quantity == 50
+            assert DailySalesRollup.query.filter_by(product_id=mouse.id).first().revenue == 1600
+
+    def test_import_sales_by_id(self, app, test_data):
+        """Тест импорта продаж с указанием id товара и покупателя"""
+        with app.app_context():
+            product = Product.query.first()
+            customer = Customer.query.first()
+            data = (f'product_id,customer_id,quantity,sale_date\n'
+                    f'{product.id},{customer.id},3,2023-01-02T08:00:00\n'
+                    f'999,{customer.id},1,2023-01-02T09:00:00\n')
+            result = importer.import_sales(io.StringIO(data))
+            assert result.inserted == 1
+            assert result.errors == [(3, 'товар с id 999 не найден')]
+
+    def test_upload_endpoint(self, app, admin_client):
+        """Тест загрузки файла через страницу импорта"""
+        data = 'name,price,quantity\nМонитор,12000,15\n'.encode('utf-8-sig')
+        response = admin_client.post('/import', data={
+            'kind': 'products',
+            'file': (io.BytesIO(data), 'products.csv'),
+        }, content_type='multipart/form-data')
+
+        assert response.status_code == 200
+        assert 'Импортировано строк: 1' in response.get_data(as_text=True)
+        with app.app_context():
+            assert Product.query.filter_by(name='Монитор').first().quantity == 15
@@ -0,0 +1,91 @@
+import pytest
+from database import db, Product, Sale
+from migrations import upgrade_schema
+from report_engine import product_stats_query, period_sales_query
+from pagination import _seek_condition
+from datetime import datetime, timedelta
+from sqlalchemy import event
+from counters import get_counters
+
+
+def query_plan(query):
+    """Строки EXPLAIN QUERY PLAN для запроса SQLAlchemy"""
+    compiled = query.statement.compile(dialect=db.engine.dialect)
+    params = [compiled.params[name] for name in compiled.positiontup]
+    params = [str(value) if isinstance(value, datetime) else value for value in params]
+    rows = db.session.connection().exec_driver_sql(
+        'EXPLAIN QUERY PLAN ' + str(compiled), tuple(params))
+    return ' | '.join(row[3] for row in rows)
+
+
+def emitted_plans(action):
+    """Планы EXPLAIN QUERY PLAN операторов, которые выполняет action()"""
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(db.engine, 'before_cursor_execute', capture)
+    try:
+        action()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', capture)
+    connection = db.session.connection()
+    return [(statement, ' | '.join(row[3] for row in connection.exec_driver_sql(
+                'EXPLAIN QUERY PLAN ' + statement, parameters)))
+            for statement, parameters in statements if statement.lstrip().startswith('SELECT')]
+
+
+@pytest.mark.sqlite_only
+class TestIndexes:
+    """Проверка использования индексов в частых запросах"""
+
+    @pytest.fixture
+    def period(self):
+        start = datetime(2024, 1, 1)
+        return start, start + timedelta(days=31)
+
+    def test_report_uses_sale_date_index(self, app, period):
+        """Тест: отчет ищет продажи по индексу даты"""
+        with app.app_context():
+            assert 'USING INDEX ix_sales_sale_date_product_id' in query_plan(product_stats_query(*period))
+            assert 'USING INDEX ix_sales_sale_date_product_id' in query_plan(period_sales_query(*period))
+
+    def test_today_revenue_uses_index(self, app):
+        """Тест: выручка за сегодня на главной читается по индексу суточных итогов"""
+        with app.app_context():
+            plans = emitted_plans(get_counters().reconcile)
+            plan, = [plan for statement, plan in plans if 'daily_sales_rollup' in statement]
+            assert 'SEARCH daily_sales_rollup USING' in plan
+            assert 'SCAN daily_sales_rollup' not in plan
+
+    def test_foreign_key_counts_use_index(self, app):
+        """Тест: проверки перед удалением товара и покупателя идут по индексу"""
+        with app.app_context():
+            assert 'SEARCH sales USING' in query_plan(Sale.query.filter_by(product_id=1))
+            assert 'SEARCH sales USING' in query_plan(Sale.query.filter_by(customer_id=1))
+
+    def test_in_stock_products_use_index(self, app):
+        """Тест: выборка товаров в наличии идет по индексу quantity"""
+        with app.app_context():
+            plan = query_plan(Product.query.filter(Product.quantity > 0))
+            assert 'USING INDEX ix_products_quantity' in plan
+
+    def test_sales_page_seeks_by_index(self, app):
+        """Тест: следующая страница продаж ищется по индексу, а не сканируется"""
+        with app.app_context():
+            seek = Sale.query.filter(_seek_condition((Sale.sale_date, Sale.id),
+                                                [datetime(2024, 1, 1), 100], True))
+            assert 'SEARCH sales USING INDEX' in query_plan(
+                seek.order_by(Sale.sale_date.desc(), Sale.id.desc()).limit(11))
+
+    def test_upgrade_schema_is_idempotent(self, app):
+        """Тест: обновление схемы создает недостающие индексы и безопасно повторяется"""
+        with app.app_context():
+            db.session.execute(db.text('DROP INDEX ix_sales_sale_date_product_id'))
+            db.session.execute(db.text('DROP INDEX ix_products_quantity'))
+            db.session.commit()
+
+            created = upgrade_schema()
+            assert sorted(created) == ['ix_products_quantity', 'ix_sales_sale_date_product_id']
+            assert upgrade_schema() == []
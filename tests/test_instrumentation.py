@@ -0,0 +1,83 @@
+import logging
+import pytest
+from flask import g
+from database import db
+from instrumentation import Histogram, RequestProfile
+
+
+@pytest.fixture
+def profiling(app, monkeypatch):
+    """Включенное профилирование запросов"""
+    monkeypatch.setitem(app.config, 'SQL_PROFILING', True)
+    monkeypatch.setitem(app.config, 'SLOW_REQUEST_MS', 10000)
+    return app
+
+
+class TestInstrumentation:
+    """Тестирование профилирования запросов"""
+
+    def test_server_timing_header(self, profiling, admin_client, test_data):
+        """Тест заголовка Server-Timing с числом SQL-запросов"""
+        response = admin_client.get('/sales')
+        timing = response.headers['Server-Timing']
+        assert timing.startswith('db;dur=')
+        assert 'queries"' in timing
+        assert 'app;dur=' in timing
+
+    def test_disabled_by_default(self, app, admin_client):
+        """Тест: без SQL_PROFILING заголовок не добавляется"""
+        assert 'Server-Timing' not in admin_client.get('/').headers
+
+    def test_slow_request_is_logged(self, profiling, admin_client, monkeypatch, caplog):
+        """Тест записи медленного запроса в лог вместе с SQL"""
+        monkeypatch.setitem(profiling.config, 'SLOW_REQUEST_MS', 0)
+        with caplog.at_level(logging.WARNING):
+            admin_client.get('/')
+        assert 'Медленный запрос GET /' in caplog.text
+        assert 'SELECT' in caplog.text
+
+    def test_metrics_endpoint(self, profiling, admin_client):
+        """Тест гистограмм по маршрутам в формате Prometheus"""
+        admin_client.get('/')
+        admin_client.get('/')
+        text = admin_client.get('/metrics').get_data(as_text=True)
+        assert '# TYPE http_request_duration_seconds histogram' in text
+        assert 'http_request_duration_seconds_bucket{endpoint="main.index",le="+Inf"}' in text
+        assert 'db_queries_total{endpoint="main.index"}' in text
+
+    def test_metrics_requires_admin(self, client):
+        """Тест: метрики доступны только администратору"""
+        with client.session_transaction() as sess:
+            sess['user_id'] = 2
+            sess['user_role'] = 'manager'
+        assert client.get('/metrics').status_code == 302
+
+    def test_failed_statement_leaves_nothing(self, app):
+        """Тест: оператор с ошибкой не оставляет следов в соединении пула"""
+        with app.test_request_context():
+            g.sql_profile = RequestProfile(keep_slowest=5)
+            for _ in range(3):
+                with pytest.raises(Exception):
+                    db.session.execute(db.text('SELECT * FROM no_such_table'))
+                db.session.rollback()
+            db.session.execute(db.text('SELECT 1'))
+            assert g.sql_profile.query_count == 1
+            assert 'query_started' not in db.session.connection().info
+
+    def test_profile_keeps_slowest(self):
+        """Тест: в профиле остаются N самых медленных операторов"""
+        profile = RequestProfile(keep_slowest=2)
+        for i, duration in enumerate([0.1, 0.5, 0.2, 0.4]):
+            profile.add_statement(f'SELECT {i}', duration)
+        assert profile.query_count == 4
+        assert profile.slowest_statements() == [(0.5, 'SELECT 1'), (0.4, 'SELECT 3')]
+
+    def test_histogram_buckets(self):
+        """Тест накопительных корзин гистограммы"""
+        histogram = Histogram(buckets=(0.1, 1.0))
+        for value in [0.05, 0.5, 5]:
+            histogram.observe(value)
+        lines = histogram.render('t', 'endpoint="x"')
+        assert lines[:3] == ['t_bucket{endpoint="x",le="0.1"} 1',
+                             't_bucket{endpoint="x",le="1.0"} 2',
+                             't_bucket{endpoint="x",le="+Inf"} 3']
@@ -0,0 +1,120 @@
+import pytest
+from sqlalchemy import text
+from database import db, Product, Customer, Sale
+from counters import get_counters
+from listing import list_products, list_customers
+from pagination import capped_count
+from datetime import datetime
+
+
+@pytest.fixture
+def catalogue(app):
+    """30 товаров с разными ценами и остатками, продажи у каждого третьего"""
+    with app.app_context():
+        products = [Product(name=f'Товар {i:02d}', price=float(100 * (i % 7)), quantity=i)
+                    for i in range(30)]
+        customers = [Customer(name=f'Покупатель {i:02d}') for i in range(5)]
+        db.session.add_all(products + customers)
+        db.session.commit()
+        db.session.add_all([
+            Sale(product_id=product.id, customer_id=customers[0].id, quantity=1,
+                 total_price=product.price, sale_date=datetime(2024, 3, 1))
+            for product in products[::3]
+        ])
+        db.session.commit()
+
+
+def walk(app, args, per_page, lister=list_products):
+    """Все страницы списка подряд по курсорам after"""
+    items = []
+    args = dict(args)
+    while True:
+        with app.test_request_context():
+            listing = lister(args, per_page)
+            items.extend(listing.page.items)
+        if not listing.page.next_cursor:
+            return items
+        args['after'] = listing.page.next_cursor
+
+
+class TestListing:
+    """Тестирование списков товаров и покупателей"""
+
+    def test_sort_by_price_pages(self, app, catalogue):
+        """Тест: обход по страницам дает все товары в порядке цены без повторов"""
+        items = walk(app, {'sort': 'price'}, per_page=7)
+        assert len(items) == 30
+        assert len({item.id for item in items}) == 30
+        keys = [(item.price, item.id) for item in items]
+        assert keys == sorted(keys)
+
+    def test_sort_descending(self, app, catalogue):
+        """Тест обратной сортировки по остатку"""
+        items = walk(app, {'sort': 'quantity', 'order': 'desc'}, per_page=8)
+        assert [item.quantity for item in items] == list(range(29, -1, -1))
+
+    def test_previous_page(self, app, catalogue):
+        """Тест: курсор before возвращает предыдущую страницу"""
+        with app.test_request_context():
+            first = list_products({'sort': 'name'}, 10)
+            second = list_products({'sort': 'name', 'after': first.page.next_cursor}, 10)
+            back = list_products({'sort': 'name', 'before': second.page.prev_cursor}, 10)
+            assert [p.id for p in back.page] == [p.id for p in first.page]
+
+    def test_filters(self, app, catalogue):
+        """Тест фильтров по цене, остатку и наличию продаж"""
+        with app.test_request_context():
+            priced = list_products({'min_price': '200', 'max_price': '300'}, 50)
+            assert {p.price for p in priced.page} == {200, 300}
+            low = list_products({'low_stock': '1'}, 50)
+            assert [p.quantity for p in low.page] == list(range(11))
+            sold = list_products({'has_sales': '1'}, 50)
+            assert len(sold.page) == 10
+            assert len(list_products({'has_sales': '0'}, 50).page) == 20
+            assert list_customers({'has_sales': '1'}, 50).total == 1
+
+    def test_invalid_parameters_ignored(self, app, catalogue):
+        """Тест: некорректные фильтры и сортировка не применяются"""
+        with app.test_request_context():
+            listing = list_products({'min_price': 'abc', 'has_sales': 'x', 'sort': 'password'}, 50)
+            assert listing.filters == {}
+            assert listing.sort == 'name'
+            assert len(listing.page) == 30
+
+    def test_total_without_count(self, app, admin_client, catalogue, query_counter):
+        """Тест: без фильтров общее число берется из кэша счетчиков
+        (второй запрос - версия коллекции для ETag)"""
+        with app.app_context():
+            get_counters().snapshot()
+        query_counter.clear()
+        response = admin_client.get('/products?per_page=5')
+        assert 'Всего: 30' in response.get_data(as_text=True)
+        assert len(query_counter) == 2
+        assert not any('count' in query.lower() for query in query_counter)
+
+    def test_capped_total(self, app, admin_client, catalogue, monkeypatch):
+        """Тест: с фильтром число записей считается не дальше предела"""
+        monkeypatch.setitem(app.config, 'LIST_COUNT_CAP', 5)
+        page = admin_client.get('/products?has_sales=0').get_data(as_text=True)
+        assert 'Всего: 5+' in page
+        with app.app_context():
+            assert capped_count(Product.query.filter(Product.quantity < 3), 5) == (3, True)
+
+    def test_links_keep_filters(self, admin_client, catalogue):
+        """Тест: ссылки сортировки и страниц сохраняют фильтры"""
+        page = admin_client.get('/products?has_sales=0&sort=price&per_page=5').get_data(as_text=True)
+        assert 'has_sales=0' in page
+        assert 'after=' in page
+        assert 'order=desc' in page
+
+    @pytest.mark.sqlite_only
+    def test_sort_uses_index(self, app, catalogue):
+        """Тест: страница по цене читается по индексу без сортировки в памяти"""
+        with app.app_context():
+            plan = db.session.execute(text(
+                'EXPLAIN QUERY PLAN SELECT * FROM products WHERE price > 100 OR '
+                '(price = 100 AND id > 5) ORDER BY price, id LIMIT 21'
+            )).all()
+            details = ' '.join(row[-1] for row in plan)
+            assert 'ix_products_price_id' in details
+            assert 'TEMP B-TREE' not in details
@@ -0,0 +1,113 @@
+import pytest
+from database import db, Product, Customer, Sale, DailySalesRollup
+from sales_service import create_sale, create_order, SaleError, CustomerNotFound, InsufficientStock
+from datetime import datetime
+
+
+class TestOrders:
+    """Тестирование заказов из нескольких товаров"""
+
+    def test_order_commits_all_lines(self, app, test_data):
+        """Тест: все строки заказа проводятся в одной транзакции"""
+        with app.app_context():
+            laptop = Product.query.filter_by(name='Ноутбук').first()
+            mouse = Product.query.filter_by(name='Мышь').first()
+            customer = Customer.query.first()
+            sales_before = Sale.query.count()
+
+            count = create_order(customer.id, [(laptop.id, 2), (mouse.id, 5), (mouse.id, 1)])
+
+            db.session.expire_all()
+            assert count == 3
+            assert Sale.query.count() == sales_before + 3
+            assert db.session.get(Product, laptop.id).quantity == 8
+            assert db.session.get(Product, mouse.id).quantity == 44
+            rollup = db.session.get(DailySalesRollup, (datetime.now().date(), mouse.id))
+            assert rollup.quantity == 6
+            assert rollup.sales_count == 2
+
+    def test_order_rolls_back_all_lines(self, app, test_data):
+        """Тест: если одной позиции не хватает, не проводится ни одна"""
+        with app.app_context():
+            laptop = Product.query.filter_by(name='Ноутбук').first()
+            mouse = Product.query.filter_by(name='Мышь').first()
+            customer = Customer.query.first()
+            sales_before = Sale.query.count()
+
+            with pytest.raises(InsufficientStock) as error:
+                create_order(customer.id, [(mouse.id, 5), (laptop.id, 11)])
+
+            db.session.expire_all()
+            assert error.value.product_id == laptop.id
+            assert error.value.available == 10
+            assert Sale.query.count() == sales_before
+            assert db.session.get(Product, mouse.id).quantity == 50
+            assert db.session.get(Product, laptop.id).quantity == 10
+
+    def test_order_rejects_bad_lines(self, app, test_data):
+        """Тест: пустой заказ и неположительное количество отклоняются"""
+        with app.app_context():
+            customer = Customer.query.first()
+            with pytest.raises(SaleError):
+                create_order(customer.id, [])
+            with pytest.raises(SaleError):
+                create_order(customer.id, [(Product.query.first().id, 0)])
+
+    def test_single_sale_rejects_non_positive_quantity(self, app, test_data):
+        """Тест: продажа с отрицательным количеством не увеличивает остаток"""
+        with app.app_context():
+            product = Product.query.first()
+            with pytest.raises(SaleError):
+                create_sale(product.id, Customer.query.first().id, -5)
+            db.session.refresh(product)
+            assert product.quantity == 10
+            assert Sale.query.count() == 2
+
+    def test_cart_endpoint(self, app, admin_client, test_data):
+        """Тест оформления заказа через форму корзины"""
+        with app.app_context():
+            laptop_id = Product.query.filter_by(name='Ноутбук').first().id
+            mouse_id = Product.query.filter_by(name='Мышь').first().id
+            customer_id = Customer.query.first().id
+
+        response = admin_client.post('/sales/cart', data={
+            'customer_id': customer_id,
+            'product_id': [laptop_id, mouse_id, ''],
+            'quantity': ['1', '3', ''],
+        }, follow_redirects=True)
+
+        assert response.status_code == 200
+        assert 'Заказ оформлен: позиций 2' in response.get_data(as_text=True)
+        with app.app_context():
+            assert db.session.get(Product, mouse_id).quantity == 47
+
+    def test_forms_without_selection(self, app, admin_client, test_data):
+        """Тест: форма без выбранного товара или покупателя - сообщение, а не ошибка 500"""
+        response = admin_client.post('/sales/add', data={'product_id': '', 'customer_id': '1', 'quantity': '1'},
+                                     follow_redirects=True)
+        assert response.status_code == 200
+        assert 'Выберите товар и покупателя' in response.get_data(as_text=True)
+        response = admin_client.post('/sales/cart', data={'customer_id': '', 'product_id': ['1'], 'quantity': ['1']},
+                                     follow_redirects=True)
+        assert response.status_code == 200
+        assert 'Выберите покупателя и товары' in response.get_data(as_text=True)
+        with app.app_context():
+            assert Sale.query.count() == 2
+
+    def test_unknown_customer(self, app, admin_client, test_data):
+        """Тест: несуществующий покупатель - сообщение, остаток не меняется"""
+        with app.app_context():
+            laptop = Product.query.filter_by(name='Ноутбук').first().id
+            with pytest.raises(CustomerNotFound):
+                create_sale(laptop, 999, 1)
+            with pytest.raises(CustomerNotFound):
+                create_order(999, [(laptop, 1)])
+        response = admin_client.post('/sales/add', data={'product_id': laptop, 'customer_id': 999, 'quantity': 1},
+                                     follow_redirects=True)
+        assert 'Покупатель 999 не найден' in response.get_data(as_text=True)
+        response = admin_client.post('/sales/cart', data={'customer_id': 999, 'product_id': [laptop], 'quantity': [1]},
+                                     follow_redirects=True)
+        assert 'Покупатель 999 не найден' in response.get_data(as_text=True)
+        with app.app_context():
+            assert Sale.query.count() == 2
+            assert db.session.get(Product, laptop).quantity == 10
@@ -0,0 +1,94 @@
+import re
+import pytest
+from database import db, Product, Customer, Sale
+from pagination import encode_cursor, decode_cursor, keyset_paginate
+from counters import get_counters
+from datetime import datetime, timedelta
+
+
+def add_sales(count):
+    """Добавление count продаж с разным временем (по две продажи на минуту)"""
+    product = Product(name='Мышь', price=800, quantity=1000)
+    customer = Customer(name='Петров Петр')
+    db.session.add_all([product, customer])
+    db.session.commit()
+    start = datetime(2024, 1, 1, 9, 0)
+    db.session.add_all([
+        Sale(product_id=product.id, customer_id=customer.id, quantity=1,
+             total_price=800, sale_date=start + timedelta(minutes=i // 2))
+        for i in range(count)
+    ])
+    db.session.commit()
+
+
+class TestPagination:
+    """Тестирование курсорной пагинации"""
+
+    def test_cursor_roundtrip(self):
+        """Тест кодирования и декодирования курсора"""
+        values = [datetime(2024, 1, 1, 9, 30), 42, 'Мышь', 800.5]
+        assert decode_cursor(encode_cursor(values)) == values
+
+    def test_invalid_cursor(self):
+        """Тест испорченного курсора"""
+        assert decode_cursor('не-курсор') is None
+        assert decode_cursor(None) is None
+        # Курсор другой формы: [1], [] и объект вместо списка
+        columns = (Sale.sale_date, Sale.id)
+        assert decode_cursor('WzFd', columns) is None
+        assert decode_cursor('W10', columns) is None
+        assert decode_cursor('eyJhIjoxfQ') is None
+        # Значения не тех типов
+        assert decode_cursor(encode_cursor([[1], 2]), columns) is None
+        assert decode_cursor(encode_cursor([None, None]), columns) is None
+        assert decode_cursor(encode_cursor(['2024-01-01', 2]), columns) is None
+        assert decode_cursor(encode_cursor([datetime(2024, 1, 1), True]), columns) is None
+        assert decode_cursor(encode_cursor(['Мышь', 800]), (Product.name, Product.price)) == ['Мышь', 800]
+
+    def test_tampered_cursor_in_url(self, app, admin_client, test_data):
+        """Тест: курсор другой формы в адресе дает первую страницу, а не ошибку"""
+        assert admin_client.get('/products?after=WzFd').status_code == 200
+        assert admin_client.get('/sales?before=W10').status_code == 200
+        for values in ([[1], 2], [None, None], ['вчера', 1], [{'dt': '2024-01-01'}, '1']):
+            cursor = encode_cursor(values)
+            assert admin_client.get(f'/sales?after={cursor}').status_code == 200
+            assert admin_client.get(f'/sales?before={cursor}').status_code == 200
+            assert admin_client.get(f'/products?sort=price&after={cursor}').status_code == 200
+
+    def test_walk_forward_and_back(self, app):
+        """Тест обхода всех страниц вперед и назад"""
+        with app.app_context():
+            add_sales(25)
+            expected = [sale.id for sale in
+                        Sale.query.order_by(Sale.sale_date.desc(), Sale.id.desc())]
+            columns = (Sale.sale_date, Sale.id)
+
+            pages = [keyset_paginate(Sale.query, columns, per_page=10, descending=True)]
+            while pages[-1].next_cursor:
+                pages.append(keyset_paginate(Sale.query, columns, after=pages[-1].next_cursor,
+                                             per_page=10, descending=True))
+            assert [len(page) for page in pages] == [10, 10, 5]
+            assert [sale.id for page in pages for sale in page] == expected
+            assert pages[0].prev_cursor is None
+
+            back = keyset_paginate(Sale.query, columns, before=pages[2].prev_cursor,
+                                   per_page=10, descending=True)
+            assert [sale.id for sale in back] == [sale.id for sale in pages[1]]
+            assert back.prev_cursor is not None
+
+    def test_sales_page_query_count_is_constant(self, app, admin_client, query_counter):
+        """Тест: страница продаж стоит одинаковое число запросов"""
+        query_counts = []
+        for count in [5, 200]:
+            with app.app_context():
+                add_sales(count)
+                get_counters().snapshot()
+            query_counter.clear()
+            response = admin_client.get('/sales?per_page=20')
+            assert response.status_code == 200
+            query_counts.append(len(query_counter))
+
+        assert query_counts[0] == query_counts[1]
+        html = response.get_data(as_text=True)
+        assert len(re.findall(r'<td>Петров Петр</td>', html)) == 20
+        assert 'after=' in html and 'None' not in html
@@ -0,0 +1,88 @@
+import pytest
+from database import Product, Customer
+from report_cache import ReportCache, get_report_cache
+from sales_service import create_sale
+from rollup import rebuild_rollup
+from tests.test_reports import add_sales
+from datetime import datetime, timedelta
+
+
+def today():
+    return datetime.combine(datetime.now().date(), datetime.min.time())
+
+
+class TestReportCache:
+    """Тестирование кэша отчетов"""
+
+    def test_repeated_report_from_cache(self, app, admin_client, query_counter):
+        """Тест: повторный отчет за тот же период строится без запросов"""
+        with app.app_context():
+            add_sales(4, datetime(2024, 3, 1, 10, 0))
+        form = {'start_date': '2024-03-01', 'end_date': '2024-03-31'}
+
+        admin_client.post('/reports', data=form)
+        query_counter.clear()
+        response = admin_client.post('/reports', data=form)
+
+        assert query_counter == []
+        text = response.get_data(as_text=True)
+        assert 'Ноутбук' in text
+        assert 'Иванов Иван' in text
+        assert 'с 01.03.2024 по 2024-03-31' in text
+        assert get_report_cache(app).hits == 1
+
+    def test_sale_invalidates_current_period(self, app, test_data):
+        """Тест: продажа сбрасывает отчеты, в период которых она попала"""
+        with app.app_context():
+            rebuild_rollup()
+            cache = get_report_cache()
+            current = (today(), today() + timedelta(days=1))
+            past = (datetime(2024, 1, 1), datetime(2024, 2, 1))
+            assert cache.get_report(*current)['total_sales'] == 2
+            cache.get_report(*past)
+
+            product = Product.query.filter_by(name='Мышь').first()
+            create_sale(product.id, Customer.query.first().id, 1)
+
+            assert (*past, None) in cache.entries
+            assert (*current, None) not in cache.entries
+            assert cache.get_report(*current)['total_sales'] == 3
+
+    def test_past_periods_live_longer(self, app):
+        """Тест: завершенные периоды хранятся дольше текущих"""
+        with app.app_context():
+            cache = ReportCache(max_bytes=10 ** 6, past_ttl=1000, current_ttl=10)
+            cache.get_report(datetime(2024, 1, 1), datetime(2024, 2, 1))
+            cache.get_report(today(), today() + timedelta(days=1))
+            (past_expires, *_), (current_expires, *_) = cache.entries.values()
+            assert past_expires - current_expires == pytest.approx(990, abs=1)
+
+    def test_lru_eviction_by_size(self, app):
+        """Тест: при превышении объема вытесняется давно не использованный отчет"""
+        with app.app_context():
+            add_sales(10, datetime(2024, 3, 1, 10, 0))
+            probe = ReportCache(max_bytes=10 ** 6, past_ttl=1000, current_ttl=10)
+            probe.get_report(datetime(2024, 3, 1), datetime(2024, 3, 2))
+            cache = ReportCache(max_bytes=int(probe.size * 2.5), past_ttl=1000, current_ttl=10)
+
+            first = (datetime(2024, 3, 1), datetime(2024, 3, 2), None)
+            second = (datetime(2024, 3, 1), datetime(2024, 3, 3), None)
+            third = (datetime(2024, 2, 28), datetime(2024, 3, 2), None)
+            cache.get_report(*first[:2])
+            cache.get_report(*second[:2])
+            cache.get_report(*first[:2])
+            cache.get_report(*third[:2])
+
+            assert list(cache.entries) == [first, third]
+            assert cache.evictions == 1
+            assert cache.size <= cache.max_bytes
+
+    def test_stats_in_metrics(self, app, admin_client):
+        """Тест статистики кэша в /metrics"""
+        form = {'start_date': '2024-03-01', 'end_date': '2024-03-31'}
+        admin_client.post('/reports', data=form)
+        admin_client.post('/reports', data=form)
+        text = admin_client.get('/metrics').get_data(as_text=True)
+        assert 'report_cache_hits_total 1' in text
+        assert 'report_cache_misses_total 1' in text
+        assert 'report_cache_entries 1' in text
@@ -0,0 +1,182 @@
+import threading
+import pytest
+from app import create_app
+from config import TestConfig
+from database import db, ReportJob
+import report_jobs
+from report_jobs import submit_report, run_job, run_pending, claim_job, requeue_stale
+from tests.test_reports import add_sales
+from datetime import datetime, timedelta
+
+LONG_PERIOD = {'start_date': '2022-01-01', 'end_date': '2024-12-31'}
+
+
+class TestReportJobs:
+    """Тестирование фоновых отчетов"""
+
+    def test_long_period_goes_to_job(self, app, admin_client):
+        """Тест: отчет за большой период ставится в очередь"""
+        response = admin_client.post('/reports', data=LONG_PERIOD)
+        assert response.status_code == 302
+        assert '/reports/jobs/' in response.headers['Location']
+
+        page = admin_client.get(response.headers['Location']).get_data(as_text=True)
+        assert 'Отчет формируется' in page
+        with app.app_context():
+            job = ReportJob.query.one()
+            assert job.status == 'queued'
+            assert job.start_date == datetime(2022, 1, 1)
+            assert job.end_date == datetime(2025, 1, 1)
+
+    def test_short_period_is_synchronous(self, app, admin_client):
+        """Тест: обычный период строится сразу, без задания"""
+        response = admin_client.post('/reports', data={'start_date': '2024-03-01', 'end_date': '2024-03-31'})
+        assert response.status_code == 200
+        with app.app_context():
+            assert ReportJob.query.count() == 0
+
+    def test_duplicate_requests_coalesce(self, app, admin_client):
+        """Тест: повторный запрос того же периода присоединяется к заданию"""
+        first = admin_client.post('/reports', data=LONG_PERIOD).headers['Location']
+        second = admin_client.post('/reports', data=LONG_PERIOD).headers['Location']
+        assert first == second
+        with app.app_context():
+            assert ReportJob.query.count() == 1
+
+    def test_finished_job_shows_report(self, app, admin_client):
+        """Тест: готовое задание показывает отчет и ссылки выгрузки"""
+        with app.app_context():
+            add_sales(4, datetime(2024, 3, 1, 10, 0))
+        location = admin_client.post('/reports', data=LONG_PERIOD).headers['Location']
+        job_id = int(location.rsplit('/', 1)[1])
+        with app.app_context():
+            assert run_pending() == 1
+
+        status = admin_client.get(f'/reports/jobs/{job_id}/status').get_json()
+        assert status == {'status': 'done', 'error': None}
+        page = admin_client.get(location).get_data(as_text=True)
+        assert 'с 01.01.2022 по 2024-12-31' in page
+        assert 'Ноутбук' in page
+        assert '01.03.2024 10:00' in page
+        assert 'end_date=2024-12-31' in page
+
+    def test_done_past_job_is_reused(self, app):
+        """Тест: готовый отчет за прошедший период переиспользуется"""
+        with app.app_context():
+            job = submit_report(datetime(2022, 1, 1), datetime(2024, 1, 1))
+            run_job(job.id)
+            assert submit_report(datetime(2022, 1, 1), datetime(2024, 1, 1)).id == job.id
+
+    def test_done_current_job_expires(self, app, monkeypatch):
+        """Тест: отчет за период с сегодняшним днем устаревает"""
+        with app.app_context():
+            start = datetime(2022, 1, 1)
+            end = datetime.combine(datetime.now().date(), datetime.min.time()) + timedelta(days=1)
+            job = submit_report(start, end)
+            run_job(job.id)
+            assert submit_report(start, end).id == job.id
+
+            monkeypatch.setitem(app.config, 'REPORT_CACHE_CURRENT_TTL', 0)
+            assert submit_report(start, end).id != job.id
+
+    def test_job_claimed_once(self, app):
+        """Тест: задание захватывает только один исполнитель"""
+        with app.app_context():
+            job = submit_report(datetime(2022, 1, 1), datetime(2024, 1, 1))
+            assert claim_job(job.id)
+            assert not claim_job(job.id)
+            assert not run_job(job.id)
+
+    def test_failed_job(self, app, admin_client, monkeypatch):
+        """Тест: ошибка построения сохраняется в задании"""
+        def broken_report(*args, **kwargs):
+            raise RuntimeError('нет данных')
+
+        monkeypatch.setattr(report_jobs, 'build_report', broken_report)
+        location = admin_client.post('/reports', data=LONG_PERIOD).headers['Location']
+        with app.app_context():
+            run_pending()
+            assert ReportJob.query.one().status == 'failed'
+        assert 'нет данных' in admin_client.get(location).get_data(as_text=True)
+        # После ошибки период можно запросить снова
+        assert admin_client.post('/reports', data=LONG_PERIOD).headers['Location'] != location
+
+    def test_requeue_stale(self, app):
+        """Тест: задание, зависшее в running, возвращается в очередь"""
+        with app.app_context():
+            job = submit_report(datetime(2022, 1, 1), datetime(2024, 1, 1))
+            claim_job(job.id)
+            job.started_at = datetime.now() - timedelta(hours=2)
+            db.session.commit()
+            assert requeue_stale(3600) == 1
+            assert run_pending() == 1
+
+
+class TestReportJobWorkers:
+    """Тестирование исполнителей фоновых отчетов"""
+
+    def test_thread_pool_runs_jobs(self, tmp_path):
+        """Тест: задание выполняется пулом потоков приложения"""
+        class WorkerConfig(TestConfig):
+            SQLALCHEMY_DATABASE_URI = f'sqlite:///{tmp_path / "jobs.db"}'
+            REPORT_JOB_WORKERS = 1
+
+        app = create_app(WorkerConfig)
+        with app.app_context():
+            db.create_all()
+            add_sales(4, datetime(2024, 3, 1, 10, 0))
+            job = submit_report(datetime(2022, 1, 1), datetime(2025, 1, 1))
+            app.extensions['report_jobs'].shutdown(wait=True)
+            db.session.expire_all()
+            job = db.session.get(ReportJob, job.id)
+            assert job.status == 'done'
+            assert report_jobs.load_report(job.result)['total_sales'] == 4
+            db.engine.dispose()
+
+    def test_abandoned_jobs_are_revived(self, tmp_path):
+        """Тест: задания, брошенные перезапуском, выполняются пулом при повторном запросе"""
+        class WorkerConfig(TestConfig):
+            SQLALCHEMY_DATABASE_URI = f'sqlite:///{tmp_path / "jobs.db"}'
+            REPORT_JOB_WORKERS = 1
+
+        app = create_app(WorkerConfig)
+        with app.app_context():
+            db.create_all()
+            add_sales(2, datetime(2024, 3, 1, 10, 0))
+            # Поставлено в очередь и зависло в running в остановленном процессе
+            queued = ReportJob(start_date=datetime(2022, 1, 1), end_date=datetime(2025, 1, 1), status='queued')
+            running = ReportJob(start_date=datetime(2021, 1, 1), end_date=datetime(2025, 1, 1), status='running',
+                                started_at=datetime.now() - timedelta(hours=2))
+            db.session.add_all([queued, running])
+            db.session.commit()
+            assert submit_report(datetime(2022, 1, 1), datetime(2025, 1, 1)).id == queued.id
+            assert submit_report(datetime(2021, 1, 1), datetime(2025, 1, 1)).id == running.id
+            app.extensions['report_jobs'].shutdown(wait=True)
+            db.session.expire_all()
+            assert [job.status for job in ReportJob.query.order_by(ReportJob.id)] == ['done', 'done']
+            db.engine.dispose()
+
+    def test_polling_does_not_redispatch(self, tmp_path, monkeypatch):
+        """Тест: опросы состояния не передают пулу уже переданное задание"""
+        class WorkerConfig(TestConfig):
+            SQLALCHEMY_DATABASE_URI = f'sqlite:///{tmp_path / "jobs.db"}'
+            REPORT_JOB_WORKERS = 1
+
+        release, runs = threading.Event(), []
+
+        def slow_run_job(job_id):
+            runs.append(job_id)
+            release.wait(5)
+
+        monkeypatch.setattr(report_jobs, 'run_job', slow_run_job)
+        app = create_app(WorkerConfig)
+        with app.app_context():
+            db.create_all()
+            job = submit_report(datetime(2022, 1, 1), datetime(2025, 1, 1))
+            for _ in range(5):
+                report_jobs.revive_job(job)
+            release.set()
+            app.extensions['report_jobs'].shutdown(wait=True)
+            assert runs == [job.id]
+            assert app.extensions['report_jobs_dispatched'] == set()
+            db.engine.dispose()
@@ -0,0 +1,68 @@
+import pytest
+from database import db, Product, Customer, Sale
+from report_engine import build_report
+from rollup import rebuild_rollup
+from report_cache import get_report_cache
+from datetime import datetime, timedelta
+
+
+def add_sales(count, day):
+    """Добавление count продаж двух товаров за указанный день"""
+    product1 = Product(name='Ноутбук', price=45000, quantity=1000)
+    product2 = Product(name='Мышь', price=800, quantity=1000)
+    customer = Customer(name='Иванов Иван')
+    db.session.add_all([product1, product2, customer])
+    db.session.commit()
+    db.session.add_all([
+        Sale(product_id=(product1 if i % 2 else product2).id, customer_id=customer.id,
+             quantity=1, total_price=(product1 if i % 2 else product2).price,
+             sale_date=day + timedelta(minutes=i))
+        for i in range(count)
+    ])
+    db.session.commit()
+    rebuild_rollup()
+
+
+class TestReports:
+    """Тестирование построения отчетов"""
+
+    def test_report_totals(self, app):
+        """Тест итогов и статистики по товарам"""
+        day = datetime(2024, 3, 1, 10, 0)
+        with app.app_context():
+            add_sales(4, day)
+            report = build_report(datetime(2024, 3, 1), datetime(2024, 3, 2))
+            assert report['total_sales'] == 4
+            assert report['total_revenue'] == 2 * 45000 + 2 * 800
+            assert report['product_stats'] == {
+                'Ноутбук': {'quantity': 2, 'revenue': 90000},
+                'Мышь': {'quantity': 2, 'revenue': 1600},
+            }
+            assert len(report['sales']) == 4
+
+    def test_report_excludes_other_dates(self, app):
+        """Тест фильтрации продаж по периоду"""
+        with app.app_context():
+            add_sales(3, datetime(2024, 3, 1, 10, 0))
+            report = build_report(datetime(2024, 3, 2), datetime(2024, 3, 3))
+            assert report['total_sales'] == 0
+            assert report['total_revenue'] == 0
+            assert report['product_stats'] == {}
+
+    def test_report_query_count_is_constant(self, app, admin_client, query_counter):
+        """Тест: число запросов не зависит от количества продаж"""
+        form = {'start_date': '2024-03-01', 'end_date': '2024-03-01'}
+        query_counts = []
+        for count in [2, 100]:
+            with app.app_context():
+                add_sales(count, datetime(2024, 3, 1, 10, 0))
+            # Продажи добавлены в обход приложения - сбрасываем кэш отчетов
+            get_report_cache(app).clear()
+
+            query_counter.clear()
+            response = admin_client.post('/reports', data=form)
+            assert response.status_code == 200
+            assert 'Ноутбук' in response.get_data(as_text=True)
+            query_counts.append(len(query_counter))
+
+        assert query_counts[0] == query_counts[1]
@@ -0,0 +1,70 @@
+import pytest
+from database import db, Product, Customer, Sale, DailySalesRollup
+from rollup import rebuild_rollup
+from report_engine import build_report
+from datetime import datetime, timedelta
+
+
+def rollup_rows():
+    """Содержимое таблицы итогов в сравнимом виде"""
+    return sorted(
+        (row.date, row.product_id, row.quantity, row.revenue, row.sales_count)
+        for row in DailySalesRollup.query.all()
+    )
+
+
+class TestRollup:
+    """Тестирование суточных итогов продаж"""
+
+    def test_add_sale_updates_rollup(self, app, admin_client, test_data):
+        """Тест: оформление продажи увеличивает итоги дня"""
+        with app.app_context():
+            product = Product.query.filter_by(name='Мышь').first()
+            customer = Customer.query.first()
+            product_id, customer_id = product.id, customer.id
+
+        for quantity in [1, 3]:
+            admin_client.post('/sales/add', data={
+                'product_id': product_id,
+                'customer_id': customer_id,
+                'quantity': quantity
+            })
+
+        with app.app_context():
+            row = db.session.get(DailySalesRollup, (datetime.now().date(), product_id))
+            assert row.quantity == 4
+            assert row.revenue == 800 * 4
+            assert row.sales_count == 2
+
+    def test_rebuild_matches_incremental(self, app, admin_client, test_data):
+        """Тест: пересчет дает те же итоги, что и пошаговое обновление"""
+        with app.app_context():
+            product_id = Product.query.filter_by(name='Ноутбук').first().id
+            customer_id = Customer.query.first().id
+            rebuild_rollup()
+
+        admin_client.post('/sales/add', data={
+            'product_id': product_id,
+            'customer_id': customer_id,
+            'quantity': 2
+        })
+
+        with app.app_context():
+            incremental = rollup_rows()
+            rebuild_rollup()
+            assert rollup_rows() == incremental
+
+    def test_partial_day_report_reads_sales(self, app, test_data):
+        """Тест: период не из целых дней считается по таблице продаж"""
+        with app.app_context():
+            now = datetime.now()
+            report = build_report(now - timedelta(hours=1), now + timedelta(hours=1))
+            assert report['total_sales'] == 2
+            assert report['total_revenue'] == 94000
+
+    def test_dashboard_today_revenue(self, app, admin_client, test_data):
+        """Тест: выручка за сегодня на главной странице берется из итогов"""
+        with app.app_context():
+            rebuild_rollup()
+        response = admin_client.get('/')
+        assert '94000' in response.get_data(as_text=True)
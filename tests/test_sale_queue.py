@@ -0,0 +1,144 @@
+import threading
+import pytest
+from app import create_app
+from config import TestConfig
+from database import db, Product, Customer, Sale, User, DailySalesRollup, StockMovement
+from api import issue_token
+from sales_service import SaleError, ProductNotFound, CustomerNotFound, InsufficientStock
+import sale_queue
+from sale_queue import SaleRequest, commit_batch, get_sale_queue
+import stock
+
+
+@pytest.fixture
+def queue_app(tmp_path):
+    """Приложение с групповой фиксацией продаж на файловой SQLite"""
+    class QueueConfig(TestConfig):
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{tmp_path / "queue.db"}'
+        SALE_GROUP_COMMIT = True
+        SALE_BATCH_WAIT_MS = 20
+
+    queue_app = create_app(QueueConfig)
+    with queue_app.app_context():
+        db.create_all()
+        product = Product(name='Дефицит', price=100, quantity=30)
+        customer = Customer(name='Покупатель')
+        db.session.add_all([product, customer])
+        db.session.commit()
+        stock.record_opening_balances()
+        db.session.commit()
+    yield queue_app
+    get_sale_queue(queue_app).stop()
+    with queue_app.app_context():
+        db.engine.dispose()
+
+
+class TestSaleQueue:
+    """Тестирование групповой фиксации продаж"""
+
+    def test_batch_results_per_request(self, app, test_data):
+        """Тест: каждая заявка пакета получает свой результат"""
+        with app.app_context():
+            # Две продажи (id 1 и 2) уже есть в test_data
+            laptop, mouse = [product.id for product in Product.query.order_by(Product.id)]
+            customer = Customer.query.first().id
+            results = commit_batch([
+                SaleRequest(laptop, customer, 6),
+                SaleRequest(laptop, customer, 5),
+                SaleRequest(mouse, customer, 2),
+                SaleRequest(10 ** 6, customer, 1),
+                SaleRequest(mouse, customer, 0),
+                SaleRequest(laptop, customer, 4),
+                SaleRequest(mouse, 10 ** 6, 1),
+            ])
+            assert isinstance(results[0], Sale) and results[0].total_price == 45000 * 6
+            assert isinstance(results[1], InsufficientStock) and results[1].available == 4
+            assert isinstance(results[2], Sale)
+            assert isinstance(results[3], ProductNotFound)
+            assert isinstance(results[4], SaleError)
+            assert isinstance(results[5], Sale)
+            assert isinstance(results[6], CustomerNotFound)
+            assert db.session.get(Product, laptop).quantity == 0
+            assert db.session.get(Product, mouse).quantity == 48
+            assert {sale.id for sale in (results[0], results[2], results[5])} == \
+                {sale.id for sale in Sale.query.filter(Sale.id > 2)}
+            assert DailySalesRollup.query.filter_by(product_id=laptop).one().quantity == 10
+
+    def test_concurrent_requests_share_commits(self, queue_app):
+        """Тест: параллельные заявки не перепродают остаток"""
+        sold, rejected, errors = [], [], []
+        barrier = threading.Barrier(10)
+
+        def worker():
+            with queue_app.app_context():
+                sale_queue = get_sale_queue()
+                barrier.wait()
+                for _ in range(5):
+                    try:
+                        sold.append(sale_queue.create_sale(1, 1, 1))
+                    except InsufficientStock:
+                        rejected.append(1)
+                    except Exception as e:
+                        errors.append(e)
+
+        threads = [threading.Thread(target=worker) for _ in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert errors == []
+        assert (len(sold), len(rejected)) == (30, 20)
+        assert len({sale.id for sale in sold}) == 30
+        with queue_app.app_context():
+            assert db.session.get(Product, 1).quantity == 0
+            assert Sale.query.count() == 30
+            assert stock.verify() == []
+            assert StockMovement.query.filter_by(kind=stock.SALE).count() == 30
+
+    def test_form_and_api_use_queue(self, queue_app):
+        """Тест: форма и API оформляют продажу через очередь"""
+        client = queue_app.test_client()
+        with client.session_transaction() as sess:
+            sess.update(user_id=1, username='admin', user_role='admin')
+        response = client.post('/sales/add', data={'product_id': 1, 'customer_id': 1, 'quantity': 100},
+                               follow_redirects=True)
+        assert 'Недостаточно товара! В наличии: 30' in response.get_data(as_text=True)
+        response = client.post('/sales/add', data={'product_id': 1, 'customer_id': 1, 'quantity': 0},
+                               follow_redirects=True)
+        assert 'Количество должно быть положительным' in response.get_data(as_text=True)
+        with queue_app.app_context():
+            user = User(username='manager', password='x', role='manager')
+            db.session.add(user)
+            db.session.commit()
+            token = issue_token(user, 'Тест')
+        response = client.post('/api/v1/sales', json={'product_id': 1, 'customer_id': 1, 'quantity': 3},
+                               headers={'Authorization': f'Bearer {token}'})
+        assert response.status_code == 201
+        assert response.get_json()['total_price'] == 300
+        with queue_app.app_context():
+            assert db.session.get(Product, 1).quantity == 27
+
+    def test_timed_out_request_is_not_committed(self, queue_app, monkeypatch):
+        """Тест: заявка, не дождавшаяся очереди, не проводится позже"""
+        started, release = threading.Event(), threading.Event()
+
+        def slow_commit_batch(requests):
+            started.set()
+            release.wait(5)
+            return commit_batch(requests)
+
+        monkeypatch.setattr(sale_queue, 'commit_batch', slow_commit_batch)
+        monkeypatch.setattr(sale_queue, 'RESULT_TIMEOUT', 0.1)
+        with queue_app.app_context():
+            writer = get_sale_queue()
+            # Первая заявка занимает писателя, вторая ждет в очереди
+            first = writer.submit(1, 1, 1)
+            assert started.wait(5)
+            with pytest.raises(SaleError, match='не отвечает'):
+                writer.create_sale(1, 1, 2)
+            release.set()
+            assert first.result(5).quantity == 1
+            writer.stop()
+            assert Sale.query.count() == 1
+            assert db.session.get(Product, 1).quantity == 29
@@ -0,0 +1,89 @@
+import pytest
+from sqlalchemy import text
+from database import db, Product, Customer
+from migrations import upgrade_schema
+from search import search_products, search_customers, fts_query
+
+
+@pytest.fixture
+def catalogue(app):
+    """Товары и покупатели для поиска"""
+    with app.app_context():
+        db.session.add_all([
+            Product(name='Ноутбук Lenovo ThinkPad', price=90000, quantity=3),
+            Product(name='Ноутбук HP', price=50000, quantity=0),
+            Product(name='Мышь беспроводная', price=900, quantity=40),
+            Product(name='Коврик для мыши', price=300, quantity=15),
+            Customer(name='Иванов Иван', phone='+7 (999) 123-45-67', email='ivanov@mail.ru'),
+            Customer(name='Петрова Мария', phone='+7 (912) 000-11-22', email='maria@example.com'),
+        ])
+        db.session.commit()
+
+
+@pytest.mark.sqlite_only
+class TestSearch:
+    """Тестирование полнотекстового поиска"""
+
+    def test_prefix_search(self, app, catalogue):
+        """Тест: каждое слово запроса ищется как начало слова"""
+        with app.app_context():
+            assert {p.name for p in search_products('ноут', 10)} == {'Ноутбук Lenovo ThinkPad', 'Ноутбук HP'}
+            assert [p.name for p in search_products('ноут think', 10)] == ['Ноутбук Lenovo ThinkPad']
+            assert search_products('утбук', 10) == []
+            assert search_products('  ', 10) == []
+
+    def test_in_stock_and_limit(self, app, catalogue):
+        """Тест фильтра по наличию и ограничения числа подсказок"""
+        with app.app_context():
+            assert [p.name for p in search_products('ноут', 10, in_stock=True)] == ['Ноутбук Lenovo ThinkPad']
+            assert len(search_products('ноут', 1)) == 1
+
+    def test_customer_fields(self, app, catalogue):
+        """Тест поиска покупателя по имени, телефону и email"""
+        with app.app_context():
+            assert [c.name for c in search_customers('иван', 10)] == ['Иванов Иван']
+            assert [c.name for c in search_customers('912', 10)] == ['Петрова Мария']
+            assert [c.name for c in search_customers('maria', 10)] == ['Петрова Мария']
+
+    def test_index_follows_changes(self, app, catalogue):
+        """Тест: триггеры обновляют индекс при изменении и удалении"""
+        with app.app_context():
+            mouse = Product.query.filter_by(name='Мышь беспроводная').one()
+            mouse.name = 'Манипулятор'
+            db.session.commit()
+            assert search_products('мышь', 10) == []
+            assert [p.id for p in search_products('манип', 10)] == [mouse.id]
+
+            db.session.delete(mouse)
+            db.session.commit()
+            assert search_products('манип', 10) == []
+
+    def test_quote_characters_are_safe(self, app, catalogue):
+        """Тест: служебные символы FTS в запросе не ломают поиск"""
+        with app.app_context():
+            assert fts_query('ноут "HP" OR*') == '"ноут"* "HP"* "OR"*'
+            assert [p.name for p in search_products('ноут "HP"', 10)] == ['Ноутбук HP']
+
+    def test_upgrade_builds_index_for_existing_data(self, app, catalogue):
+        """Тест: обновление схемы создает индекс и заполняет его по имеющимся данным"""
+        with app.app_context():
+            db.session.execute(text('DROP TABLE products_fts'))
+            db.session.commit()
+            assert 'products_fts' in upgrade_schema()
+            assert len(search_products('ноут', 10)) == 2
+
+    def test_autocomplete_endpoints(self, admin_client, catalogue):
+        """Тест JSON-подсказок для формы продажи"""
+        products = admin_client.get('/products/search?q=ноут&in_stock=1').get_json()
+        assert [p['name'] for p in products] == ['Ноутбук Lenovo ThinkPad']
+        assert products[0]['label'] == 'Ноутбук Lenovo ThinkPad - 90000.0 ₽ (в наличии: 3)'
+
+        customers = admin_client.get('/customers/search?q=иван&limit=1').get_json()
+        assert customers[0]['label'] == 'Иванов Иван (+7 (999) 123-45-67)'
+
+    def test_sales_page_does_not_list_catalogue(self, admin_client, catalogue):
+        """Тест: страница продаж не содержит списка всех товаров и покупателей"""
+        page = admin_client.get('/sales').get_data(as_text=True)
+        assert 'Коврик для мыши' not in page
+        assert 'Петрова Мария' not in page
+        assert 'products/search' in page
@@ -0,0 +1,67 @@
+import pytest
+from database import db, Product, Customer, Sale, DailySalesRollup, User
+from datetime import datetime
+from sqlalchemy import func
+import seed
+
+
+def snapshot():
+    """Содержимое таблиц в сравнимом виде"""
+    return (
+        [(p.name, p.price, p.quantity) for p in Product.query.order_by(Product.id)],
+        [(c.name, c.phone) for c in Customer.query.order_by(Customer.id)],
+        [(s.product_id, s.customer_id, s.quantity, s.sale_date) for s in Sale.query.order_by(Sale.id)],
+    )
+
+
+class TestSeed:
+    """Тестирование генератора синтетических данных"""
+
+    def test_seed_counts_and_rollup(self, app):
+        """Тест количества строк и пересчета суточных итогов"""
+        with app.app_context():
+            inserted = seed.seed(products=20, customers=30, sales=500, days=10,
+                                 start=datetime(2024, 1, 1))
+            assert inserted == {'products': 20, 'customers': 30, 'sales': 500}
+            assert Sale.query.count() == 500
+            assert User.query.filter_by(username='admin').count() == 1
+            assert db.session.query(func.sum(DailySalesRollup.sales_count)).scalar() == 500
+            first, last = db.session.query(func.min(Sale.sale_date), func.max(Sale.sale_date)).one()
+            assert first >= datetime(2024, 1, 1) and last < datetime(2024, 1, 11)
+
+    def test_seed_is_deterministic(self, app):
+        """Тест: одинаковый seed дает одинаковые данные"""
+        with app.app_context():
+            seed.seed(products=10, customers=10, sales=200, days=5,
+                      start=datetime(2024, 1, 1), random_seed=7, reset=True)
+            first = snapshot()
+            seed.seed(products=10, customers=10, sales=200, days=5,
+                      start=datetime(2024, 1, 1), random_seed=7, reset=True)
+            assert snapshot() == first
+
+    def test_product_popularity_is_skewed(self, app):
+        """Тест: самый популярный товар продается намного чаще среднего"""
+        with app.app_context():
+            seed.seed(products=50, customers=20, sales=5000, days=30,
+                      start=datetime(2024, 1, 1))
+            counts = [count for _, count in db.session.query(
+                Sale.product_id, func.count(Sale.id)).group_by(Sale.product_id)]
+            assert max(counts) > 5 * (5000 / 50)
+
+    def test_sales_per_day_sum(self):
+        """Тест: распределение по дням сохраняет общее число продаж"""
+        counts = seed.sales_per_day(1001, datetime(2024, 1, 1), 14)
+        assert sum(counts) == 1001
+        # Суббота продает больше понедельника
+        assert counts[5] > counts[0]
+
+    def test_sales_reference_inserted_products(self, app):
+        """Тест: продажи ссылаются на вставленные товары и их цены"""
+        with app.app_context():
+            db.session.add(Product(name='Удаленный', price=1, quantity=0))
+            db.session.commit()
+            seed.seed(products=10, customers=10, sales=200, days=5, start=datetime(2024, 1, 1))
+            mismatched = db.session.query(func.count(Sale.id)).outerjoin(Product, Product.id == Sale.product_id) \
+                .filter((Product.id.is_(None)) | (Sale.total_price != Product.price * Sale.quantity)).scalar()
+            assert mismatched == 0
+            assert db.session.query(func.count(Sale.id)).join(Product).filter(Product.name == 'Удаленный').scalar() == 0
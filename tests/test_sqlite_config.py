@@ -0,0 +1,31 @@
+import pytest
+from sqlalchemy import create_engine, text
+from database import db, configure_sqlite
+
+
+@pytest.mark.sqlite_only
+class TestSqliteConfig:
+    """Тестирование настройки соединений SQLite"""
+
+    def test_app_connections_are_configured(self, app):
+        """Тест: соединения приложения открываются с нужными PRAGMA"""
+        with app.app_context():
+            assert db.session.execute(text('PRAGMA foreign_keys')).scalar() == 1
+            assert db.session.execute(text('PRAGMA busy_timeout')).scalar() == 5000
+            assert db.session.execute(text('PRAGMA synchronous')).scalar() == 1  # NORMAL
+
+    def test_no_pragma_per_request(self, admin_client, query_counter):
+        """Тест: обработка запроса не выполняет PRAGMA"""
+        admin_client.get('/')
+        admin_client.get('/login')
+        assert query_counter
+        assert not [statement for statement in query_counter if 'PRAGMA' in statement]
+
+    def test_custom_pragmas(self, tmp_path):
+        """Тест настраиваемых PRAGMA на отдельном движке"""
+        engine = create_engine(f'sqlite:///{tmp_path / "custom.db"}')
+        configure_sqlite(engine, {'journal_mode': 'WAL', 'cache_size': -2000})
+        with engine.connect() as connection:
+            assert connection.execute(text('PRAGMA journal_mode')).scalar() == 'wal'
+            assert connection.execute(text('PRAGMA cache_size')).scalar() == -2000
+        engine.dispose()
@@ -0,0 +1,119 @@
+import io
+import pytest
+from datetime import datetime
+from sqlalchemy import func, select
+from database import db, Product, Customer, StockMovement, StockSnapshot
+from sales_service import create_sale, create_order, InsufficientStock
+import importer
+import stock
+
+
+@pytest.fixture
+def catalogue(app, admin_client):
+    """Два товара, добавленные через форму, и покупатель"""
+    admin_client.post('/products/add', data={'name': 'Ноутбук', 'price': '45000', 'quantity': '10'})
+    admin_client.post('/products/add', data={'name': 'Мышь', 'price': '800', 'quantity': '50'})
+    with app.app_context():
+        db.session.add(Customer(name='Иванов'))
+        db.session.commit()
+        ids = [product.id for product in Product.query.order_by(Product.id)]
+        return {'laptop': ids[0], 'mouse': ids[1], 'customer': Customer.query.first().id}
+
+
+def movements(product_id):
+    return [(movement.kind, movement.quantity) for movement in
+            StockMovement.query.filter_by(product_id=product_id).order_by(StockMovement.id)]
+
+
+def add_movement(product_id, quantity, moment):
+    """Движение с изменением остатка задним числом"""
+    db.session.get(Product, product_id).quantity += quantity
+    stock.record_movement(product_id, quantity, stock.RECEIPT, created_at=moment)
+    db.session.commit()
+
+
+class TestStock:
+    """Тестирование журнала движения товаров"""
+
+    def test_every_change_is_recorded(self, app, admin_client, catalogue):
+        """Тест: продажа, заказ и редактирование пишут движения"""
+        with app.app_context():
+            create_sale(catalogue['laptop'], catalogue['customer'], 2)
+            create_order(catalogue['customer'], [(catalogue['laptop'], 1), (catalogue['mouse'], 5)])
+        admin_client.post(f'/products/edit/{catalogue["laptop"]}',
+                          data={'name': 'Ноутбук', 'price': '45000', 'quantity': '20'})
+        with app.app_context():
+            assert movements(catalogue['laptop']) == [
+                ('receipt', 10), ('sale', -2), ('sale', -1), ('adjustment', 13)]
+            assert db.session.get(Product, catalogue['laptop']).quantity == 20
+            assert stock.verify() == []
+
+    def test_failed_sale_leaves_no_movement(self, app, catalogue):
+        """Тест: отклоненная продажа откатывает и движение"""
+        with app.app_context():
+            with pytest.raises(InsufficientStock):
+                create_order(catalogue['customer'], [(catalogue['mouse'], 1), (catalogue['laptop'], 100)])
+            assert movements(catalogue['mouse']) == [('receipt', 50)]
+
+    def test_stock_at_uses_snapshot_and_tail(self, app, catalogue):
+        """Тест остатков на дату до, между и после снимков"""
+        with app.app_context():
+            laptop = catalogue['laptop']
+            db.session.execute(StockMovement.__table__.update().values(created_at=datetime(2024, 1, 1)))
+            add_movement(laptop, 5, datetime(2024, 2, 1))
+            assert stock.take_snapshot() == 2
+            # Снимок сделан в тот же день, что и движения задним числом
+            db.session.execute(StockSnapshot.__table__.update().values(taken_at=datetime(2024, 2, 20)))
+            add_movement(laptop, -3, datetime(2024, 3, 1))
+            add_movement(laptop, 4, datetime(2024, 4, 1))
+
+            def at(month):
+                return stock.stock_at(datetime(2024, month, 15), [laptop]).get(laptop)
+
+            assert at(1) == 10
+            assert [at(2), at(3), at(4)] == [15, 12, 16]
+            # Движения до снимка больше не читаются: остаток после снимка не меняется без них
+            snapshot_id = db.session.scalar(select(func.max(StockSnapshot.movement_id)))
+            db.session.execute(StockMovement.__table__.delete().where(StockMovement.id <= snapshot_id))
+            assert [at(3), at(4)] == [12, 16]
+
+    def test_incremental_snapshots(self, app, catalogue):
+        """Тест: следующий снимок пишется только для двигавшихся товаров"""
+        with app.app_context():
+            stock.take_snapshot()
+            assert stock.take_snapshot() == 0
+            create_sale(catalogue['mouse'], catalogue['customer'], 3)
+            assert stock.take_snapshot() == 1
+            assert stock.stock_at(datetime.max) == {catalogue['laptop']: 10, catalogue['mouse']: 47}
+
+    def test_verify_and_rebuild(self, app, catalogue):
+        """Тест: изменение остатка в обход журнала находится и исправляется"""
+        with app.app_context():
+            stock.take_snapshot()
+            db.session.get(Product, catalogue['mouse']).quantity = 40
+            db.session.add(Product(name='Без журнала', price=1, quantity=7))
+            db.session.commit()
+            assert {row[0] for row in stock.verify()} == {catalogue['mouse'], catalogue['mouse'] + 1}
+            assert stock.rebuild() == 2
+            assert stock.verify() == []
+            assert movements(catalogue['mouse'])[-1] == ('adjustment', -10)
+
+    def test_api_and_import(self, app, catalogue):
+        """Тест: создание через импорт и изменение через API пишут движения"""
+        with app.app_context():
+            importer.import_products(io.StringIO('name,price,quantity\nКабель,300,25\nКоврик,200,0\n'))
+            cable = Product.query.filter_by(name='Кабель').first().id
+            assert movements(cable) == [('receipt', 25)]
+            stock.set_stock({cable: 20}, 'API')
+            db.session.commit()
+            assert movements(cable)[-1] == ('adjustment', -5)
+            assert stock.verify() == []
+
+    def test_delete_product_removes_history(self, app, admin_client, catalogue):
+        """Тест: товар без продаж удаляется вместе с журналом"""
+        with app.app_context():
+            stock.take_snapshot()
+        admin_client.get(f'/products/delete/{catalogue["mouse"]}')
+        with app.app_context():
+            assert db.session.get(Product, catalogue['mouse']) is None
+            assert movements(catalogue['mouse']) == []
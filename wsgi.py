@@ -0,0 +1,22 @@
+"""Точка входа WSGI для промышленного запуска.
+
+gunicorn:  gunicorn -w 4 --threads 4 -b 0.0.0.0:8000 wsgi:app
+waitress:  waitress-serve --threads 8 --listen 0.0.0.0:8000 wsgi:app
+
+Модель воркеров. Каждый процесс gunicorn создает свое приложение и свой
+пул соединений, поэтому всего соединений с БД может быть до
+workers x (DB_POOL_SIZE + DB_MAX_OVERFLOW). Потоки внутри процесса
+делят пул: DB_POOL_SIZE должен быть не меньше --threads.
+
+SQLite допускает одного писателя одновременно: в режиме WAL читатели
+не блокируются, но запись сериализуется, поэтому для SQLite разумно
+2-4 процесса. Для PostgreSQL (DATABASE_URL=postgresql+psycopg2://...)
+процессы масштабируются по числу ядер; DB_POOL_RECYCLE и
+DB_POOL_PRE_PING защищают от соединений, закрытых сервером или
+балансировщиком.
+
+Схема БД обновляется отдельно до запуска воркеров: python migrations.py
+"""
+from app import create_app
+
+app = create_app()